@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from .models_db import Bitacora, Sabor, Producto, Usuario, Rol, Permiso, UsuarioRol, RolPermiso
+from .paginacion import tabla_estimada
 
 # ====== ya tenías estos ======
 @admin.register(Sabor)
@@ -14,11 +17,29 @@ class ProductoAdmin(admin.ModelAdmin):
     search_fields = ("nombre",)
     list_filter = ("activo",)
 
+class PaginadorEstimado(Paginator):
+    """Sin filtros usa la estimación de filas de la tabla en vez de COUNT(*)."""
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimado = tabla_estimada(qs.model)
+            if estimado is not None:
+                return estimado
+        return super().count
+
+
 @admin.register(Bitacora)
 class BitacoraAdmin(admin.ModelAdmin):
+    # Solo la tabla activa (últimos AUDIT_RETENCION_DIAS días); lo anterior
+    # está en bitacora_AAAAMM y se consulta desde /bitacora/archivo/.
     list_display = ("fecha_local", "usuario", "accion", "entidad", "entidad_id", "ip")
     search_fields = ("usuario__email", "usuario__nombre", "accion", "entidad", "ip")
     list_filter = ("accion", "entidad")
+    list_select_related = ("usuario",)
+    ordering = ("-fecha", "-id")
+    paginator = PaginadorEstimado
+    show_full_result_count = False
     def fecha_local(self, obj):
         from django.utils import timezone
         if not obj.fecha:
@@ -63,3 +84,42 @@ from .models_db import Proveedor
 class ProveedorAdmin(admin.ModelAdmin):
     list_display = ("id", "nombre", "telefono", "direccion")
     search_fields = ("nombre", "telefono")
+
+
+from .models_kardex import KardexCorte
+
+@admin.register(KardexCorte)
+class KardexCorteAdmin(admin.ModelAdmin):
+    list_display = ("id", "insumo_id", "fecha_corte", "ultimo_kardex_id", "saldo")
+    list_filter = ("fecha_corte",)
+    search_fields = ("insumo_id",)
+
+
+from .models_valuacion import CapaFifo, ConsumoFifo
+
+@admin.register(CapaFifo)
+class CapaFifoAdmin(admin.ModelAdmin):
+    list_display = ("kardex_id", "insumo_id", "fecha", "cantidad", "restante", "costo_unitario")
+    search_fields = ("insumo_id",)
+
+@admin.register(ConsumoFifo)
+class ConsumoFifoAdmin(admin.ModelAdmin):
+    list_display = ("id", "kardex_id", "capa_kardex_id", "insumo_id", "fecha", "motivo", "cantidad", "costo_unitario")
+    list_filter = ("motivo",)
+    search_fields = ("insumo_id",)
+
+
+from .models_bitacora import BitacoraArchivo
+
+@admin.register(BitacoraArchivo)
+class BitacoraArchivoAdmin(admin.ModelAdmin):
+    list_display = ("mes", "tabla", "filas", "actualizado_en")
+
+
+from .models_stripe import EventoStripe
+
+@admin.register(EventoStripe)
+class EventoStripeAdmin(admin.ModelAdmin):
+    list_display = ("id", "evento_id", "tipo", "objeto_id", "estado", "intentos", "recibido_en", "procesado_en")
+    list_filter = ("estado", "tipo")
+    search_fields = ("evento_id", "objeto_id")
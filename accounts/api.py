@@ -4,6 +4,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from .models_db import Usuario, Rol, Permiso, UsuarioRol, RolPermiso
+from .permissions import invalidar_permisos
 from .serializers import (
     PermisoSerializer,
     RolListSerializer, RolWriteSerializer,
@@ -22,6 +23,16 @@ class RolViewSet(viewsets.ModelViewSet):
             return RolWriteSerializer
         return RolListSerializer
 
+    # El serializer escribe rol_permiso con bulk_create (sin señales):
+    # invalidamos la caché de permisos de todos los usuarios.
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidar_permisos()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidar_permisos()
+
     def destroy(self, request, *args, **kwargs):
         rol = self.get_object()
         if UsuarioRol.objects.filter(rol=rol).exists():
@@ -30,7 +41,9 @@ class RolViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_409_CONFLICT,
             )
         RolPermiso.objects.filter(rol=rol).delete()
-        return super().destroy(request, *args, **kwargs)
+        resp = super().destroy(request, *args, **kwargs)
+        invalidar_permisos()
+        return resp
 
 class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Usuario.objects.all().order_by("nombre")
@@ -48,4 +61,5 @@ class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
             [UsuarioRol(usuario=usuario, rol_id=r) for r in roles_ids],
             ignore_conflicts=True,
         )
+        invalidar_permisos(usuario.email)
         return Response({"ok": True, "roles": roles_ids})
@@ -0,0 +1,24 @@
+# accounts/management/commands/archivar_bitacora.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.services_bitacora_archivo import archivar
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve la bitácora anterior a la retención (AUDIT_RETENCION_DIAS) a tablas "
+        "mensuales bitacora_AAAAMM. Programarlo a diario para acotar la tabla activa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None,
+                            help=f"Días a conservar en la tabla activa (default: {settings.AUDIT_RETENCION_DIAS})")
+        parser.add_argument("--lote", type=int, default=5000, help="Filas por transacción (default: 5000)")
+        parser.add_argument("--pausa", type=float, default=0.0, help="Segundos de espera entre lotes")
+
+    def handle(self, *args, **opts):
+        movidas = archivar(dias=opts["dias"], lote=max(1, opts["lote"]), pausa=max(0.0, opts["pausa"]))
+        for tabla, n in movidas.items():
+            self.stdout.write(f"  {tabla}: {n} filas")
+        self.stdout.write(self.style.SUCCESS(f"Bitácora archivada: {sum(movidas.values())} filas."))
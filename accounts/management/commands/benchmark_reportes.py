@@ -0,0 +1,110 @@
+# accounts/management/commands/benchmark_reportes.py
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from accounts import views_reportes
+
+
+def _fecha(s: str):
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {s} (usa YYYY-MM-DD)")
+
+
+# SQL anterior (JOIN directo a pago / detalle_pedido), solo como referencia:
+# repite p.total por cada pago o línea del pedido.
+LEGACY_VENTAS_DIARIAS = """
+    SELECT DATE(p.created_at) AS fecha, COUNT(DISTINCT p.id) AS pedidos,
+           COALESCE(SUM(p.total), 0) AS total, COALESCE(SUM(pg.monto), 0) AS pagado
+    FROM pedido p
+    LEFT JOIN pago pg ON pg.pedido_id = p.id
+    WHERE p.estado IN ('CONFIRMADO','ENTREGADO')
+      AND DATE(p.created_at) >= %s AND DATE(p.created_at) <= %s
+    GROUP BY DATE(p.created_at)
+"""
+
+LEGACY_VENTAS_AGREGADO = {
+    "dia": "DATE_FORMAT(f.fecha, '%%Y-%%m-%%d')",
+    "cliente": "COALESCE(NULLIF(TRIM(c.nombre), ''), u.email)",
+    "producto": "COALESCE(NULLIF(TRIM(pr.nombre), ''), '—')",
+    "sabor": "COALESCE(NULLIF(TRIM(s.nombre), ''), '—')",
+}
+
+
+def _legacy_agregado(group: str) -> str:
+    return f"""
+        SELECT {LEGACY_VENTAS_AGREGADO[group]} AS etiqueta,
+               COUNT(DISTINCT p.id) AS ventas, SUM(p.total) AS total
+        FROM factura f
+        JOIN pedido p               ON p.id = f.pedido_id
+        LEFT JOIN cliente c         ON c.id = p.cliente_id
+        LEFT JOIN usuario u         ON u.id = c.usuario_id
+        LEFT JOIN detalle_pedido dp ON dp.pedido_id = p.id
+        LEFT JOIN sabor s           ON s.id = dp.sabor_id
+        LEFT JOIN producto pr       ON pr.id = dp.producto_id
+        WHERE f.fecha >= %s AND f.fecha < DATE_ADD(%s, INTERVAL 1 DAY)
+        GROUP BY etiqueta
+    """
+
+
+def _handler_reads(cur) -> dict:
+    if connection.vendor != "mysql":
+        return {}
+    cur.execute("SHOW SESSION STATUS LIKE 'Handler_read%%'")
+    return {k: int(v) for k, v in cur.fetchall()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el SQL anterior de CU23/CU27 (JOIN directo a pagos/líneas) con "
+        "el actual (hijos pre-agregados): filas, suma de totales, lecturas de "
+        "handler (MySQL) y tiempo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", required=True, help="Primer día (YYYY-MM-DD)")
+        parser.add_argument("--hasta", required=True, help="Último día (YYYY-MM-DD)")
+        parser.add_argument("--repeticiones", type=int, default=3, help="Corridas por consulta (default: 3)")
+
+    def _medir(self, nombre, sql, params, col_total, reps):
+        mejores = None
+        with connection.cursor() as cur:
+            for _ in range(max(1, reps)):
+                antes = _handler_reads(cur)
+                t0 = time.perf_counter()
+                cur.execute(sql, params)
+                filas = cur.fetchall()
+                ms = (time.perf_counter() - t0) * 1000
+                despues = _handler_reads(cur)
+                if mejores is None or ms < mejores[0]:
+                    lecturas = sum(despues.values()) - sum(antes.values()) if antes else None
+                    mejores = (ms, filas, lecturas)
+
+        ms, filas, lecturas = mejores
+        total = sum((f[col_total] or 0) for f in filas)
+        self.stdout.write(
+            f"  {nombre:<28} filas={len(filas):<6} total={total:<14} "
+            f"handler_read={'-' if lecturas is None else lecturas:<10} {ms:8.1f} ms"
+        )
+
+    def handle(self, *args, **opts):
+        d1, d2 = _fecha(opts["desde"]), _fecha(opts["hasta"])
+        reps = opts["repeticiones"]
+
+        # Consultas en vivo (no contra las tablas de resumen)
+        with override_settings(REPORTES_USAR_RESUMEN=False):
+            self.stdout.write("CU23 ventas diarias")
+            self._medir("anterior", LEGACY_VENTAS_DIARIAS, [d1, d2], 2, reps)
+            sql, params = views_reportes._sql_ventas_diarias(d1, d2, "fecha ASC", limit=None)
+            self._medir("pre-agregado", sql, params, 2, reps)
+
+            for group in ("dia", "cliente", "producto", "sabor"):
+                self.stdout.write(f"CU27 ventas por {group}")
+                self._medir("anterior", _legacy_agregado(group), [d1, d2], 2, reps)
+                sql, params = views_reportes._sql_ventas_agregado(group, "", d1, d2, limit=None)
+                self._medir("pre-agregado", sql, params, 2, reps)
@@ -0,0 +1,17 @@
+# accounts/management/commands/cerrar_kardex.py
+from django.core.management.base import BaseCommand
+
+from accounts.services_kardex import cerrar_saldos
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe un corte de saldo por insumo en kardex_corte (último corte + "
+        "movimientos nuevos). Programarlo periódicamente (p.ej. cada noche) "
+        "para que las consultas de stock solo sumen los movimientos recientes. "
+        "Cierra hasta el MAX(id) visto en la corrida anterior (KARDEX_MARGEN)."
+    )
+
+    def handle(self, *args, **opts):
+        n = cerrar_saldos()
+        self.stdout.write(self.style.SUCCESS(f"Corte de kardex escrito para {n} insumos."))
@@ -0,0 +1,18 @@
+# accounts/management/commands/costos_insumos.py
+from django.core.management.base import BaseCommand
+
+from accounts.services_costos import refrescar_todo
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula costo_insumo (último, promedio y FIFO) para todos los insumos "
+        "con compras. Necesario una vez tras migrar; luego se mantiene solo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bloque", type=int, default=500, help="Insumos por lote (default: 500)")
+
+    def handle(self, *args, **opts):
+        n = refrescar_todo(bloque=max(1, opts["bloque"]))
+        self.stdout.write(self.style.SUCCESS(f"Costos recalculados para {n} insumos."))
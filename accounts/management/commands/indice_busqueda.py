@@ -0,0 +1,25 @@
+# accounts/management/commands/indice_busqueda.py
+from django.core.management.base import BaseCommand
+
+from accounts.services_busqueda import INDEXADORES, reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de búsqueda (busqueda_termino) de clientes y "
+        "proveedores. La migración 0016 lo llena y luego se mantiene solo; "
+        "sirve para repararlo (p.ej. tras cambios por SQL directo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--entidad", choices=sorted(INDEXADORES), action="append",
+            help="Solo esta entidad (se puede repetir). Por defecto, todas.",
+        )
+        parser.add_argument("--bloque", type=int, default=1000, help="Filas por lote (default: 1000)")
+
+    def handle(self, *args, **opts):
+        for entidad in opts["entidad"] or sorted(INDEXADORES):
+            n = reconstruir(entidad, bloque=max(1, opts["bloque"]))
+            self.stdout.write(f"  {entidad}: {n} filas indexadas")
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
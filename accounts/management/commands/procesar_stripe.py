@@ -0,0 +1,30 @@
+# accounts/management/commands/procesar_stripe.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.services_stripe import MAX_INTENTOS, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica los eventos de Stripe pendientes de la bandeja stripe_evento "
+        "(los guarda el webhook). Con --seguir queda corriendo como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=100, help="Eventos por consulta (default: 100)")
+        parser.add_argument("--max-intentos", type=int, default=MAX_INTENTOS,
+                            help=f"Reintentos de eventos con error (default: {MAX_INTENTOS})")
+        parser.add_argument("--seguir", action="store_true", help="No terminar: repetir cada --pausa segundos")
+        parser.add_argument("--pausa", type=float, default=2.0, help="Segundos entre pasadas con --seguir")
+
+    def handle(self, *args, **opts):
+        while True:
+            resumen = procesar_pendientes(lote=max(1, opts["lote"]), max_intentos=opts["max_intentos"])
+            if resumen or not opts["seguir"]:
+                detalle = ", ".join(f"{k.lower()}: {v}" for k, v in sorted(resumen.items())) or "sin pendientes"
+                self.stdout.write(self.style.SUCCESS(f"Eventos de Stripe: {detalle}."))
+            if not opts["seguir"]:
+                return
+            time.sleep(max(0.1, opts["pausa"]))
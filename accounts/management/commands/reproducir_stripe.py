@@ -0,0 +1,68 @@
+# accounts/management/commands/reproducir_stripe.py
+import json
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from accounts.services_stripe import firmar
+
+FIXTURES = Path(__file__).resolve().parents[2] / "fixtures" / "stripe"
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía eventos de Stripe de ejemplo (JSON), firmados con STRIPE_WEBHOOK_SECRET, "
+        "al webhook: en proceso (sin servidor) o a --url. Para probar sin Stripe real."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivos", nargs="*", help=f"Eventos JSON (default: {FIXTURES}/*.json)")
+        parser.add_argument("--url", help="URL del webhook de un servidor corriendo (default: en proceso)")
+        parser.add_argument("--secreto", help="Secreto de firma (default: settings.STRIPE_WEBHOOK_SECRET)")
+        parser.add_argument("--pedido", type=int, help="Usar este pedido_id en metadata")
+        parser.add_argument("--monto", help="amount_total en Bs (se envía en centavos)")
+        parser.add_argument("--nuevo-id", action="store_true",
+                            help="Id de evento nuevo en cada envío (sin él, repetir prueba la idempotencia)")
+
+    def handle(self, *args, **opts):
+        secreto = opts["secreto"] or settings.STRIPE_WEBHOOK_SECRET
+        if not secreto:
+            raise CommandError("Falta el secreto: STRIPE_WEBHOOK_SECRET o --secreto.")
+        archivos = [Path(a) for a in opts["archivos"]] or sorted(FIXTURES.glob("*.json"))
+        if not archivos:
+            raise CommandError("No hay eventos para enviar.")
+
+        cliente = None if opts["url"] else Client(HTTP_HOST=(settings.ALLOWED_HOSTS or ["localhost"])[0].lstrip("."))
+        for archivo in archivos:
+            evento = json.loads(archivo.read_text(encoding="utf-8"))
+            objeto = evento.setdefault("data", {}).setdefault("object", {})
+            if opts["pedido"]:
+                objeto.setdefault("metadata", {})["pedido_id"] = str(opts["pedido"])
+            if opts["monto"]:
+                objeto["amount_total"] = int(round(float(opts["monto"]) * 100))
+            if opts["nuevo_id"]:
+                evento["id"] = f"{evento['id']}_{int(time.time() * 1000)}"
+            payload = json.dumps(evento).encode()
+            firma = firmar(payload, secreto)
+
+            if cliente is not None:
+                r = cliente.post(reverse("stripe_webhook"), payload, content_type="application/json",
+                                 HTTP_STRIPE_SIGNATURE=firma)
+                codigo = r.status_code
+            else:
+                req = urllib.request.Request(opts["url"], data=payload, method="POST", headers={
+                    "Content-Type": "application/json", "Stripe-Signature": firma,
+                })
+                try:
+                    with urllib.request.urlopen(req, timeout=10) as r:
+                        codigo = r.status
+                except urllib.error.HTTPError as e:
+                    codigo = e.code
+            estilo = self.style.SUCCESS if codigo == 200 else self.style.ERROR
+            self.stdout.write(estilo(f"{archivo.name}: {evento['id']} ({evento['type']}) -> {codigo}"))
@@ -0,0 +1,41 @@
+# accounts/management/commands/resumen_ventas.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.services_resumen_ventas import limites_historicos, reconstruir
+
+
+def _fecha(s: str):
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {s} (usa YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los resúmenes de ventas (resumen_venta_diaria / "
+        "resumen_venta_dimension) para un rango de días. Sin argumentos "
+        "recorre todo el historial."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Primer día (YYYY-MM-DD)")
+        parser.add_argument("--hasta", help="Último día (YYYY-MM-DD)")
+        parser.add_argument(
+            "--bloque", type=int, default=31,
+            help="Días por transacción (default: 31)",
+        )
+
+    def handle(self, *args, **opts):
+        ini, fin = limites_historicos()
+        d1 = _fecha(opts["desde"]) if opts["desde"] else ini
+        d2 = _fecha(opts["hasta"]) if opts["hasta"] else fin
+        if not d1 or not d2 or d1 > d2:
+            raise CommandError("Rango vacío: no hay nada que resumir.")
+
+        for actual, hasta in reconstruir(d1, d2, opts["bloque"]):
+            self.stdout.write(f"  {actual} → {hasta}")
+
+        self.stdout.write(self.style.SUCCESS(f"Resumen de ventas reconstruido: {d1} a {d2}."))
@@ -0,0 +1,15 @@
+# accounts/management/commands/saldos_pedidos.py
+from django.core.management.base import BaseCommand
+
+from accounts.services_pagos import recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye pedido_saldo (pagado por pedido) desde la tabla pago. "
+        "La migración ya lo llena; sirve tras cargas o correcciones manuales en pago."
+    )
+
+    def handle(self, *args, **opts):
+        n = recalcular()
+        self.stdout.write(self.style.SUCCESS(f"Saldos recalculados para {n} pedidos."))
@@ -0,0 +1,23 @@
+# accounts/management/commands/valuar_inventario.py
+from django.core.management.base import BaseCommand
+
+from accounts.services_valuacion import reiniciar, valuar
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa los movimientos nuevos de kardex en las capas FIFO (fifo_capa / "
+        "fifo_consumo). Programarlo periódicamente (la pantalla de valuación solo lee); "
+        "--reconstruir recorre todo el kardex."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reconstruir", action="store_true",
+                            help="Borra las capas y vuelve a valuar desde el primer movimiento")
+        parser.add_argument("--bloque", type=int, default=2000, help="Movimientos por transacción (default: 2000)")
+
+    def handle(self, *args, **opts):
+        if opts["reconstruir"]:
+            reiniciar()
+        n = valuar(bloque=max(1, opts["bloque"]))
+        self.stdout.write(self.style.SUCCESS(f"Valuación FIFO: {n} movimientos procesados."))
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('fecha', models.DateField(primary_key=True, serialize=False)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'resumen_venta_diaria',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaDimension',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('dimension', models.CharField(choices=[('dia', 'Día'), ('cliente', 'Cliente'), ('producto', 'Producto'), ('sabor', 'Sabor')], max_length=10)),
+                ('clave', models.BigIntegerField(default=0)),
+                ('etiqueta', models.CharField(max_length=200)),
+                ('ventas', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'resumen_venta_dimension',
+                'indexes': [models.Index(fields=['dimension', 'fecha'], name='resumen_dim_fecha_idx')],
+                'unique_together': {('fecha', 'dimension', 'clave')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+"""
+Índices para los filtros de rango de fechas de reportes y listados
+(`services_reportes.rango_fechas`). Las tablas son legadas (managed=False),
+así que se crean con SQL directo, solo si la tabla existe (no en la base de
+pruebas) y si no hay ya un índice que empiece por las mismas columnas (p.ej.
+el índice de la FK pago.pedido_id).
+"""
+from django.db import migrations
+
+
+INDICES = [
+    # (tabla, nombre, columnas)
+    ("pedido", "pedido_estado_created_idx", ("estado", "created_at")),
+    ("compra", "compra_fecha_idx", ("fecha",)),
+    ("factura", "factura_fecha_idx", ("fecha",)),
+    ("pago", "pago_pedido_idx", ("pedido_id",)),
+]
+
+
+def _indices_existentes(cursor, tabla):
+    cursor.execute("""
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+    """, [tabla])
+    return {nombre: tuple(cols.split(",")) for nombre, cols in cursor.fetchall()}
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    tablas = set(schema_editor.connection.introspection.table_names())
+    with schema_editor.connection.cursor() as cur:
+        for tabla, nombre, columnas in INDICES:
+            if tabla not in tablas:
+                continue
+            existentes = _indices_existentes(cur, tabla)
+            if nombre in existentes:
+                continue
+            if any(cols[:len(columnas)] == columnas for cols in existentes.values()):
+                continue
+            cur.execute(f"CREATE INDEX {nombre} ON {tabla} ({', '.join(columnas)})")
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    with schema_editor.connection.cursor() as cur:
+        for tabla, nombre, _ in INDICES:
+            if nombre in _indices_existentes(cur, tabla):
+                cur.execute(f"DROP INDEX {nombre} ON {tabla}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_resumen_ventas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_indices_rango_fechas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entidad', models.CharField(choices=[('cliente', 'Cliente'), ('proveedor', 'Proveedor')], max_length=10)),
+                ('entidad_id', models.BigIntegerField()),
+                ('termino', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'busqueda_termino',
+                'indexes': [models.Index(fields=['entidad', 'termino'], name='busqueda_termino_idx')],
+                'unique_together': {('entidad', 'entidad_id', 'termino')},
+            },
+        ),
+    ]
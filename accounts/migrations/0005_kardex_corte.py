@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_busqueda_termino'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KardexCorte',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('insumo_id', models.IntegerField()),
+                ('fecha_corte', models.DateTimeField()),
+                ('ultimo_kardex_id', models.BigIntegerField(default=0)),
+                ('saldo', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'kardex_corte',
+                'ordering': ['-fecha_corte'],
+                'unique_together': {('insumo_id', 'fecha_corte')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_kardex_corte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostoInsumo',
+            fields=[
+                ('insumo_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('ultimo', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('promedio', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('fifo', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'costo_insumo',
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_costo_insumo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapaFifo',
+            fields=[
+                ('kardex_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('insumo_id', models.IntegerField()),
+                ('fecha', models.DateTimeField(blank=True, null=True)),
+                ('cantidad', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('restante', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('costo_unitario', models.DecimalField(decimal_places=4, max_digits=14)),
+            ],
+            options={
+                'db_table': 'fifo_capa',
+                'indexes': [models.Index(fields=['insumo_id', 'kardex_id'], name='fifo_capa_insumo_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumoFifo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kardex_id', models.BigIntegerField()),
+                ('capa_kardex_id', models.BigIntegerField(blank=True, null=True)),
+                ('insumo_id', models.IntegerField()),
+                ('fecha', models.DateTimeField(blank=True, null=True)),
+                ('motivo', models.CharField(max_length=7)),
+                ('cantidad', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('costo_unitario', models.DecimalField(decimal_places=4, max_digits=14)),
+            ],
+            options={
+                'db_table': 'fifo_consumo',
+                'indexes': [
+                    models.Index(fields=['fecha'], name='fifo_consumo_fecha_idx'),
+                    models.Index(fields=['insumo_id', 'fecha'], name='fifo_consumo_insumo_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ValuacionCorte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_kardex_id', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'fifo_corte',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+"""
+Índices para la paginación por llave (`accounts.paginacion`): cada listado
+busca por `(campo, id)`; en InnoDB el índice secundario ya incluye la PK,
+así que basta con indexar el campo de orden. Mismo criterio que 0003.
+"""
+from django.db import migrations
+
+
+INDICES = [
+    # (tabla, nombre, columnas)
+    ("bitacora", "bitacora_fecha_idx", ("fecha",)),
+    ("kardex", "kardex_fecha_idx", ("fecha",)),
+    ("kardex", "kardex_insumo_fecha_idx", ("insumo_id", "fecha")),
+    ("proveedor", "proveedor_nombre_idx", ("nombre",)),
+]
+
+
+def _indices_existentes(cursor, tabla):
+    cursor.execute("""
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+    """, [tabla])
+    return {nombre: tuple(cols.split(",")) for nombre, cols in cursor.fetchall()}
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    tablas = set(schema_editor.connection.introspection.table_names())
+    with schema_editor.connection.cursor() as cur:
+        for tabla, nombre, columnas in INDICES:
+            if tabla not in tablas:
+                continue
+            existentes = _indices_existentes(cur, tabla)
+            if nombre in existentes:
+                continue
+            if any(cols[:len(columnas)] == columnas for cols in existentes.values()):
+                continue
+            cur.execute(f"CREATE INDEX {nombre} ON {tabla} ({', '.join(columnas)})")
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    with schema_editor.connection.cursor() as cur:
+        for tabla, nombre, _ in INDICES:
+            if nombre in _indices_existentes(cur, tabla):
+                cur.execute(f"DROP INDEX {nombre} ON {tabla}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_valuacion_fifo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
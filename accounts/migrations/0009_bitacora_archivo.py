@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_indices_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BitacoraArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(unique=True)),
+                ('tabla', models.CharField(max_length=64)),
+                ('filas', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'bitacora_archivo',
+                'ordering': ['-mes'],
+            },
+        ),
+    ]
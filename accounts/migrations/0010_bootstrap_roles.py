@@ -0,0 +1,25 @@
+"""
+Roles/permisos mínimos (CLIENTE con PEDIDO_READ), antes creados en cada login
+por `signals.bootstrap_roles_perms`. Ahora se crean aquí una vez; las tablas
+son legadas, así que se omite si no existen en esta base.
+"""
+from django.db import migrations
+
+
+def bootstrap(apps, schema_editor):
+    tablas = set(schema_editor.connection.introspection.table_names())
+    if not {"permiso", "rol", "rol_permiso"} <= tablas:
+        return
+    from accounts.signals import bootstrap_roles_perms
+    bootstrap_roles_perms(forzar=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_bitacora_archivo'),
+    ]
+
+    operations = [
+        migrations.RunPython(bootstrap, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+"""
+Resumen `pedido_saldo` (pagado por pedido). Se llena aquí con lo que ya hay
+en `pago`; la tabla `pago` es legada, así que se omite si no existe.
+"""
+from django.db import migrations, models
+
+
+def llenar(apps, schema_editor):
+    if "pago" not in schema_editor.connection.introspection.table_names():
+        return
+    from accounts.services_pagos import recalcular
+    recalcular()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_bootstrap_roles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoPedido',
+            fields=[
+                ('pedido_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pagos', models.IntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'pedido_saldo',
+            },
+        ),
+        migrations.RunPython(llenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_saldo_pedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento_id', models.CharField(max_length=255, unique=True)),
+                ('tipo', models.CharField(max_length=100)),
+                ('objeto_id', models.CharField(blank=True, db_index=True, default='', max_length=255)),
+                ('payload', models.TextField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESADO', 'Procesado'), ('IGNORADO', 'Ignorado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('recibido_en', models.DateTimeField(auto_now_add=True)),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'stripe_evento',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['estado', 'id'], name='stripe_evento_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_stripe_evento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valuacioncorte',
+            name='hasta_kardex_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='valuacioncorte',
+            name='tope_kardex_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='valuacioncorte',
+            name='tope_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Lo ya valuado pasa a ser tope valuable
+        migrations.RunSQL(
+            "UPDATE fifo_corte SET hasta_kardex_id = ultimo_kardex_id",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='consumofifo',
+            index=models.Index(fields=['kardex_id'], name='fifo_consumo_kardex_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_valuacion_margen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KardexTope',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tope_kardex_id', models.BigIntegerField(default=0)),
+                ('tope_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'kardex_tope',
+            },
+        ),
+    ]
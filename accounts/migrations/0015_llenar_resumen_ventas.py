@@ -0,0 +1,91 @@
+"""
+Llena `resumen_venta_diaria` / `resumen_venta_dimension` con el historial:
+los reportes CU23/CU27 leen de ahí por defecto (REPORTES_USAR_RESUMEN) y
+0002 las creó vacías. Son las consultas de services_resumen_ventas sobre
+todo el historial, copiadas aquí para que la migración no dependa del
+código vivo (después se reconstruye con `manage.py resumen_ventas`). Las
+tablas de pedidos son legadas, así que se omite si no existen.
+"""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations
+
+TABLAS = {"pedido", "pago", "factura", "detalle_pedido", "cliente", "usuario", "producto", "sabor"}
+ESTADOS_VENTA = ("CONFIRMADO", "ENTREGADO")
+
+
+def _dia(col):
+    """Día local de `col` (la BD guarda UTC con USE_TZ; La Paz no tiene horario de verano)."""
+    if not settings.USE_TZ:
+        return f"DATE({col})"
+    off = datetime.now(ZoneInfo(settings.TIME_ZONE)).utcoffset() or timedelta(0)
+    mins = int(off.total_seconds() // 60)
+    signo = "-" if mins < 0 else "+"
+    return f"DATE(CONVERT_TZ({col}, '+00:00', '{signo}{abs(mins) // 60:02d}:{abs(mins) % 60:02d}'))"
+
+
+def llenar(apps, schema_editor):
+    conexion = schema_editor.connection
+    if not TABLAS <= set(conexion.introspection.table_names()):
+        return
+    dia_p, dia_f = _dia("p.created_at"), _dia("f.fecha")
+    insert_dim = "INSERT INTO resumen_venta_dimension (fecha, dimension, clave, etiqueta, ventas, total)"
+    with conexion.cursor() as cur:
+        cur.execute("DELETE FROM resumen_venta_diaria")
+        cur.execute(f"""
+            INSERT INTO resumen_venta_diaria (fecha, pedidos, total, pagado, actualizado_en)
+            SELECT {dia_p}, COUNT(*), COALESCE(SUM(p.total), 0), COALESCE(SUM(pg.pagado), 0), NOW()
+            FROM pedido p
+            LEFT JOIN (
+                SELECT pedido_id, SUM(monto) AS pagado FROM pago GROUP BY pedido_id
+            ) pg ON pg.pedido_id = p.id
+            WHERE p.estado IN (%s, %s) AND p.created_at IS NOT NULL
+            GROUP BY {dia_p}
+        """, list(ESTADOS_VENTA))
+
+        cur.execute("DELETE FROM resumen_venta_dimension")
+        # Sin parámetros: el % de DATE_FORMAT va tal cual
+        cur.execute(insert_dim + f"""
+            SELECT {dia_f}, 'dia', 0, DATE_FORMAT({dia_f}, '%Y-%m-%d'),
+                   COUNT(*), COALESCE(SUM(p.total), 0)
+            FROM factura f
+            JOIN pedido p ON p.id = f.pedido_id
+            WHERE f.fecha IS NOT NULL
+            GROUP BY {dia_f}
+        """)
+        cur.execute(insert_dim + f"""
+            SELECT {dia_f}, 'cliente', p.cliente_id,
+                   MAX(COALESCE(NULLIF(TRIM(c.nombre), ''), u.email, '—')),
+                   COUNT(*), COALESCE(SUM(p.total), 0)
+            FROM factura f
+            JOIN pedido p ON p.id = f.pedido_id
+            LEFT JOIN cliente c ON c.id = p.cliente_id
+            LEFT JOIN usuario u ON u.id = c.usuario_id
+            WHERE f.fecha IS NOT NULL
+            GROUP BY {dia_f}, p.cliente_id
+        """)
+        for dimension, tabla, col in (("producto", "producto", "producto_id"), ("sabor", "sabor", "sabor_id")):
+            cur.execute(insert_dim + f"""
+                SELECT {dia_f}, '{dimension}', dp.{col},
+                       MAX(COALESCE(NULLIF(TRIM(t.nombre), ''), '—')),
+                       COUNT(DISTINCT p.id), COALESCE(SUM(dp.sub_total), 0)
+                FROM factura f
+                JOIN pedido p          ON p.id = f.pedido_id
+                JOIN detalle_pedido dp ON dp.pedido_id = p.id
+                LEFT JOIN {tabla} t    ON t.id = dp.{col}
+                WHERE f.fecha IS NOT NULL
+                GROUP BY {dia_f}, dp.{col}
+            """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_kardex_tope'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+"""
+Llena `busqueda_termino` con los clientes y proveedores existentes: 0004 la
+creó vacía y las búsquedas (filtro_sql / filtro_orm) solo leen de ahí. La
+normalización de services_busqueda está copiada aquí para que la migración
+no dependa del código vivo (después se repara con `manage.py
+indice_busqueda`). Las tablas son legadas, así que cada entidad se omite si
+faltan sus tablas.
+"""
+import re
+import unicodedata
+
+from django.db import migrations
+
+MAX_TERMINO = 64
+BLOQUE = 1000
+_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# entidad -> (tablas requeridas, SELECT id + textos + teléfonos por bloque de id)
+ENTIDADES = {
+    "cliente": ({"cliente", "usuario"}, """
+        SELECT c.id, c.nombre, u.nombre, u.email, c.telefono, u.telefono
+        FROM cliente c
+        LEFT JOIN usuario u ON u.id = c.usuario_id
+        WHERE c.id > %s ORDER BY c.id LIMIT %s
+    """, 3),
+    "proveedor": ({"proveedor"}, """
+        SELECT id, nombre, direccion, telefono
+        FROM proveedor
+        WHERE id > %s ORDER BY id LIMIT %s
+    """, 2),
+}
+
+
+def _palabras(texto):
+    if not texto:
+        return set()
+    s = unicodedata.normalize("NFKD", str(texto))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    return {p[:MAX_TERMINO] for p in _NO_ALNUM.split(s) if p}
+
+
+def _terminos(textos, telefonos):
+    terms = set()
+    for t in textos:
+        terms |= _palabras(t)
+    for tel in telefonos:
+        # "+591 700-12345" también se encuentra como "70012345"
+        digitos = re.sub(r"\D", "", tel or "")
+        if digitos:
+            terms.add(digitos[:MAX_TERMINO])
+            if digitos.startswith("591") and len(digitos) > 3:
+                terms.add(digitos[3:MAX_TERMINO + 3])
+    return terms
+
+
+def llenar(apps, schema_editor):
+    TerminoBusqueda = apps.get_model("accounts", "TerminoBusqueda")
+    conexion = schema_editor.connection
+    tablas = set(conexion.introspection.table_names())
+    for entidad, (requeridas, sql, n_textos) in ENTIDADES.items():
+        if not requeridas <= tablas:
+            continue
+        ultimo = 0
+        while True:
+            with conexion.cursor() as cur:
+                cur.execute(sql, [ultimo, BLOQUE])
+                filas = cur.fetchall()
+            if not filas:
+                break
+            ids = [f[0] for f in filas]
+            TerminoBusqueda.objects.filter(entidad=entidad, entidad_id__in=ids).delete()
+            TerminoBusqueda.objects.bulk_create(
+                [
+                    TerminoBusqueda(entidad=entidad, entidad_id=f[0], termino=t)
+                    for f in filas
+                    for t in _terminos(f[1:1 + n_textos], f[1 + n_textos:])
+                ],
+                batch_size=1000,
+            )
+            ultimo = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_llenar_resumen_ventas'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar, migrations.RunPython.noop),
+    ]
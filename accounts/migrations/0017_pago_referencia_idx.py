@@ -0,0 +1,59 @@
+"""
+Índice en `pago.referencia`: el worker de Stripe (services_stripe) busca por
+referencia = id de la sesión antes de registrar cada pago, para no duplicar
+los que registró el flujo anterior (pago_exitoso). Mismo criterio que 0003;
+`pago` es legada, así que se omite si no existe.
+"""
+from django.db import migrations
+
+
+INDICES = [
+    # (tabla, nombre, columnas)
+    ("pago", "pago_referencia_idx", ("referencia",)),
+]
+
+
+def _indices_existentes(cursor, tabla):
+    cursor.execute("""
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+    """, [tabla])
+    return {nombre: tuple(cols.split(",")) for nombre, cols in cursor.fetchall()}
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    tablas = set(schema_editor.connection.introspection.table_names())
+    with schema_editor.connection.cursor() as cur:
+        for tabla, nombre, columnas in INDICES:
+            if tabla not in tablas:
+                continue
+            existentes = _indices_existentes(cur, tabla)
+            if nombre in existentes:
+                continue
+            if any(cols[:len(columnas)] == columnas for cols in existentes.values()):
+                continue
+            cur.execute(f"CREATE INDEX {nombre} ON {tabla} ({', '.join(columnas)})")
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    with schema_editor.connection.cursor() as cur:
+        for tabla, nombre, _ in INDICES:
+            if nombre in _indices_existentes(cur, tabla):
+                cur.execute(f"DROP INDEX {nombre} ON {tabla}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_llenar_busqueda_termino'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -0,0 +1,92 @@
+"""
+Llena `costo_insumo` con las compras existentes: 0006 la creó vacía y las
+recetas (y la valuación FIFO como respaldo) leen el costo de ahí. Mismo
+cálculo que services_costos.refrescar_todo, copiado aquí para que la
+migración no dependa del código vivo. Las tablas de compras e inventario
+son legadas, así que se omite si no existen.
+"""
+from decimal import Decimal
+
+from django.db import migrations
+
+TABLAS = {"compra", "compra_detalle", "insumo", "kardex"}
+CERO = Decimal("0")
+Q = Decimal("0.0001")
+
+
+def _ultimo(compras, stock):
+    return compras[0][1] if compras else CERO
+
+
+def _promedio(compras, stock):
+    cant = sum((c for c, _ in compras), CERO)
+    if cant <= 0:
+        return _ultimo(compras, stock)
+    return sum((c * u for c, u in compras), CERO) / cant
+
+
+def _fifo(compras, stock):
+    if not compras:
+        return CERO
+    restante = stock
+    for cant, costo in compras:
+        if restante <= cant:
+            return costo
+        restante -= cant
+    return compras[-1][1]
+
+
+def llenar(apps, schema_editor):
+    conexion = schema_editor.connection
+    if not TABLAS <= set(conexion.introspection.table_names()):
+        return
+    with conexion.cursor() as cur:
+        # Compras de la más reciente a la más antigua, por insumo
+        cur.execute("""
+            SELECT cd.insumo_id, cd.cantidad, cd.costo_unitario
+            FROM compra_detalle cd
+            JOIN compra c ON c.id = cd.compra_id
+            ORDER BY cd.insumo_id, c.fecha DESC, cd.compra_id DESC
+        """)
+        compras = {}
+        for ins, cant, costo in cur.fetchall():
+            compras.setdefault(ins, []).append((Decimal(str(cant or 0)), Decimal(str(costo or 0))))
+        if not compras:
+            return
+        cur.execute("""
+            SELECT insumo_id, SUM(CASE
+                WHEN tipo = 'ENTRADA' THEN cantidad
+                WHEN tipo = 'SALIDA'  THEN -cantidad
+                WHEN tipo = 'AJUSTE'  THEN cantidad
+                ELSE 0 END)
+            FROM kardex
+            GROUP BY insumo_id
+        """)
+        stock = {ins: Decimal(str(s or 0)) for ins, s in cur.fetchall()}
+
+    CostoInsumo = apps.get_model("accounts", "CostoInsumo")
+    objs = []
+    for ins, filas in compras.items():
+        existencia = max(stock.get(ins, CERO), CERO)
+        objs.append(CostoInsumo(
+            insumo_id=ins,
+            ultimo=_ultimo(filas, existencia).quantize(Q),
+            promedio=_promedio(filas, existencia).quantize(Q),
+            fifo=_fifo(filas, existencia).quantize(Q),
+        ))
+    unico = ["insumo_id"] if conexion.features.supports_update_conflicts_with_target else None
+    CostoInsumo.objects.bulk_create(
+        objs, batch_size=500, update_conflicts=True,
+        unique_fields=unico, update_fields=["ultimo", "promedio", "fifo", "actualizado_en"],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_pago_referencia_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# accounts/models_bitacora.py
+from django.db import models
+
+
+# ============================
+# Archivo de bitácora
+# Tabla propia de la app (managed=True): registro de las tablas mensuales
+# `bitacora_AAAAMM` que escribe el comando `archivar_bitacora`.
+# ============================
+
+class BitacoraArchivo(models.Model):
+    """Una tabla de archivo por mes (mes = día 1 del mes, hora local)."""
+    mes = models.DateField(unique=True)
+    tabla = models.CharField(max_length=64)
+    filas = models.BigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'bitacora_archivo'
+        ordering = ['-mes']
+
+    def __str__(self):
+        return f"{self.tabla} ({self.filas} filas)"
@@ -0,0 +1,29 @@
+# accounts/models_busqueda.py
+from django.db import models
+
+
+# ============================
+# Índice de búsqueda (clientes / proveedores)
+# Tabla propia de la app (managed=True). Una fila por palabra normalizada
+# (minúsculas, sin tildes) de cada entidad; se mantiene con services_busqueda
+# y se reconstruye con el comando `indice_busqueda`.
+# ============================
+
+class TerminoBusqueda(models.Model):
+    ENTIDADES = (
+        ("cliente", "Cliente"),
+        ("proveedor", "Proveedor"),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    entidad = models.CharField(max_length=10, choices=ENTIDADES)
+    entidad_id = models.BigIntegerField()
+    termino = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = 'busqueda_termino'
+        unique_together = (('entidad', 'entidad_id', 'termino'),)
+        indexes = [models.Index(fields=['entidad', 'termino'], name='busqueda_termino_idx')]
+
+    def __str__(self):
+        return f"{self.entidad}:{self.entidad_id} {self.termino}"
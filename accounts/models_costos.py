@@ -0,0 +1,23 @@
+# accounts/models_costos.py
+from django.db import models
+
+
+# ============================
+# Costos por insumo (caché)
+# Tabla propia de la app (managed=True). La mantiene services_costos al
+# guardar compras; se reconstruye con el comando `costos_insumos`.
+# ============================
+
+class CostoInsumo(models.Model):
+    """Costo unitario de un insumo según cada método de valuación."""
+    insumo_id = models.IntegerField(primary_key=True)
+    ultimo = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    promedio = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    fifo = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'costo_insumo'
+
+    def __str__(self):
+        return f"insumo {self.insumo_id}: {self.ultimo}"
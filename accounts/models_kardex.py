@@ -0,0 +1,42 @@
+# accounts/models_kardex.py
+from django.db import models
+
+
+# ============================
+# Cortes de saldo del kardex
+# Tabla propia de la app (managed=True). Un saldo por insumo por cierre;
+# la escribe el comando `cerrar_kardex` (services_kardex.cerrar_saldos).
+# ============================
+
+class KardexCorte(models.Model):
+    """
+    Saldo de un insumo sumando todos los movimientos con id <= ultimo_kardex_id.
+    El stock actual es este saldo + los movimientos con id posterior.
+    """
+    id = models.BigAutoField(primary_key=True)
+    insumo_id = models.IntegerField()
+    fecha_corte = models.DateTimeField()
+    ultimo_kardex_id = models.BigIntegerField(default=0)
+    saldo = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+
+    class Meta:
+        db_table = 'kardex_corte'
+        unique_together = (('insumo_id', 'fecha_corte'),)
+        ordering = ['-fecha_corte']
+
+    def __str__(self):
+        return f"insumo {self.insumo_id} @ {self.fecha_corte}: {self.saldo}"
+
+
+class KardexTope(models.Model):
+    """
+    Hasta qué id de kardex se puede cerrar (una sola fila). `tope_kardex_id`
+    es el MAX(id) visto en `tope_en`; pasado el margen se usa como tope del
+    siguiente corte, así los INSERT de transacciones aún abiertas al mirarlo
+    ya están confirmados cuando se suman.
+    """
+    tope_kardex_id = models.BigIntegerField(default=0)
+    tope_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'kardex_tope'
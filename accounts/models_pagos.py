@@ -0,0 +1,23 @@
+# accounts/models_pagos.py
+from django.db import models
+
+
+# ============================
+# Pagado por pedido (resumen)
+# Tabla propia de la app (managed=True). La mantiene services_pagos en la
+# misma transacción que cada INSERT en `pago`; se reconstruye con el
+# comando `saldos_pedidos`.
+# ============================
+
+class SaldoPedido(models.Model):
+    """Suma de pagos de un pedido. El saldo es pedido.total - pagado."""
+    pedido_id = models.IntegerField(primary_key=True)
+    pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pagos = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'pedido_saldo'
+
+    def __str__(self):
+        return f"pedido {self.pedido_id}: {self.pagado}"
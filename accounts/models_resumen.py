@@ -0,0 +1,53 @@
+# accounts/models_resumen.py
+from django.db import models
+
+
+# ============================
+# Resúmenes materializados para reportes (CU23 / CU27)
+# Tablas propias de la app (managed=True): las crea `migrate`.
+# Se mantienen con services_resumen_ventas y el comando `resumen_ventas`.
+# ============================
+
+class VentaDiaria(models.Model):
+    """CU23: una fila por día de creación de pedido (estado CONFIRMADO/ENTREGADO)."""
+    fecha = models.DateField(primary_key=True)
+    pedidos = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'resumen_venta_diaria'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha}: {self.pedidos} pedidos / {self.total}"
+
+
+class VentaDiariaDimension(models.Model):
+    """
+    CU27: ventas facturadas por día de factura, desglosadas por dimensión.
+    `clave` es cliente_id / producto_id / sabor_id (0 para la dimensión 'dia').
+    """
+    DIMENSIONES = (
+        ("dia", "Día"),
+        ("cliente", "Cliente"),
+        ("producto", "Producto"),
+        ("sabor", "Sabor"),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    fecha = models.DateField()
+    dimension = models.CharField(max_length=10, choices=DIMENSIONES)
+    clave = models.BigIntegerField(default=0)
+    etiqueta = models.CharField(max_length=200)
+    ventas = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'resumen_venta_dimension'
+        unique_together = (('fecha', 'dimension', 'clave'),)
+        indexes = [models.Index(fields=['dimension', 'fecha'], name='resumen_dim_fecha_idx')]
+
+    def __str__(self):
+        return f"{self.fecha} · {self.dimension} · {self.etiqueta}"
@@ -0,0 +1,39 @@
+# accounts/models_stripe.py
+from django.db import models
+
+
+# ============================
+# Bandeja de eventos de Stripe (webhook)
+# Tabla propia de la app (managed=True). El webhook guarda cada evento
+# verificado con un solo INSERT; el comando `procesar_stripe` los aplica.
+# ============================
+
+class EventoStripe(models.Model):
+    PENDIENTE = "PENDIENTE"
+    PROCESADO = "PROCESADO"
+    IGNORADO = "IGNORADO"
+    ERROR = "ERROR"
+    ESTADOS = (
+        (PENDIENTE, "Pendiente"),
+        (PROCESADO, "Procesado"),
+        (IGNORADO, "Ignorado"),
+        (ERROR, "Error"),
+    )
+
+    evento_id = models.CharField(max_length=255, unique=True)   # evt_... (idempotencia)
+    tipo = models.CharField(max_length=100)
+    objeto_id = models.CharField(max_length=255, blank=True, default="", db_index=True)  # cs_... / pi_...
+    payload = models.TextField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    recibido_en = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'stripe_evento'
+        ordering = ['-id']
+        indexes = [models.Index(fields=['estado', 'id'], name='stripe_evento_estado_idx')]
+
+    def __str__(self):
+        return f"{self.evento_id} · {self.tipo} · {self.estado}"
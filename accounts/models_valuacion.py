@@ -0,0 +1,62 @@
+# accounts/models_valuacion.py
+from django.db import models
+
+
+# ============================
+# Valuación FIFO del inventario
+# Tablas propias de la app (managed=True), derivadas de kardex +
+# compra_detalle por services_valuacion. Se pueden borrar y reconstruir.
+# ============================
+
+class CapaFifo(models.Model):
+    """Capa de costo: una entrada de kardex y lo que queda de ella."""
+    kardex_id = models.BigIntegerField(primary_key=True)
+    insumo_id = models.IntegerField()
+    fecha = models.DateTimeField(null=True, blank=True)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=3)
+    restante = models.DecimalField(max_digits=12, decimal_places=3)
+    costo_unitario = models.DecimalField(max_digits=14, decimal_places=4)
+
+    class Meta:
+        db_table = 'fifo_capa'
+        indexes = [
+            models.Index(fields=['insumo_id', 'kardex_id'], name='fifo_capa_insumo_idx'),
+        ]
+
+    def __str__(self):
+        return f"capa {self.kardex_id} insumo {self.insumo_id}: {self.restante}/{self.cantidad}"
+
+
+class ConsumoFifo(models.Model):
+    """Parte de una salida de kardex valuada contra una capa (capa nula = sin costo conocido)."""
+    kardex_id = models.BigIntegerField()
+    capa_kardex_id = models.BigIntegerField(null=True, blank=True)
+    insumo_id = models.IntegerField()
+    fecha = models.DateTimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=7)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=3)
+    costo_unitario = models.DecimalField(max_digits=14, decimal_places=4)
+
+    class Meta:
+        db_table = 'fifo_consumo'
+        indexes = [
+            models.Index(fields=['fecha'], name='fifo_consumo_fecha_idx'),
+            models.Index(fields=['insumo_id', 'fecha'], name='fifo_consumo_insumo_idx'),
+            models.Index(fields=['kardex_id'], name='fifo_consumo_kardex_idx'),
+        ]
+
+
+class ValuacionCorte(models.Model):
+    """
+    Hasta qué movimiento de kardex se procesó la valuación (una sola fila).
+    `hasta_kardex_id` es el tope que ya se puede valuar; `tope_kardex_id` el
+    MAX(id) visto en `tope_en`, que pasa a tope valuable pasado el margen.
+    """
+    ultimo_kardex_id = models.BigIntegerField(default=0)
+    hasta_kardex_id = models.BigIntegerField(default=0)
+    tope_kardex_id = models.BigIntegerField(default=0)
+    tope_en = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'fifo_corte'
@@ -0,0 +1,154 @@
+# accounts/paginacion.py
+"""
+Paginación por llave (keyset / seek) para listados grandes.
+
+En vez de `OFFSET n` + `COUNT(*)` (Paginator), cada página pide las filas
+que siguen a la última mostrada según el orden `(campo, id)`:
+
+    WHERE (fecha < %s) OR (fecha = %s AND id < %s) ORDER BY fecha DESC, id DESC LIMIT n+1
+
+así una página profunda cuesta lo mismo que la primera. Los enlaces llevan
+un cursor firmado (`?despues=` / `?antes=`) con la llave de la fila borde y,
+opcionalmente, un dato extra de la vista (p.ej. el saldo acumulado).
+
+El total es opcional: exacto, aproximado (estimación de la tabla o conteo
+con tope) o ninguno.
+"""
+from django.core import signing
+from django.db import connection
+from django.db.models import Q
+
+_SALT = "accounts.paginacion"
+TOPE_CONTEO = 10000
+
+
+def tabla_estimada(model) -> int | None:
+    """Filas estimadas por el motor (MySQL: information_schema, sin recorrer la tabla)."""
+    if connection.vendor != "mysql":
+        return None
+    with connection.cursor() as cur:
+        cur.execute("""
+            SELECT table_rows FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, [model._meta.db_table])
+        fila = cur.fetchone()
+    return int(fila[0]) if fila and fila[0] is not None else None
+
+
+class PaginaKeyset:
+    """
+    Página de `qs` ordenada por `orden` = (campo, "id"), ambos ASC o ambos DESC
+    (p.ej. ("-fecha", "-id") o ("nombre", "id")). `campo` puede ser nulo: se
+    sigue la regla de MySQL (NULL es el menor valor).
+
+    `conteo`: "exacto" | "aprox" | None. Con "aprox" se usa la estimación de
+    la tabla si el queryset no tiene filtros y, si no, un conteo con tope.
+
+    En plantillas: object_list, has_next, has_previous, url_inicio,
+    url_siguiente, url_anterior, total, total_aprox (ver partials/paginacion.html).
+    """
+
+    def __init__(self, request, qs, orden=("-fecha", "-id"), por_pagina: int = 20, conteo: str | None = "aprox"):
+        self.request = request
+        self.por_pagina = por_pagina
+        self.desc = orden[0].startswith("-")
+        self.campo = orden[0].lstrip("-")
+        self._campo_modelo = qs.model._meta.get_field(self.campo)
+        self.extra = None            # dato extra que trajo el cursor
+        self.extra_siguiente = None  # la vista los fija antes de renderizar
+        self.extra_anterior = None
+
+        self.direccion, llave = self._leer_cursor()
+        if self.direccion == "antes":
+            filas = list(qs.filter(self._seek(llave, not self.desc)).order_by(*self._orden(invertido=True))[:por_pagina + 1])
+            self.has_previous = len(filas) > por_pagina
+            self.has_next = True
+            self.object_list = list(reversed(filas[:por_pagina]))
+        else:
+            base = qs.filter(self._seek(llave, self.desc)) if llave else qs
+            filas = list(base.order_by(*self._orden())[:por_pagina + 1])
+            self.has_next = len(filas) > por_pagina
+            self.has_previous = llave is not None
+            self.object_list = filas[:por_pagina]
+
+        self.total, self.total_aprox = self._contar(qs, conteo)
+
+    # ---- orden / filtro ----
+    def _orden(self, invertido: bool = False):
+        desc = self.desc != invertido
+        signo = "-" if desc else ""
+        return (f"{signo}{self.campo}", f"{signo}id")
+
+    def _seek(self, llave, hacia_menores: bool) -> Q:
+        """Filas estrictamente después de `llave` avanzando hacia valores menores (o mayores)."""
+        valor, pk = llave
+        c = self.campo
+        op = "lt" if hacia_menores else "gt"
+        if valor is None:
+            mismo = Q(**{f"{c}__isnull": True, f"id__{op}": pk})
+            # Bajando, NULL es el final; subiendo, todo valor no nulo viene después
+            return mismo if hacia_menores else mismo | Q(**{f"{c}__isnull": False})
+        siguiente = Q(**{f"{c}__{op}": valor}) | Q(**{c: valor, f"id__{op}": pk})
+        if hacia_menores and self._campo_modelo.null:
+            siguiente |= Q(**{f"{c}__isnull": True})
+        return siguiente
+
+    # ---- cursores ----
+    def _leer_cursor(self):
+        for direccion in ("despues", "antes"):
+            token = self.request.GET.get(direccion)
+            if not token:
+                continue
+            try:
+                valor, pk, extra = signing.loads(token, salt=_SALT)
+                self.extra = extra
+                return direccion, (self._campo_modelo.to_python(valor), int(pk))
+            except (signing.BadSignature, ValueError, TypeError):
+                break
+        return "", None
+
+    def _token(self, obj, extra) -> str:
+        valor = getattr(obj, self.campo)
+        valor = valor.isoformat() if hasattr(valor, "isoformat") else valor
+        if valor is not None and not isinstance(valor, (str, int)):
+            valor = str(valor)
+        return signing.dumps([valor, obj.pk, extra], salt=_SALT, compress=True)
+
+    def _url(self, direccion: str | None = None, obj=None, extra=None) -> str:
+        q = self.request.GET.copy()
+        for k in ("despues", "antes", "page"):
+            q.pop(k, None)
+        if direccion:
+            q[direccion] = self._token(obj, extra)
+        return f"?{q.urlencode()}"
+
+    @property
+    def url_inicio(self) -> str:
+        return self._url()
+
+    @property
+    def url_siguiente(self) -> str:
+        if not (self.has_next and self.object_list):
+            return ""
+        return self._url("despues", self.object_list[-1], self.extra_siguiente)
+
+    @property
+    def url_anterior(self) -> str:
+        if not self.has_previous:
+            return ""
+        if not self.object_list:
+            return self.url_inicio
+        return self._url("antes", self.object_list[0], self.extra_anterior)
+
+    # ---- total ----
+    def _contar(self, qs, conteo):
+        if conteo == "exacto":
+            return qs.count(), False
+        if conteo != "aprox":
+            return None, False
+        if not qs.query.where:
+            estimado = tabla_estimada(qs.model)
+            if estimado is not None:
+                return estimado, True
+        n = qs.order_by()[:TOPE_CONTEO + 1].count()
+        return (TOPE_CONTEO, True) if n > TOPE_CONTEO else (n, False)
@@ -1,15 +1,101 @@
 # accounts/permissions.py
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.shortcuts import redirect
-from django.db import connection
-from decimal import Decimal
 
-from .models_db import Usuario, UsuarioRol, RolPermiso, Pedido
+from .models_db import RolPermiso, Pedido
+from .services_pagos import tiene_pagos
 
 
 
+# -------------------------------------------------
+# Caché de permisos por usuario
+# -------------------------------------------------
+# Cada usuario tiene su conjunto de códigos de permiso guardado en el
+# backend de caché (TTL configurable). Al cambiar roles/permisos se
+# invalida: por usuario (usuario_rol) o global subiendo la "generación"
+# (rol_permiso), lo que deja huérfanas todas las claves anteriores.
+PERMISOS_CACHE_TTL = getattr(settings, "PERMISOS_CACHE_TTL", 300)
+_GEN_KEY = "permisos:gen"
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _contar(clave: str):
+    with _stats_lock:
+        _stats[clave] += 1
+
+
+def _cache_key(email: str) -> str:
+    gen = cache.get_or_set(_GEN_KEY, 1, None)
+    return f"permisos:{gen}:{email}"
+
+
+def permisos_de_usuario(email: str) -> frozenset:
+    """
+    Conjunto de códigos de permiso del usuario (tabla `usuario`) con ese email.
+    Una sola consulta rol_permiso ⨝ usuario_rol ⨝ usuario en caso de miss.
+    """
+    email = (email or "").strip().lower()
+    if not email:
+        return frozenset()
+
+    key = _cache_key(email)
+    codigos = cache.get(key)
+    if codigos is not None:
+        _contar("hits")
+        return codigos
+
+    _contar("misses")
+    codigos = frozenset(
+        RolPermiso.objects
+        .filter(rol__usuariorol__usuario__email=email)
+        .values_list("permiso__codigo", flat=True)
+    )
+    cache.set(key, codigos, PERMISOS_CACHE_TTL)
+    return codigos
+
+
+def invalidar_permisos(email: str | None = None):
+    """
+    Invalida la caché de permisos de un usuario, o de todos si no se pasa email.
+    """
+    if email:
+        cache.delete(_cache_key(email.strip().lower()))
+        return
+    try:
+        cache.incr(_GEN_KEY)
+    except ValueError:
+        # la generación expiró o nunca se creó
+        cache.set(_GEN_KEY, 2, None)
+
+
+def permisos_cache_stats() -> dict:
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def tiene_permiso(request, codigo_permiso: str) -> bool:
+    """Chequeo en memoria; resuelve el set de permisos una vez por request."""
+    permisos = getattr(request, "_permisos", None)
+    if permisos is None:
+        permisos = permisos_de_usuario(getattr(request.user, "email", ""))
+        request._permisos = permisos
+    return codigo_permiso in permisos
+
+
 # -------------------------------------------------
 # Permisos por código (lo que ya tenías)
 # -------------------------------------------------
@@ -21,17 +107,7 @@ def requiere_permiso(codigo_permiso):
                 from django.contrib.auth.views import redirect_to_login
                 return redirect_to_login(request.get_full_path())
 
-            email = (request.user.email or "").lower()
-            try:
-                u = Usuario.objects.get(email=email)
-                tiene = RolPermiso.objects.filter(
-                    rol__in=UsuarioRol.objects.filter(usuario=u).values("rol"),
-                    permiso__codigo=codigo_permiso,
-                ).exists()
-            except Usuario.DoesNotExist:
-                tiene = False
-
-            if not tiene:
+            if not tiene_permiso(request, codigo_permiso):
                 raise PermissionDenied("No tienes permiso.")
             return view(request, *args, **kwargs)
         return inner
@@ -67,12 +143,6 @@ def permission_required_any(*perms):
 # Nuevo: permitir editar pedido si es dueño o staff,
 # el pedido no está finalizado y no tiene pagos.
 # -------------------------------------------------
-def _pedido_tiene_pagos(pedido_id: int) -> bool:
-    with connection.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(monto),0) FROM pago WHERE pedido_id=%s", [pedido_id])
-        (s,) = cur.fetchone()
-        return Decimal(str(s or 0)) > 0
-
 def owner_or_staff_pedido(view_func):
     """
     Deja pasar si:
@@ -105,7 +175,7 @@ def owner_or_staff_pedido(view_func):
             messages.info(request, "Este pedido ya está finalizado y no se puede editar.")
             return redirect("pedido_detalle", pedido_id=p.id)
 
-        if _pedido_tiene_pagos(p.id):
+        if tiene_pagos(p.id):
             messages.info(request, "Este pedido ya tiene pagos registrados y no se puede editar.")
             return redirect("pedido_detalle", pedido_id=p.id)
 
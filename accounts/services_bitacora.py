@@ -0,0 +1,180 @@
+# accounts/services_bitacora.py
+import atexit
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+
+class AuditQueue:
+    """
+    Cola en memoria para la bitácora.
+    - `put()` nunca bloquea el request: si el buffer está lleno, descarta y cuenta.
+    - Un hilo de fondo junta eventos y los escribe con bulk_create cada
+      `batch_size` eventos o cada `flush_ms` milisegundos (lo que ocurra primero).
+    - Los ids de `usuario` se resuelven por email con una caché local.
+    - Al terminar el proceso (atexit) se vacía lo pendiente.
+    """
+
+    USUARIO_TTL = 300  # segundos que recordamos email -> usuario_id
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = 100, flush_ms: int = 500):
+        self.batch_size = max(1, batch_size)
+        self.flush_s = max(flush_ms, 1) / 1000.0
+        self._q = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._usuarios: dict[str, tuple[int, float]] = {}
+        self.encolados = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.errores = 0
+
+    # ---------- productor ----------
+    def put(self, evento: dict) -> bool:
+        self._ensure_worker()
+        try:
+            self._q.put_nowait(evento)
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+            return False
+        with self._lock:
+            self.encolados += 1
+        return True
+
+    def _ensure_worker(self):
+        # Tras un fork (gunicorn --preload) el hilo del padre no existe en el hijo.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="bitacora-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    # ---------- consumidor ----------
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self.write(batch)
+                # El hilo tiene su propia conexión; no la dejamos abierta entre lotes.
+                connection.close()
+
+    def _drain(self, block: bool) -> list[dict]:
+        batch: list[dict] = []
+        try:
+            batch.append(self._q.get(timeout=self.flush_s) if block else self._q.get_nowait())
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_s
+        while len(batch) < self.batch_size:
+            restante = deadline - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=restante) if block else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _usuario_ids(self, emails: set[str]) -> dict[str, int]:
+        from .models_db import Usuario
+
+        ahora = time.monotonic()
+        ids: dict[str, int] = {}
+        faltan = []
+        for e in emails:
+            hit = self._usuarios.get(e)
+            if hit and hit[1] > ahora:
+                ids[e] = hit[0]
+            else:
+                faltan.append(e)
+
+        if faltan:
+            for email, uid in Usuario.objects.filter(email__in=faltan).values_list("email", "id"):
+                email = (email or "").lower()
+                ids[email] = uid
+                self._usuarios[email] = (uid, ahora + self.USUARIO_TTL)
+        return ids
+
+    def write(self, batch: list[dict]):
+        """Escribe un lote en `bitacora`. Nunca propaga errores."""
+        from .models_db import Bitacora
+
+        try:
+            ids = self._usuario_ids({ev["email"] for ev in batch if ev.get("email")})
+            objs = [
+                Bitacora(
+                    usuario_id=ids.get(ev.get("email")),
+                    entidad=ev["entidad"],
+                    entidad_id=ev["entidad_id"],
+                    accion=ev["accion"],
+                    ip=ev["ip"],
+                    fecha=ev["fecha"],
+                )
+                for ev in batch
+            ]
+        except Exception:
+            with self._lock:
+                self.errores += len(batch)
+            return
+
+        try:
+            Bitacora.objects.bulk_create(objs)
+            ok = len(objs)
+        except Exception:
+            # Una fila mala (p.ej. usuario NULL) no debe tumbar el lote entero:
+            # reintentamos fila por fila como hacía la versión síncrona.
+            ok = 0
+            for obj in objs:
+                try:
+                    obj.save(force_insert=True)
+                    ok += 1
+                except Exception:
+                    pass
+
+        with self._lock:
+            self.escritos += ok
+            self.errores += len(objs) - ok
+
+    def flush(self):
+        """Vacía la cola en el hilo actual."""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                break
+            self.write(batch)
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "encolados": self.encolados,
+                "escritos": self.escritos,
+                "descartados": self.descartados,
+                "errores": self.errores,
+                "pendientes": self._q.qsize(),
+            }
+
+
+cola_bitacora = AuditQueue(
+    maxsize=getattr(settings, "AUDIT_QUEUE_MAXSIZE", 10000),
+    batch_size=getattr(settings, "AUDIT_BATCH_SIZE", 100),
+    flush_ms=getattr(settings, "AUDIT_FLUSH_MS", 500),
+)
@@ -0,0 +1,159 @@
+# accounts/services_bitacora_archivo.py
+"""
+Archivo de la bitácora en tablas mensuales.
+
+La tabla `bitacora` (la que recibe los inserts) solo guarda los últimos
+AUDIT_RETENCION_DIAS días. `archivar()` mueve lo anterior, por lotes cortos
+(INSERT ... SELECT + DELETE por id en una transacción), a `bitacora_AAAAMM`
+(misma estructura, creada con LIKE) y lo anota en `bitacora_archivo`.
+`buscar()` consulta el archivo por usuario, entidad y rango de fechas,
+tocando solo las tablas de los meses del rango.
+"""
+import time
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models_bitacora import BitacoraArchivo
+from .services_reportes import a_dia_local, inicio_dia, limites_rango, rango_fechas
+
+COLUMNAS = "id, usuario_id, entidad, entidad_id, accion, ip, fecha"
+
+
+def _mes(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _mes_siguiente(m: date) -> date:
+    return (m.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def tabla_mes(m: date) -> str:
+    return f"bitacora_{m:%Y%m}"
+
+
+# -------------------------------------------------------------------
+# Archivado
+# -------------------------------------------------------------------
+def _hay_filas(desde, hasta) -> bool:
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1 FROM bitacora WHERE fecha >= %s AND fecha < %s LIMIT 1", [desde, hasta])
+        return cur.fetchone() is not None
+
+
+@transaction.atomic
+def _mover_lote(tabla: str, desde, hasta, lote: int) -> int:
+    with connection.cursor() as cur:
+        cur.execute("""
+            SELECT id FROM bitacora
+            WHERE fecha >= %s AND fecha < %s
+            ORDER BY fecha, id
+            LIMIT %s
+            FOR UPDATE
+        """, [desde, hasta, lote])
+        ids = [r[0] for r in cur.fetchall()]
+        if not ids:
+            return 0
+        marcas = ", ".join(["%s"] * len(ids))
+        cur.execute(f"""
+            INSERT IGNORE INTO {tabla} ({COLUMNAS})
+            SELECT {COLUMNAS} FROM bitacora WHERE id IN ({marcas})
+        """, ids)
+        cur.execute(f"DELETE FROM bitacora WHERE id IN ({marcas})", ids)
+        return len(ids)
+
+
+def archivar(dias: int | None = None, lote: int = 5000, pausa: float = 0.0) -> dict[str, int]:
+    """
+    Mueve las filas con fecha anterior a hoy - `dias` (día local) a sus tablas
+    mensuales. Los lotes son cortos para no frenar los inserts de la tabla
+    activa; `pausa` (segundos) espacia los lotes. Devuelve {tabla: filas movidas}.
+    """
+    dias = settings.AUDIT_RETENCION_DIAS if dias is None else dias
+    corte = inicio_dia(timezone.localdate() - timedelta(days=max(dias, 0)))
+    with connection.cursor() as cur:
+        cur.execute("SELECT MIN(fecha) FROM bitacora WHERE fecha < %s", [corte])
+        primero = cur.fetchone()[0]
+    movidas: dict[str, int] = {}
+    if primero is None:
+        return movidas
+
+    mes = _mes(a_dia_local(primero))
+    while inicio_dia(mes) < corte:
+        desde = inicio_dia(mes)
+        hasta = min(inicio_dia(_mes_siguiente(mes)), corte)
+        if _hay_filas(desde, hasta):
+            tabla = tabla_mes(mes)
+            # DDL fuera de la transacción (en MySQL hace commit implícito)
+            with connection.cursor() as cur:
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {tabla} LIKE bitacora")
+            reg, _ = BitacoraArchivo.objects.get_or_create(mes=mes, defaults={"tabla": tabla})
+
+            total = 0
+            while True:
+                n = _mover_lote(tabla, desde, hasta, lote)
+                total += n
+                if n < lote:
+                    break
+                if pausa:
+                    time.sleep(pausa)
+            BitacoraArchivo.objects.filter(pk=reg.pk).update(filas=F("filas") + total)
+            movidas[tabla] = total
+        mes = _mes_siguiente(mes)
+    return movidas
+
+
+# -------------------------------------------------------------------
+# Consulta
+# -------------------------------------------------------------------
+def buscar(usuario_id: int | None = None, entidad: str | None = None, d1=None, d2=None,
+           limite: int = 200, incluir_activa: bool = True) -> list[dict]:
+    """
+    Eventos del archivo (y de la tabla activa) más recientes primero. Cada
+    tabla aporta a lo sumo `limite` filas por su índice de fecha; el UNION
+    se ordena y recorta al final.
+    """
+    conds, params = rango_fechas("fecha", d1, d2)
+    if usuario_id:
+        conds.append("usuario_id = %s")
+        params.append(usuario_id)
+    if entidad:
+        conds.append("entidad = %s")
+        params.append(entidad)
+    where = f"WHERE {' AND '.join(conds)}" if conds else ""
+
+    meses = BitacoraArchivo.objects.all()
+    inicio, fin = limites_rango(d1, d2)
+    if inicio:
+        meses = meses.filter(mes__gte=_mes(a_dia_local(inicio)))
+    if fin:
+        meses = meses.filter(mes__lte=a_dia_local(fin))
+    tablas = list(meses.values_list("tabla", flat=True))
+    if incluir_activa:
+        tablas.append("bitacora")
+    if not tablas:
+        return []
+
+    partes, todos = [], []
+    for t in tablas:
+        partes.append(f"(SELECT {COLUMNAS} FROM {t} {where} ORDER BY fecha DESC, id DESC LIMIT %s)")
+        todos += [*params, limite]
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT x.id, x.fecha, x.accion, x.entidad, x.entidad_id, x.ip, u.nombre, u.email
+            FROM ({" UNION ALL ".join(partes)}) x
+            LEFT JOIN usuario u ON u.id = x.usuario_id
+            ORDER BY x.fecha DESC, x.id DESC
+            LIMIT %s
+        """, [*todos, limite])
+        cols = [c[0] for c in cur.description]
+        filas = [dict(zip(cols, r)) for r in cur.fetchall()]
+    if settings.USE_TZ:
+        # El cursor crudo devuelve la fecha naive en UTC
+        for f in filas:
+            if f["fecha"] is not None and timezone.is_naive(f["fecha"]):
+                f["fecha"] = f["fecha"].replace(tzinfo=dt_timezone.utc)
+    return filas
@@ -0,0 +1,205 @@
+# accounts/services_busqueda.py
+"""
+Búsqueda de clientes y proveedores por palabras.
+
+`LIKE '%texto%'` no puede usar índices. En su lugar cada cliente/proveedor
+tiene sus palabras normalizadas (minúsculas, sin tildes) en `busqueda_termino`
+y la búsqueda exige que cada palabra escrita sea prefijo de alguna de ellas:
+"maria lo" encuentra a "María López". Cada palabra es un rango del índice
+(entidad, termino).
+
+Las vistas usan `filtro_sql` (SQL crudo) o `filtro_orm` (querysets). El índice
+se llena al migrar (0016), se mantiene desde signals / escrituras y se
+reconstruye con `indice_busqueda`.
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models_busqueda import TerminoBusqueda
+
+MAX_TERMINO = 64
+MAX_PALABRAS = 5  # palabras de la consulta que se consideran
+
+_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto: str | None) -> str:
+    """Minúsculas y sin tildes/diacríticos ('Ñandú' -> 'nandu')."""
+    if not texto:
+        return ""
+    s = unicodedata.normalize("NFKD", str(texto))
+    return "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+
+
+def palabras(texto: str | None) -> list[str]:
+    """Palabras normalizadas, sin repetir y en orden de aparición."""
+    vistas: dict[str, None] = {}
+    for p in _NO_ALNUM.split(normalizar(texto)):
+        if p:
+            vistas.setdefault(p[:MAX_TERMINO])
+    return list(vistas)
+
+
+def _terminos(*textos, telefonos=()) -> set[str]:
+    terms: set[str] = set()
+    for t in textos:
+        terms.update(palabras(t))
+    for tel in telefonos:
+        # "+591 700-12345" también se encuentra como "70012345"
+        digitos = re.sub(r"\D", "", tel or "")
+        if digitos:
+            terms.add(digitos[:MAX_TERMINO])
+            if digitos.startswith("591") and len(digitos) > 3:
+                terms.add(digitos[3:MAX_TERMINO + 3])
+    return terms
+
+
+# -------------------------------------------------------------------
+# Filtros para las vistas
+# -------------------------------------------------------------------
+def _palabras_consulta(q: str | None) -> list[str]:
+    return palabras(q)[:MAX_PALABRAS]
+
+
+def filtro_sql(entidad: str, col: str, q: str | None) -> tuple[str, list]:
+    """
+    Condición `col IN (...)` por cada palabra de `q` (todas deben coincidir).
+    `col` es la columna con el id de la entidad (p.ej. `p.cliente_id`).
+    Sin palabras útiles devuelve ("1=1", []).
+    """
+    conds, params = [], []
+    for p in _palabras_consulta(q):
+        conds.append(
+            f"{col} IN (SELECT bt.entidad_id FROM busqueda_termino bt "
+            f"WHERE bt.entidad = %s AND bt.termino LIKE %s)"
+        )
+        params.extend([entidad, p + "%"])
+    if not conds:
+        return "1=1", []
+    return "(" + " AND ".join(conds) + ")", params
+
+
+def filtro_orm(entidad: str, campo: str, q: str | None) -> Q:
+    """Igual que `filtro_sql` para querysets: `qs.filter(filtro_orm('cliente', 'cliente_id', q))`."""
+    cond = Q()
+    for p in _palabras_consulta(q):
+        ids = TerminoBusqueda.objects.filter(entidad=entidad, termino__startswith=p).values("entidad_id")
+        cond &= Q(**{f"{campo}__in": ids})
+    return cond
+
+
+# -------------------------------------------------------------------
+# Mantenimiento del índice
+# -------------------------------------------------------------------
+def _reemplazar(entidad: str, terminos_por_id: dict[int, set[str]], ids):
+    ids = list(ids)
+    if not ids:
+        return
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(entidad=entidad, entidad_id__in=ids).delete()
+        TerminoBusqueda.objects.bulk_create(
+            [
+                TerminoBusqueda(entidad=entidad, entidad_id=eid, termino=t)
+                for eid, terms in terminos_por_id.items()
+                for t in terms
+            ],
+            batch_size=1000,
+        )
+
+
+def _in(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def indexar_clientes(ids):
+    """(Re)indexa los clientes dados: nombre, teléfono y nombre/email del usuario."""
+    ids = [int(i) for i in ids if i]
+    if not ids:
+        return
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT c.id, c.nombre, c.telefono, u.nombre, u.email, u.telefono
+            FROM cliente c
+            LEFT JOIN usuario u ON u.id = c.usuario_id
+            WHERE c.id IN ({_in(ids)})
+        """, ids)
+        filas = cur.fetchall()
+    terminos = {
+        cid: _terminos(nombre, u_nombre, email, telefonos=(tel, u_tel))
+        for cid, nombre, tel, u_nombre, email, u_tel in filas
+    }
+    _reemplazar("cliente", terminos, ids)
+
+
+def indexar_clientes_de_usuario(usuario_id: int):
+    if not usuario_id:
+        return
+    with connection.cursor() as cur:
+        cur.execute("SELECT id FROM cliente WHERE usuario_id = %s", [usuario_id])
+        ids = [r[0] for r in cur.fetchall()]
+    indexar_clientes(ids)
+
+
+def indexar_proveedores(ids):
+    """(Re)indexa los proveedores dados: nombre, teléfono y dirección."""
+    ids = [int(i) for i in ids if i]
+    if not ids:
+        return
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT id, nombre, telefono, direccion
+            FROM proveedor
+            WHERE id IN ({_in(ids)})
+        """, ids)
+        filas = cur.fetchall()
+    terminos = {
+        pid: _terminos(nombre, direccion, telefonos=(tel,))
+        for pid, nombre, tel, direccion in filas
+    }
+    _reemplazar("proveedor", terminos, ids)
+
+
+def desindexar(entidad: str, entidad_id: int):
+    TerminoBusqueda.objects.filter(entidad=entidad, entidad_id=entidad_id).delete()
+
+
+INDEXADORES = {
+    "cliente": ("cliente", indexar_clientes),
+    "proveedor": ("proveedor", indexar_proveedores),
+}
+
+
+def reconstruir(entidad: str, bloque: int = 1000) -> int:
+    """Reindexa todas las filas de la entidad en bloques por id. Devuelve cuántas."""
+    tabla, indexar = INDEXADORES[entidad]
+    ultimo, total = 0, 0
+    while True:
+        with connection.cursor() as cur:
+            cur.execute(f"SELECT id FROM {tabla} WHERE id > %s ORDER BY id LIMIT %s", [ultimo, bloque])
+            ids = [r[0] for r in cur.fetchall()]
+        if not ids:
+            break
+        indexar(ids)
+        total += len(ids)
+        ultimo = ids[-1]
+    # Quita términos de filas que ya no existen
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            DELETE bt FROM busqueda_termino bt
+            LEFT JOIN {tabla} t ON t.id = bt.entidad_id
+            WHERE bt.entidad = %s AND t.id IS NULL
+        """, [entidad])
+    return total
+
+
+def al_confirmar(func, *args):
+    """Ejecuta `func(*args)` al confirmar la transacción; nunca propaga errores."""
+    def _run():
+        try:
+            func(*args)
+        except Exception:
+            pass
+    transaction.on_commit(_run)
@@ -0,0 +1,100 @@
+# accounts/services_catalogo.py
+"""
+Catálogo público en caché.
+
+Una "foto" del catálogo (sabores activos, productos activos con sus sabores
+y precios) se arma con tres consultas y se guarda en la caché `catalogo`
+(en disco: compartida por los procesos del mismo host). La página y la API
+se sirven desde la foto, con ETag = hash del contenido y Last-Modified =
+cuándo se armó. Los cambios en Sabor / Producto / ProductoSabor (admin u
+ORM) la borran al confirmar; la siguiente visita la vuelve a armar. Lo que
+las señales no ven (otro host, SQL directo) dura a lo sumo el TIMEOUT de la
+caché (`ttl()`).
+
+Cada sabor lleva además un sello `v` de su contenido: la plantilla cachea
+la tarjeta de cada sabor por (id, v), así solo se re-renderiza el que cambió.
+"""
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models_db import Producto, ProductoSabor, Sabor
+
+CACHE_ALIAS = "catalogo"
+CLAVE = "catalogo:foto"
+
+
+def cache_catalogo():
+    return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else "default"]
+
+
+def ttl() -> int:
+    """Segundos que vive la foto (y las tarjetas de la plantilla) en la caché."""
+    return cache_catalogo().default_timeout
+
+
+def _sello(*partes) -> str:
+    return hashlib.sha1(json.dumps(partes, default=str, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _construir() -> dict:
+    sabores = [
+        {"id": s_id, "nombre": nombre, "imagen": imagen, "v": _sello(nombre, imagen)}
+        for s_id, nombre, imagen in (
+            Sabor.objects.filter(activo=1).order_by("nombre").values_list("id", "nombre", "imagen")
+        )
+    ]
+    activos = {s["id"] for s in sabores}
+
+    por_producto: dict[int, list[int]] = {}
+    for prod, sab in ProductoSabor.objects.order_by("producto_id", "sabor_id").values_list("producto_id", "sabor_id"):
+        if sab in activos:
+            por_producto.setdefault(prod, []).append(sab)
+    productos = [
+        {
+            "id": p["id"],
+            "nombre": p["nombre"],
+            "precio_unitario": str(p["precio_unitario"]),
+            "descripcion": p["descripcion"] or "",
+            "imagen_url": p["imagen_url"] or "",
+            "sabores": por_producto.get(p["id"], []),
+        }
+        for p in Producto.objects.filter(activo=1).order_by("nombre").values(
+            "id", "nombre", "precio_unitario", "descripcion", "imagen_url"
+        )
+    ]
+    precio = str(Decimal(str(getattr(settings, "COOKIE_UNIT_PRICE_BS", 10))))
+    return {
+        "sabores": sabores,
+        "productos": productos,
+        "precio": precio,
+        "version": _sello(sabores, productos, precio),
+        "modificado": timezone.now().replace(microsecond=0),
+    }
+
+
+def foto() -> dict:
+    """Catálogo desde la caché (lo arma si no está)."""
+    c = cache_catalogo()
+    datos = c.get(CLAVE)
+    if datos is None:
+        datos = _construir()
+        c.set(CLAVE, datos)
+    return datos
+
+
+def invalidar():
+    cache_catalogo().delete(CLAVE)
+
+
+def a_json(datos: dict) -> dict:
+    return {
+        "version": datos["version"],
+        "precio_galleta": datos["precio"],
+        "sabores": [{k: s[k] for k in ("id", "nombre", "imagen")} for s in datos["sabores"]],
+        "productos": datos["productos"],
+    }
@@ -1,48 +1,92 @@
 # accounts/services_compras.py
-from django.db import transaction
-from django.db.models import F
+from django.db import connection, transaction
 from django.utils import timezone
 from .models_db import Compra, CompraDetalle, Insumo, Kardex
+from .services_costos import marcar_insumos
+from .services_kardex import ajustar_stock
+
 
 @transaction.atomic
-def recepcionar_compra(compra_id: int) -> int:
+def recepcionar_compras(compra_ids) -> dict[int, int]:
     """
-    Marca la compra como recepcionada, suma stock por cada detalle,
-    y escribe movimientos ENTRADA/COMPRA en kardex.
-    Devuelve la cantidad de líneas procesadas.
+    Recepciona varias compras en una transacción (p.ej. las entregas de la mañana).
+    - Bloquea las compras y luego todos los insumos afectados con un solo
+      SELECT ... FOR UPDATE ordenado por id (mismo orden en todos los
+      procesos: dos recepciones con insumos en común no se cruzan).
+    - Suma el stock con un solo UPDATE y escribe el kardex con bulk_create.
+    Devuelve {compra_id: líneas procesadas} de las compras recepcionadas
+    (las ya recepcionadas o sin detalles no aparecen).
     """
-    compra = Compra.objects.select_for_update().get(pk=compra_id)
-    if getattr(compra, "recepcionada", 0):
-        return 0
+    ids = sorted({int(c) for c in compra_ids if c})
+    if not ids:
+        return {}
 
-    detalles = list(CompraDetalle.objects.filter(compra_id=compra.id))
+    compras = list(
+        Compra.objects.select_for_update()
+        .filter(pk__in=ids, recepcionada=False)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    detalles = list(
+        CompraDetalle.objects.filter(compra_id__in=compras).order_by("compra_id", "id")
+    )
     if not detalles:
-        return 0
+        return {}
+    compras = sorted({d.compra_id for d in detalles})
 
-    # Recalcular total si es necesario
-    if getattr(compra, "total", None) in (None, 0):
-        total = sum((d.cantidad or 0) * (d.costo_unitario or 0) for d in detalles)
-        Compra.objects.filter(pk=compra.id).update(total=total)
+    # Recalcular total si es necesario (una sola sentencia para todas)
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            UPDATE compra c
+            JOIN (
+                SELECT compra_id, SUM(cantidad * costo_unitario) AS total
+                FROM compra_detalle
+                WHERE compra_id IN ({", ".join(["%s"] * len(compras))})
+                GROUP BY compra_id
+            ) d ON d.compra_id = c.id
+            SET c.total = d.total
+            WHERE c.total IS NULL OR c.total = 0
+        """, compras)
 
-    movs = 0
+    # Bloqueo de insumos en orden de id, una consulta (se evalúa para tomar los locks)
+    deltas: dict[int, object] = {}
     for d in detalles:
-        ins = Insumo.objects.select_for_update().get(pk=d.insumo_id)
-        # Sumar stock
-        Insumo.objects.filter(pk=ins.pk).update(
-            cantidad_disponible=F("cantidad_disponible") + d.cantidad
-        )
-        # Kardex
-        Kardex.objects.create(
-            insumo=ins,
-            fecha=timezone.now(),
+        deltas[d.insumo_id] = deltas.get(d.insumo_id, 0) + d.cantidad
+    list(
+        Insumo.objects.select_for_update()
+        .filter(pk__in=deltas)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+    ajustar_stock(deltas)
+    marcar_insumos(deltas)  # el costo FIFO depende del stock
+
+    ahora = timezone.now()
+    Kardex.objects.bulk_create([
+        Kardex(
+            insumo_id=d.insumo_id,
+            fecha=ahora,
             tipo="ENTRADA",
             motivo="COMPRA",
             cantidad=d.cantidad,
-            observacion=f"Compra #{compra.id}"
+            observacion=f"Compra #{d.compra_id}",
         )
-        movs += 1
+        for d in detalles
+    ])
 
-    Compra.objects.filter(pk=compra.id).update(
-        recepcionada=1, fecha_recepcion=timezone.now()
-    )
-    return movs
+    Compra.objects.filter(pk__in=compras).update(recepcionada=1, fecha_recepcion=ahora)
+
+    procesadas: dict[int, int] = {}
+    for d in detalles:
+        procesadas[d.compra_id] = procesadas.get(d.compra_id, 0) + 1
+    return procesadas
+
+
+def recepcionar_compra(compra_id: int) -> int:
+    """
+    Marca la compra como recepcionada, suma stock por cada detalle,
+    y escribe movimientos ENTRADA/COMPRA en kardex.
+    Devuelve la cantidad de líneas procesadas.
+    """
+    return recepcionar_compras([compra_id]).get(int(compra_id), 0)
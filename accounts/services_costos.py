@@ -0,0 +1,181 @@
+# accounts/services_costos.py
+"""
+Costeo de insumos y productos.
+
+`costo_insumo` guarda, por insumo, su costo unitario según cada método de
+valuación (último, promedio ponderado, FIFO). Se recalcula solo para los
+insumos de una compra cuando ésta se guarda, y las pantallas leen la tabla:
+el costo de todos los productos sale de un solo JOIN receta x costo_insumo.
+
+El método usado en pantallas es settings.COSTEO_METODO ('ultimo' por defecto).
+Para agregar un método: una función `(compras, stock) -> costo` en METODOS
+y su columna en CostoInsumo.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models_costos import CostoInsumo
+from .services_kardex import saldos
+
+CERO = Decimal("0")
+
+
+# -------------------------------------------------------------------
+# Métodos de valuación. `compras`: [(cantidad, costo_unitario), ...] de la
+# más reciente a la más antigua. `stock`: existencia actual del insumo.
+# -------------------------------------------------------------------
+def _costo_ultimo(compras, stock) -> Decimal:
+    return compras[0][1] if compras else CERO
+
+
+def _costo_promedio(compras, stock) -> Decimal:
+    cant = sum((c for c, _ in compras), CERO)
+    if cant <= 0:
+        return _costo_ultimo(compras, stock)
+    return sum((c * u for c, u in compras), CERO) / cant
+
+
+def _costo_fifo(compras, stock) -> Decimal:
+    """
+    Costo de la próxima unidad a consumir: el stock actual son las compras
+    más recientes (FIFO consume primero las antiguas); la capa más antigua
+    que aún tiene existencias es la que se consume a continuación.
+    """
+    if not compras:
+        return CERO
+    restante = stock
+    for cant, costo in compras:
+        if restante <= cant:
+            return costo
+        restante -= cant
+    return compras[-1][1]
+
+
+METODOS = {
+    "ultimo": _costo_ultimo,
+    "promedio": _costo_promedio,
+    "fifo": _costo_fifo,
+}
+
+
+def metodo_actual() -> str:
+    m = getattr(settings, "COSTEO_METODO", "ultimo")
+    return m if m in METODOS else "ultimo"
+
+
+# -------------------------------------------------------------------
+# Mantenimiento de costo_insumo
+# -------------------------------------------------------------------
+def _compras_por_insumo(insumo_ids) -> dict[int, list[tuple[Decimal, Decimal]]]:
+    ids = sorted({int(i) for i in insumo_ids if i})
+    if not ids:
+        return {}
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT cd.insumo_id, cd.cantidad, cd.costo_unitario
+            FROM compra_detalle cd
+            JOIN compra c ON c.id = cd.compra_id
+            WHERE cd.insumo_id IN ({", ".join(["%s"] * len(ids))})
+            ORDER BY cd.insumo_id, c.fecha DESC, cd.compra_id DESC
+        """, ids)
+        compras: dict[int, list] = {i: [] for i in ids}
+        for ins, cant, costo in cur.fetchall():
+            compras[ins].append((Decimal(str(cant or 0)), Decimal(str(costo or 0))))
+    return compras
+
+
+def refrescar_costos(insumo_ids) -> int:
+    """Recalcula costo_insumo para los insumos dados (todos los métodos)."""
+    compras = _compras_por_insumo(insumo_ids)
+    if not compras:
+        return 0
+    stock = saldos(compras.keys())
+    q = Decimal("0.0001")
+    objs = [
+        CostoInsumo(
+            insumo_id=ins,
+            **{m: f(filas, max(stock.get(ins, CERO), CERO)).quantize(q) for m, f in METODOS.items()},
+        )
+        for ins, filas in compras.items()
+    ]
+    # MySQL hace el upsert por la PK (ON DUPLICATE KEY); otros motores piden la columna
+    unico = ["insumo_id"] if connection.features.supports_update_conflicts_with_target else None
+    CostoInsumo.objects.bulk_create(
+        objs, update_conflicts=True,
+        unique_fields=unico, update_fields=[*METODOS, "actualizado_en"],
+    )
+    return len(objs)
+
+
+def refrescar_todo(bloque: int = 500) -> int:
+    with connection.cursor() as cur:
+        cur.execute("SELECT DISTINCT insumo_id FROM compra_detalle ORDER BY insumo_id")
+        ids = [r[0] for r in cur.fetchall()]
+    total = 0
+    for i in range(0, len(ids), bloque):
+        total += refrescar_costos(ids[i:i + bloque])
+    return total
+
+
+def marcar_insumos(insumo_ids):
+    """Recalcula los costos de estos insumos al confirmar la transacción (sin propagar errores)."""
+    ids = [int(i) for i in insumo_ids if i]
+    if not ids:
+        return
+
+    def _run():
+        try:
+            refrescar_costos(ids)
+        except Exception:
+            pass
+    transaction.on_commit(_run)
+
+
+# -------------------------------------------------------------------
+# Lecturas para pantallas
+# -------------------------------------------------------------------
+def costos_insumos(insumo_ids, metodo: str | None = None) -> dict[int, Decimal]:
+    col = metodo if metodo in METODOS else metodo_actual()
+    ids = [int(i) for i in insumo_ids]
+    if not ids:
+        return {}
+    return dict(
+        CostoInsumo.objects.filter(insumo_id__in=ids).values_list("insumo_id", col)
+    )
+
+
+def costos_productos(producto_ids=None, metodo: str | None = None) -> dict[int, dict]:
+    """
+    {producto_id: {'items': n, 'costo': costo por unidad}} para todos los
+    productos (o los dados) en una consulta.
+    """
+    col = metodo if metodo in METODOS else metodo_actual()
+    where, params = "", []
+    if producto_ids is not None:
+        ids = [int(p) for p in producto_ids]
+        if not ids:
+            return {}
+        where = f"WHERE r.producto_id IN ({', '.join(['%s'] * len(ids))})"
+        params = ids
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT r.producto_id, COUNT(*), COALESCE(SUM(r.cantidad * COALESCE(ci.{col}, 0)), 0)
+            FROM receta r
+            LEFT JOIN costo_insumo ci ON ci.insumo_id = r.insumo_id
+            {where}
+            GROUP BY r.producto_id
+        """, params)
+        return {
+            prod: {"items": n, "costo": Decimal(str(costo or 0))}
+            for prod, n, costo in cur.fetchall()
+        }
+
+
+def margen(precio, costo) -> dict:
+    precio = Decimal(str(precio or 0))
+    costo = Decimal(str(costo or 0))
+    utilidad = precio - costo
+    pct = (utilidad / precio * 100) if precio else None
+    return {"utilidad": utilidad, "margen_pct": pct}
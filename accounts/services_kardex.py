@@ -0,0 +1,184 @@
+# accounts/services_kardex.py
+"""
+Saldos del kardex sin sumar todo el historial.
+
+`kardex_corte` guarda, por insumo, el saldo acumulado hasta cierto id de
+movimiento. El stock es ese saldo + los movimientos con id posterior (rango
+por PK dentro del índice de insumo_id). Los cortes los escribe
+`manage.py cerrar_kardex`, cada uno a partir del corte anterior.
+
+Un INSERT en kardex dentro de una transacción abierta (consumo, recepción)
+toma su id antes de verse: un corte hasta el MAX(id) actual lo dejaría
+fuera para siempre. Por eso se cierra solo hasta el MAX(id) visto hace al
+menos KARDEX_MARGEN segundos (`kardex_tope`), como en services_valuacion.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models_kardex import KardexCorte, KardexTope  # noqa: F401 (registra modelos)
+
+CERO = Decimal("0")
+MARGEN = getattr(settings, "KARDEX_MARGEN", 60)
+
+# Movimiento con signo: entradas suman, salidas restan, ajustes ya traen signo
+DELTA_SQL = """
+    CASE
+        WHEN k.tipo = 'ENTRADA' THEN k.cantidad
+        WHEN k.tipo = 'SALIDA'  THEN -k.cantidad
+        WHEN k.tipo = 'AJUSTE'  THEN k.cantidad
+        ELSE 0
+    END
+"""
+
+# Último corte de cada insumo (alias kc), para unir contra `insumo i`
+_ULTIMO_CORTE = """
+    LEFT JOIN kardex_corte kc
+           ON kc.insumo_id = i.id
+          AND kc.fecha_corte = (SELECT MAX(c2.fecha_corte) FROM kardex_corte c2 WHERE c2.insumo_id = i.id)
+"""
+
+
+def delta(tipo: str, cantidad) -> Decimal:
+    cantidad = cantidad if isinstance(cantidad, Decimal) else Decimal(str(cantidad or 0))
+    if tipo == "SALIDA":
+        return -cantidad
+    if tipo in ("ENTRADA", "AJUSTE"):
+        return cantidad
+    return CERO
+
+
+def saldos(insumo_ids) -> dict[int, Decimal]:
+    """{insumo_id: saldo por kardex} = último corte + movimientos posteriores. Una consulta."""
+    ids = sorted({int(i) for i in insumo_ids if i})
+    if not ids:
+        return {}
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT i.id,
+                   COALESCE(kc.saldo, 0) + COALESCE((
+                       SELECT SUM({DELTA_SQL})
+                       FROM kardex k
+                       WHERE k.insumo_id = i.id AND k.id > COALESCE(kc.ultimo_kardex_id, 0)
+                   ), 0)
+            FROM insumo i
+            {_ULTIMO_CORTE}
+            WHERE i.id IN ({", ".join(["%s"] * len(ids))})
+        """, ids)
+        return {ins: Decimal(str(s or 0)) for ins, s in cur.fetchall()}
+
+
+def saldo(insumo_id: int) -> Decimal:
+    return saldos([insumo_id]).get(int(insumo_id), CERO)
+
+
+def _tope_cerrable(cur, ahora) -> int:
+    """
+    Id hasta el que se puede cerrar: el MAX(id) observado hace al menos el
+    margen (0 si aún no hay uno). Pasado el margen se observa uno nuevo.
+    """
+    tope = KardexTope.objects.select_for_update().get_or_create(pk=1)[0]
+    if tope.tope_en and ahora - tope.tope_en < timedelta(seconds=MARGEN):
+        return 0
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM kardex")
+    maximo = cur.fetchone()[0]
+    hasta = maximo if MARGEN <= 0 else (tope.tope_kardex_id if tope.tope_en else 0)
+    tope.tope_kardex_id, tope.tope_en = maximo, ahora
+    tope.save(update_fields=["tope_kardex_id", "tope_en"])
+    return hasta
+
+
+@transaction.atomic
+def cerrar_saldos(fecha_corte=None) -> int:
+    """
+    Escribe un corte para todos los insumos con movimientos, partiendo del
+    corte anterior de cada uno (solo se suman los movimientos nuevos hasta el
+    tope observado hace KARDEX_MARGEN segundos). Devuelve cuántos insumos se
+    cerraron (0 si el tope todavía no cumplió el margen).
+    """
+    fecha_corte = fecha_corte or timezone.now()
+    with connection.cursor() as cur:
+        hasta_id = _tope_cerrable(cur, fecha_corte)
+        if not hasta_id:
+            return 0
+        cur.execute(f"""
+            INSERT INTO kardex_corte (insumo_id, fecha_corte, ultimo_kardex_id, saldo)
+            SELECT i.id, %s, GREATEST(COALESCE(kc.ultimo_kardex_id, 0), %s),
+                   COALESCE(kc.saldo, 0) + COALESCE((
+                       SELECT SUM({DELTA_SQL})
+                       FROM kardex k
+                       WHERE k.insumo_id = i.id
+                         AND k.id > COALESCE(kc.ultimo_kardex_id, 0)
+                         AND k.id <= %s
+                   ), 0)
+            FROM insumo i
+            {_ULTIMO_CORTE}
+            WHERE kc.id IS NOT NULL
+               OR EXISTS (SELECT 1 FROM kardex k2 WHERE k2.insumo_id = i.id AND k2.id <= %s)
+        """, [fecha_corte, hasta_id, hasta_id, hasta_id])
+        return cur.rowcount
+
+
+def con_saldo(movimientos, saldo_inicial: Decimal) -> list:
+    """
+    Recorre movimientos en orden descendente (más reciente primero) y anota
+    en cada uno `saldo` = stock inmediatamente después de ese movimiento.
+    `saldo_inicial` es el saldo tras el primero de la lista.
+    """
+    actual = saldo_inicial
+    filas = list(movimientos)
+    for m in filas:
+        m.saldo = actual
+        actual -= delta(m.tipo, m.cantidad)
+    return filas
+
+
+def saldo_tras(insumo_id: int, fecha, mov_id: int, total: Decimal | None = None,
+               mas_recientes: int = 0, mas_antiguos: int = 0) -> Decimal:
+    """
+    Saldo inmediatamente después del movimiento (fecha, mov_id) en orden
+    (fecha, id). Suma el lado más corto: los movimientos posteriores (restando
+    del saldo actual `total`) o los anteriores, según las cantidades dadas.
+    """
+    if fecha is None:
+        # Sin fecha: en orden DESC van al final (los más antiguos)
+        posterior, pparams = "(k.fecha IS NOT NULL OR k.id > %s)", [mov_id]
+    else:
+        posterior, pparams = "(k.fecha > %s OR (k.fecha = %s AND k.id > %s))", [fecha, fecha, mov_id]
+    with connection.cursor() as cur:
+        if total is not None and mas_recientes <= mas_antiguos:
+            cur.execute(f"""
+                SELECT COALESCE(SUM({DELTA_SQL}), 0) FROM kardex k
+                WHERE k.insumo_id = %s AND {posterior}
+            """, [insumo_id, *pparams])
+            return total - Decimal(str(cur.fetchone()[0] or 0))
+        cur.execute(f"""
+            SELECT COALESCE(SUM({DELTA_SQL}), 0) FROM kardex k
+            WHERE k.insumo_id = %s AND NOT COALESCE({posterior}, 0)
+        """, [insumo_id, *pparams])
+        return Decimal(str(cur.fetchone()[0] or 0))
+
+
+def ajustar_stock(deltas: dict, exigir_stock: bool = False) -> int:
+    """
+    Aplica `{insumo_id: delta}` a insumo.cantidad_disponible en un solo
+    `UPDATE ... JOIN`, en orden de id. Con `exigir_stock` solo se actualizan
+    filas que no quedan negativas. Devuelve cuántos insumos se actualizaron
+    (el llamador compara contra len(deltas) y revierte si no coincide).
+    """
+    filas = sorted((int(i), d) for i, d in deltas.items() if d)
+    if not filas:
+        return 0
+    derivada = " UNION ALL ".join(["SELECT %s AS insumo_id, %s AS delta"] * len(filas))
+    guarda = "WHERE i.cantidad_disponible + d.delta >= 0" if exigir_stock else ""
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            UPDATE insumo i
+            JOIN ({derivada}) d ON d.insumo_id = i.id
+            SET i.cantidad_disponible = i.cantidad_disponible + d.delta
+            {guarda}
+        """, [x for fila in filas for x in fila])
+        return cur.rowcount
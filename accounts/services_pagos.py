@@ -0,0 +1,125 @@
+# accounts/services_pagos.py
+"""
+Pagos y saldo por pedido.
+
+`pedido_saldo` guarda, por pedido, la suma de sus pagos. `registrar_pago`
+inserta en `pago` y suma en `pedido_saldo` en la misma transacción, así
+leer lo pagado es una búsqueda por PK y no un SUM sobre `pago`. El saldo
+se calcula contra `pedido.total` al leer (el total cambia al editar el
+pedido; lo pagado solo con pagos).
+
+Para listados: `balances_for(ids)` trae total/pagado/saldo de muchos
+pedidos en una consulta, y `con_saldos(pedidos)` los pega a los objetos.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .models_pagos import SaldoPedido  # noqa: F401 (registra el modelo)
+from .services_resumen_ventas import marcar_pedido
+
+CERO = Decimal("0.00")
+
+
+def _dec(v) -> Decimal:
+    return Decimal(str(v or 0))
+
+
+# -------------------------------------------------------------------
+# Escritura
+# -------------------------------------------------------------------
+@transaction.atomic
+def registrar_pago(pedido_id: int, metodo: str, monto, referencia: str | None = None,
+                   registrado_por_id: int | None = None) -> int:
+    """INSERT en `pago` + suma en `pedido_saldo` (misma transacción). Devuelve el id del pago."""
+    monto = _dec(monto)
+    with connection.cursor() as cur:
+        cur.execute("""
+            INSERT INTO pago (pedido_id, metodo, monto, referencia, registrado_por_id, created_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+        """, [pedido_id, metodo, str(monto), referencia or None, registrado_por_id])
+        pago_id = cur.lastrowid
+        cur.execute("""
+            INSERT INTO pedido_saldo (pedido_id, pagado, pagos, actualizado_en)
+            VALUES (%s, %s, 1, NOW())
+            ON DUPLICATE KEY UPDATE
+                pagado = pagado + VALUES(pagado),
+                pagos = pagos + 1,
+                actualizado_en = NOW()
+        """, [pedido_id, str(monto)])
+    marcar_pedido(pedido_id)
+    return pago_id
+
+
+@transaction.atomic
+def recalcular(pedido_ids=None) -> int:
+    """
+    Rehace `pedido_saldo` desde `pago` para `pedido_ids` (o todos). Lo usan
+    la migración, el comando `saldos_pedidos` y los cambios de Pago por ORM.
+    """
+    if pedido_ids is not None:
+        pedido_ids = sorted({int(i) for i in pedido_ids if i})
+        if not pedido_ids:
+            return 0
+    filtro, params = "", []
+    if pedido_ids is not None:
+        filtro = f"WHERE pedido_id IN ({', '.join(['%s'] * len(pedido_ids))})"
+        params = pedido_ids
+    with connection.cursor() as cur:
+        cur.execute(f"DELETE FROM pedido_saldo {filtro}", params)
+        cur.execute(f"""
+            INSERT INTO pedido_saldo (pedido_id, pagado, pagos, actualizado_en)
+            SELECT pedido_id, COALESCE(SUM(monto), 0), COUNT(*), NOW()
+            FROM pago {filtro}
+            GROUP BY pedido_id
+        """, params)
+        return cur.rowcount
+
+
+# -------------------------------------------------------------------
+# Lectura
+# -------------------------------------------------------------------
+def total_pagado(pedido_id: int) -> Decimal:
+    with connection.cursor() as cur:
+        cur.execute("SELECT pagado FROM pedido_saldo WHERE pedido_id=%s", [pedido_id])
+        fila = cur.fetchone()
+    return _dec(fila[0]) if fila else CERO
+
+
+def tiene_pagos(pedido_id: int) -> bool:
+    return total_pagado(pedido_id) > 0
+
+
+def saldo(pedido) -> Decimal:
+    """Saldo pendiente de un pedido ya cargado."""
+    return _dec(pedido.total) - total_pagado(pedido.pk)
+
+
+def balances_for(pedido_ids) -> dict[int, dict]:
+    """{pedido_id: {"total", "pagado", "saldo"}} en una sola consulta."""
+    ids = sorted({int(i) for i in pedido_ids if i})
+    if not ids:
+        return {}
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT p.id, p.total, COALESCE(s.pagado, 0)
+            FROM pedido p
+            LEFT JOIN pedido_saldo s ON s.pedido_id = p.id
+            WHERE p.id IN ({', '.join(['%s'] * len(ids))})
+        """, ids)
+        filas = cur.fetchall()
+    return {
+        pid: {"total": _dec(total), "pagado": _dec(pagado), "saldo": _dec(total) - _dec(pagado)}
+        for pid, total, pagado in filas
+    }
+
+
+def con_saldos(pedidos) -> list:
+    """Agrega `.pagado` y `.saldo` a cada pedido (una consulta para toda la página)."""
+    pedidos = list(pedidos)
+    saldos = balances_for(p.pk for p in pedidos)
+    for p in pedidos:
+        b = saldos.get(p.pk)
+        p.pagado = b["pagado"] if b else CERO
+        p.saldo = _dec(p.total) - p.pagado
+    return pedidos
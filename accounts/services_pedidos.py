@@ -0,0 +1,280 @@
+# accounts/services_pedidos.py
+"""
+Alta y lectura de pedidos.
+
+`crear_pedido` recibe un carrito (uno o varios sabores) y lo guarda en una
+transacción con dos escrituras: el INSERT del pedido, con el total ya
+calculado en Python, y un solo INSERT multi-fila de `detalle_pedido`. El
+producto, los sabores válidos y el precio salen de la foto del catálogo
+(services_catalogo), sin consultar la base.
+
+`guardar_lineas` aplica la edición de un pedido: compara en memoria las
+líneas nuevas con las actuales y escribe con un DELETE y un solo upsert
+multi-fila, más el UPDATE del total (consultas fijas sin importar cuántas
+líneas tenga el pedido).
+
+`cargar_pedido` arma la vista de un pedido (cabecera, cliente, factura,
+envío, pagado/saldo, líneas y pagos) con un plan fijo de dos consultas y la
+devuelve como dicts simples (serializables, aptos para caché). La usan el
+detalle, la factura, el envío y la producción del pedido.
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models_db import Pedido
+from .services_catalogo import foto as catalogo_foto
+
+COSTO_DELIVERY = Decimal("5.00")
+CENTAVO = Decimal("0.01")
+MAX_CANTIDAD = 99
+
+
+class CarritoInvalido(ValueError):
+    pass
+
+
+def leer_carrito(data) -> list[tuple[int, int]]:
+    """
+    [(sabor_id, cantidad)] desde un formulario (`sabor_<id>=n`, solo los
+    marcados en `sel` si viene) o un JSON {"items": [{"sabor_id", "cantidad"}]}.
+    Junta repetidos; ignora cantidades vacías o cero.
+    """
+    pares = []
+    if isinstance(data, dict) and "items" in data:
+        for it in data.get("items") or []:
+            pares.append((it.get("sabor_id"), it.get("cantidad")))
+    else:
+        marcados = set(data.getlist("sel")) if hasattr(data, "getlist") else set()
+        for clave, valor in data.items():
+            if clave.startswith("sabor_") and (not marcados or clave[6:] in marcados):
+                pares.append((clave[6:], valor))
+
+    items: dict[int, int] = {}
+    for sabor, cant in pares:
+        try:
+            sabor, cant = int(sabor), int(cant or 0)
+        except (TypeError, ValueError):
+            raise CarritoInvalido("Cantidad o sabor inválido.")
+        if cant < 0:
+            raise CarritoInvalido("Cantidad inválida.")
+        if cant:
+            items[sabor] = items.get(sabor, 0) + cant
+    return sorted(items.items())
+
+
+def _producto_galleta(datos: dict) -> int | None:
+    productos = datos["productos"]
+    for p in productos:
+        if p["nombre"].lower() == "galleta":
+            return p["id"]
+    return productos[0]["id"] if productos else None
+
+
+@transaction.atomic
+def crear_pedido(cliente_id: int, items, metodo_envio: str = "RETIRO", direccion: str | None = None,
+                 fecha_entrega=None, observaciones: str | None = None) -> Pedido:
+    """Crea el pedido con sus líneas. Lanza CarritoInvalido si el carrito no sirve."""
+    datos = catalogo_foto()
+    items = list(items)
+    if not items:
+        raise CarritoInvalido("El carrito está vacío.")
+    sabores = {s["id"] for s in datos["sabores"]}
+    for sabor, cant in items:
+        if sabor not in sabores:
+            raise CarritoInvalido("Uno de los sabores ya no está disponible.")
+        if not 1 <= cant <= MAX_CANTIDAD:
+            raise CarritoInvalido(f"La cantidad por sabor debe estar entre 1 y {MAX_CANTIDAD}.")
+    producto_id = _producto_galleta(datos)
+    if not producto_id:
+        raise CarritoInvalido("No hay productos definidos.")
+
+    metodo = metodo_envio if metodo_envio in ("RETIRO", "DELIVERY") else "RETIRO"
+    costo_envio = COSTO_DELIVERY if metodo == "DELIVERY" else Decimal("0.00")
+    precio = Decimal(datos["precio"]).quantize(Decimal("0.01"))
+    subtotal = sum((precio * cant for _, cant in items), Decimal("0.00"))
+
+    pedido = Pedido.objects.create(
+        cliente_id=cliente_id,
+        estado="PENDIENTE",
+        metodo_envio=metodo,
+        costo_envio=costo_envio,
+        direccion_entrega=(direccion or None) if metodo == "DELIVERY" else None,
+        total=subtotal + costo_envio,
+        observaciones=(observaciones or "").strip()[:300] or None,
+        created_at=timezone.now(),
+        fecha_entrega_programada=fecha_entrega,
+    )
+    # sub_total es columna generada en MySQL: no se inserta ni se relee
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO detalle_pedido (pedido_id, producto_id, sabor_id, cantidad, precio_unitario)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(items))}
+        """, [x for sabor, cant in items for x in (pedido.id, producto_id, sabor, cant, precio)])
+    return pedido
+
+
+# -------------------------------------------------------------------
+# Edición de líneas
+# -------------------------------------------------------------------
+@transaction.atomic
+def guardar_lineas(pedido_id: int, items) -> dict[str, int]:
+    """
+    Deja el detalle del pedido igual a `items` [(producto_id, sabor_id,
+    cantidad, precio_unitario)] y recalcula el total. Si un par
+    (producto, sabor) se repite gana el último. Lanza CarritoInvalido si
+    un producto o sabor no está en el catálogo o la cantidad no es entera.
+    El precio se redondea a centavos como lo guarda la columna: el diff y
+    el total usan los valores que quedan en `detalle_pedido`.
+    """
+    datos = catalogo_foto()
+    productos = {p["id"] for p in datos["productos"]}
+    sabores = {s["id"] for s in datos["sabores"]}
+    nuevas: dict[tuple[int, int], tuple[Decimal, Decimal]] = {}
+    for prod, sabor, cant, precio in items:
+        if prod not in productos or sabor not in sabores:
+            raise CarritoInvalido("Hay productos o sabores que ya no están disponibles.")
+        cant = Decimal(cant)
+        if cant <= 0 or cant != cant.to_integral_value():
+            raise CarritoInvalido("La cantidad debe ser un número entero de unidades.")
+        nuevas[(prod, sabor)] = (Decimal(int(cant)), Decimal(precio).quantize(CENTAVO, ROUND_HALF_UP))
+
+    with connection.cursor() as cur:
+        cur.execute("""
+            SELECT id, producto_id, sabor_id, cantidad, precio_unitario
+            FROM detalle_pedido WHERE pedido_id = %s
+            FOR UPDATE
+        """, [pedido_id])
+        actuales = {(prod, sabor): (id_, Decimal(str(cant)), Decimal(str(precio)))
+                    for id_, prod, sabor, cant, precio in cur.fetchall()}
+
+        borrar = [id_ for clave, (id_, _, _) in actuales.items() if clave not in nuevas]
+        escribir = [
+            (clave, valores) for clave, valores in sorted(nuevas.items())
+            if clave not in actuales or actuales[clave][1:] != valores
+        ]
+        if borrar:
+            cur.execute(
+                f"DELETE FROM detalle_pedido WHERE id IN ({', '.join(['%s'] * len(borrar))})", borrar
+            )
+        if escribir:
+            cur.execute(f"""
+                INSERT INTO detalle_pedido (pedido_id, producto_id, sabor_id, cantidad, precio_unitario)
+                VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(escribir))}
+                ON DUPLICATE KEY UPDATE
+                    cantidad = VALUES(cantidad),
+                    precio_unitario = VALUES(precio_unitario)
+            """, [x for (prod, sabor), (cant, precio) in escribir
+                  for x in (pedido_id, prod, sabor, str(cant), str(precio))])
+
+        items_total = sum((cant * precio for cant, precio in nuevas.values()), Decimal("0"))
+        cur.execute(
+            "UPDATE pedido SET total = %s + COALESCE(costo_envio, 0) WHERE id = %s",
+            [str(items_total), pedido_id],
+        )
+    return {"borradas": len(borrar), "escritas": len(escribir)}
+
+# -------------------------------------------------------------------
+# Lectura: vista completa de un pedido en dos consultas
+# -------------------------------------------------------------------
+_CABECERA = """
+    SELECT p.id, p.cliente_id, p.estado, p.metodo_envio, p.costo_envio, p.direccion_entrega,
+           p.total, p.observaciones, p.created_at, p.fecha_entrega_programada,
+           c.nombre AS cliente_nombre, c.usuario_id AS cliente_usuario_id, u.email AS cliente_email,
+           COALESCE(sp.pagado, 0) AS pagado,
+           f.id AS factura_id, f.nro AS factura_nro, f.fecha AS factura_fecha,
+           f.nit_cliente AS factura_nit_cliente, f.razon_social AS factura_razon_social,
+           f.total AS factura_total,
+           e.id AS envio_id, e.estado AS envio_estado, e.nombre_repartidor AS envio_nombre_repartidor,
+           e.telefono_repartidor AS envio_telefono_repartidor, e.created_at AS envio_created_at
+    FROM pedido p
+    LEFT JOIN cliente c       ON c.id = p.cliente_id
+    LEFT JOIN usuario u       ON u.id = c.usuario_id
+    LEFT JOIN pedido_saldo sp ON sp.pedido_id = p.id
+    LEFT JOIN factura f       ON f.pedido_id = p.id
+    LEFT JOIN envio e         ON e.pedido_id = p.id
+    WHERE p.id = %s
+"""
+
+# Líneas y pagos en un solo viaje: mismas columnas, `tipo` las distingue
+_LINEAS_Y_PAGOS = """
+    SELECT 'L' AS tipo, dp.id, dp.producto_id, dp.sabor_id,
+           pr.nombre AS texto1, s.nombre AS texto2, NULL AS texto3,
+           dp.cantidad, dp.precio_unitario, dp.sub_total AS importe, NULL AS fecha
+    FROM detalle_pedido dp
+    JOIN producto pr ON pr.id = dp.producto_id
+    JOIN sabor s     ON s.id = dp.sabor_id
+    WHERE dp.pedido_id = %s
+    UNION ALL
+    SELECT 'P', pg.id, NULL, NULL,
+           pg.metodo, pg.referencia, u.nombre,
+           NULL, NULL, pg.monto, pg.created_at
+    FROM pago pg
+    LEFT JOIN usuario u ON u.id = pg.registrado_por_id
+    WHERE pg.pedido_id = %s
+"""
+
+
+def _aware(valor):
+    # El cursor crudo devuelve las fechas naive en UTC
+    if settings.USE_TZ and isinstance(valor, datetime) and timezone.is_naive(valor):
+        return valor.replace(tzinfo=dt_timezone.utc)
+    return valor
+
+
+def _subdict(fila: dict, prefijo: str) -> dict | None:
+    d = {k[len(prefijo):]: v for k, v in fila.items() if k.startswith(prefijo)}
+    return d if d.get("id") is not None else None
+
+
+def cargar_pedido(pedido_id: int, con_lineas: bool = True) -> dict | None:
+    """
+    Pedido como dict (None si no existe). Claves: los campos de `pedido`,
+    `cliente` {id, nombre, usuario_id, email}, `factura`, `envio` (o None),
+    `pagado`, `saldo` y, con `con_lineas`, `lineas` (por producto/sabor) y
+    `pagos` (más recientes primero).
+    """
+    with connection.cursor() as cur:
+        cur.execute(_CABECERA, [pedido_id])
+        fila = cur.fetchone()
+        if fila is None:
+            return None
+        fila = dict(zip([c[0] for c in cur.description], fila))
+
+        lineas, pagos = [], []
+        if con_lineas:
+            cur.execute(_LINEAS_Y_PAGOS, [pedido_id, pedido_id])
+            for tipo, id_, prod, sabor, t1, t2, t3, cant, precio, importe, fecha in cur.fetchall():
+                if tipo == "L":
+                    lineas.append({
+                        "id": id_, "producto_id": prod, "sabor_id": sabor,
+                        "producto": t1, "sabor": t2,
+                        "cantidad": cant, "precio_unitario": precio, "sub_total": importe,
+                    })
+                else:
+                    pagos.append({
+                        "id": id_, "metodo": t1, "referencia": t2, "monto": importe,
+                        "created_at": _aware(fecha), "registrado_por": {"nombre": t3},
+                    })
+
+    for k in ("created_at", "fecha_entrega_programada", "factura_fecha", "envio_created_at"):
+        fila[k] = _aware(fila[k])
+    pedido = {k: v for k, v in fila.items() if not k.startswith(("cliente_", "factura_", "envio_"))}
+    pedido["cliente_id"] = fila["cliente_id"]
+    pedido["cliente"] = {
+        "id": fila["cliente_id"], "nombre": fila["cliente_nombre"],
+        "usuario_id": fila["cliente_usuario_id"], "email": fila["cliente_email"],
+    } if fila["cliente_nombre"] is not None else None
+    pedido["factura"] = _subdict(fila, "factura_")
+    pedido["envio"] = _subdict(fila, "envio_")
+    pedido["total"] = Decimal(str(fila["total"] or 0))
+    pedido["pagado"] = Decimal(str(fila["pagado"] or 0))
+    pedido["saldo"] = pedido["total"] - pedido["pagado"]
+    if con_lineas:
+        lineas.sort(key=lambda x: (x["producto"], x["sabor"]))
+        pagos.sort(key=lambda x: (x["created_at"] is not None, x["created_at"], x["id"]), reverse=True)
+        pedido["lineas"], pedido["pagos"] = lineas, pagos
+    return pedido
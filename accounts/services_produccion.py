@@ -0,0 +1,385 @@
+# accounts/services_produccion.py
+"""
+Requerimientos de insumos para producción, en lote.
+
+Todas las líneas (de un pedido o de varios) se expanden por `receta` en una
+sola consulta, se suman por insumo y se comparan contra una única foto del
+stock. Cantidad de consultas constante: recetas + stock, sin importar cuántas
+líneas haya.
+"""
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .services_costos import marcar_insumos
+from .services_kardex import ajustar_stock, saldos
+from .services_reportes import rango_fechas
+
+CERO = Decimal("0")
+
+
+def _in(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def _dec(x) -> Decimal:
+    return x if isinstance(x, Decimal) else Decimal(str(x or 0))
+
+
+def recetas_de(producto_ids) -> dict[int, list[dict]]:
+    """{producto_id: [{insumo_id, insumo, um, stock_db, cantidad}, ...]} en una consulta."""
+    ids = sorted({int(p) for p in producto_ids if p})
+    if not ids:
+        return {}
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT r.producto_id, r.insumo_id, i.nombre, i.unidad_medida,
+                   i.cantidad_disponible, r.cantidad
+            FROM receta r
+            JOIN insumo i ON i.id = r.insumo_id
+            WHERE r.producto_id IN ({_in(ids)})
+            ORDER BY i.nombre
+        """, ids)
+        recetas: dict[int, list[dict]] = {}
+        for prod, ins, nombre, um, stock_db, cant in cur.fetchall():
+            recetas.setdefault(prod, []).append({
+                "insumo_id": ins, "insumo": nombre, "um": um,
+                "stock_db": stock_db, "cantidad": _dec(cant),
+            })
+    return recetas
+
+
+def stock_kardex(insumo_ids) -> dict[int, Decimal]:
+    """Stock por movimientos de los insumos dados (último corte + movimientos nuevos)."""
+    return saldos(insumo_ids)
+
+
+def _stock_ref(stock_kdx, stock_db) -> Decimal:
+    # Si kardex aún no tiene movimientos, usa el stock de la tabla insumo
+    return _dec(stock_kdx) or _dec(stock_db)
+
+
+class Requerimientos:
+    """
+    Resultado de `calcular_requerimientos`.
+    - `por_linea[clave]`: checks de esa línea (mismo formato que la vista:
+      insumo_id, insumo, um, stock_db, stock_kardex, necesario, faltante).
+    - `insumos`: totales por insumo sumando todas las líneas, con su faltante.
+    - `ok_linea(clave)` / `ok`: sin faltantes por línea / en el agregado.
+    """
+
+    def __init__(self):
+        self.por_linea: dict = {}
+        self.insumos: list[dict] = []
+
+    def ok_linea(self, clave) -> bool:
+        return all(c["faltante"] <= 0 for c in self.por_linea.get(clave, []))
+
+    @property
+    def ok(self) -> bool:
+        return all(i["faltante"] <= 0 for i in self.insumos)
+
+    @property
+    def faltantes(self) -> list[dict]:
+        return [i for i in self.insumos if i["faltante"] > 0]
+
+
+def calcular_requerimientos(lineas) -> Requerimientos:
+    """
+    `lineas`: iterable de (clave, producto_id, cantidad). La clave identifica
+    la línea en el resultado (p.ej. el id del detalle o (pedido, producto, sabor)).
+    Dos consultas en total: recetas de todos los productos y stock de sus insumos.
+    """
+    lineas = list(lineas)
+    recetas = recetas_de(p for _, p, _ in lineas)
+    stock = stock_kardex(r["insumo_id"] for rs in recetas.values() for r in rs)
+
+    res = Requerimientos()
+    agregado: dict[int, dict] = {}
+    for clave, producto_id, cantidad in lineas:
+        checks = []
+        for r in recetas.get(int(producto_id), []):
+            ins = r["insumo_id"]
+            necesario = r["cantidad"] * _dec(cantidad)
+            stock_kdx = stock.get(ins, CERO)
+            disponible = _stock_ref(stock_kdx, r["stock_db"])
+            checks.append({
+                "insumo_id": ins,
+                "insumo": r["insumo"],
+                "um": r["um"],
+                "stock_db": r["stock_db"],
+                "stock_kardex": stock_kdx,
+                "necesario": necesario,
+                "faltante": max(necesario - disponible, CERO),
+            })
+
+            tot = agregado.get(ins)
+            if tot is None:
+                tot = agregado[ins] = {
+                    "insumo_id": ins,
+                    "insumo": r["insumo"],
+                    "um": r["um"],
+                    "stock": disponible,
+                    "necesario": CERO,
+                }
+            tot["necesario"] += necesario
+        res.por_linea[clave] = checks
+
+    for tot in agregado.values():
+        tot["faltante"] = max(tot["necesario"] - tot["stock"], CERO)
+    res.insumos = sorted(agregado.values(), key=lambda t: t["insumo"])
+    return res
+
+
+def lineas_de_pedidos(pedido_ids) -> list[tuple]:
+    """Líneas (clave=(pedido_id, producto_id, sabor_id), producto_id, cantidad) en una consulta."""
+    ids = sorted({int(p) for p in pedido_ids if p})
+    if not ids:
+        return []
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT pedido_id, producto_id, sabor_id, cantidad
+            FROM detalle_pedido
+            WHERE pedido_id IN ({_in(ids)})
+            ORDER BY pedido_id, producto_id, sabor_id
+        """, ids)
+        return [((ped, prod, sab), prod, cant) for ped, prod, sab, cant in cur.fetchall()]
+
+
+def requerimientos_pedidos(pedido_ids) -> Requerimientos:
+    """Requerimientos de uno o varios pedidos completos (tres consultas)."""
+    return calcular_requerimientos(lineas_de_pedidos(pedido_ids))
+
+
+# -------------------------------------------------------------------
+# Planificación de varios pedidos (MRP)
+# -------------------------------------------------------------------
+ESTADOS_PENDIENTES = ("CONFIRMADO", "EN_PRODUCCION")
+
+
+class PlanProduccion:
+    """
+    Resultado de `planificar`.
+    - `pedidos`: en orden de entrega, cada uno con `cumple` (el stock que
+      quedaba al llegar su turno alcanza para todo el pedido) y `faltantes`.
+    - `insumos`: requerimiento total de todos los pedidos vs stock actual.
+    """
+
+    def __init__(self, pedidos: list[dict], insumos: list[dict]):
+        self.pedidos = pedidos
+        self.insumos = insumos
+
+    @property
+    def cumplibles(self) -> list[dict]:
+        return [p for p in self.pedidos if p["cumple"]]
+
+    @property
+    def faltantes(self) -> list[dict]:
+        return [i for i in self.insumos if i["faltante"] > 0]
+
+
+def _pedidos_pendientes(desde, hasta, estados) -> list[dict]:
+    conds, params = rango_fechas("p.fecha_entrega_programada", desde, hasta)
+    where = [f"p.estado IN ({_in(estados)})", *conds]
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT p.id, p.estado, p.fecha_entrega_programada, p.created_at,
+                   COALESCE(NULLIF(TRIM(c.nombre), ''), u.email) AS cliente
+            FROM pedido p
+            LEFT JOIN cliente c ON c.id = p.cliente_id
+            LEFT JOIN usuario u ON u.id = c.usuario_id
+            WHERE {" AND ".join(where)}
+            ORDER BY p.fecha_entrega_programada IS NULL, p.fecha_entrega_programada, p.created_at, p.id
+        """, [*estados, *params])
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def _explosion(pedido_ids) -> dict[int, dict[int, Decimal]]:
+    """{pedido_id: {insumo_id: cantidad}}: todas las líneas por receta en una consulta."""
+    if not pedido_ids:
+        return {}
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT dp.pedido_id, r.insumo_id, SUM(dp.cantidad * r.cantidad)
+            FROM detalle_pedido dp
+            JOIN receta r ON r.producto_id = dp.producto_id
+            WHERE dp.pedido_id IN ({_in(pedido_ids)})
+            GROUP BY dp.pedido_id, r.insumo_id
+        """, list(pedido_ids))
+        req: dict[int, dict[int, Decimal]] = {}
+        for ped, ins, cant in cur.fetchall():
+            req.setdefault(ped, {})[ins] = _dec(cant)
+    return req
+
+
+def _insumos_info(insumo_ids) -> dict[int, dict]:
+    ids = sorted(insumo_ids)
+    if not ids:
+        return {}
+    stock = stock_kardex(ids)
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT id, nombre, unidad_medida, cantidad_disponible
+            FROM insumo WHERE id IN ({_in(ids)})
+        """, ids)
+        return {
+            ins: {"insumo_id": ins, "insumo": nombre, "um": um,
+                  "stock": _stock_ref(stock.get(ins, CERO), stock_db)}
+            for ins, nombre, um, stock_db in cur.fetchall()
+        }
+
+
+def planificar(desde=None, hasta=None, estados=ESTADOS_PENDIENTES) -> PlanProduccion:
+    """
+    Pedidos pendientes con entrega en [desde, hasta] (días locales; vacío =
+    sin límite). Asigna el stock actual a los pedidos en orden de
+    `fecha_entrega_programada`: un pedido toma stock solo si le alcanza
+    completo; si no, queda pendiente y no bloquea a los siguientes.
+    Consultas constantes: pedidos, explosión por receta, insumos y stock.
+    """
+    pedidos = _pedidos_pendientes(desde, hasta, tuple(estados))
+    req = _explosion([p["id"] for p in pedidos])
+    info = _insumos_info({ins for r in req.values() for ins in r})
+
+    restante = {ins: i["stock"] for ins, i in info.items()}
+    total = {ins: CERO for ins in info}
+    for p in pedidos:
+        necesita = req.get(p["id"], {})
+        faltantes = []
+        for ins, cant in necesita.items():
+            total[ins] = total.get(ins, CERO) + cant
+            disponible = restante.get(ins, CERO)
+            if cant > disponible:
+                i = info.get(ins, {"insumo": f"#{ins}", "um": ""})
+                faltantes.append({
+                    "insumo_id": ins, "insumo": i["insumo"], "um": i["um"],
+                    "necesario": cant, "disponible": disponible, "faltante": cant - disponible,
+                })
+        p["requerimientos"] = necesita
+        p["cumple"] = not faltantes
+        p["faltantes"] = sorted(faltantes, key=lambda f: f["insumo"])
+        if p["cumple"]:
+            for ins, cant in necesita.items():
+                restante[ins] -= cant
+
+    insumos = []
+    for ins, i in info.items():
+        necesario = total.get(ins, CERO)
+        insumos.append({
+            **i,
+            "necesario": necesario,
+            "asignado": i["stock"] - restante.get(ins, CERO),
+            "faltante": max(necesario - i["stock"], CERO),
+        })
+    insumos.sort(key=lambda t: t["insumo"])
+    return PlanProduccion(pedidos, insumos)
+
+
+# -------------------------------------------------------------------
+# Consumo de insumos (producir líneas)
+# -------------------------------------------------------------------
+class StockInsuficiente(ValueError):
+    """No alcanza el stock para consumir; `faltantes` lista los insumos."""
+
+    def __init__(self, faltantes: list[dict]):
+        self.faltantes = faltantes
+        nombres = ", ".join(f["insumo"] for f in faltantes) or "insumos"
+        super().__init__(f"Stock insuficiente: {nombres}")
+
+
+def consumir_lineas(pedido_id: int, lineas) -> Requerimientos:
+    """
+    Descuenta los insumos de las líneas dadas del pedido, en una transacción:
+    - un solo `UPDATE insumo ... JOIN` con los totales por insumo, protegido
+      con `cantidad_disponible >= necesario` (si alguna fila no cumple, nada
+      se descuenta y se lanza StockInsuficiente);
+    - un solo INSERT multi-fila en kardex (SALIDA/CONSUMO por línea e insumo).
+    `lineas`: iterable de (producto_id, sabor_id, cantidad).
+    """
+    lineas = [(int(p), int(s), c) for p, s, c in lineas]
+    req = calcular_requerimientos(((p, s), p, c) for p, s, c in lineas)
+    if not req.ok:
+        raise StockInsuficiente(req.faltantes)
+
+    totales = sorted((i["insumo_id"], i["necesario"]) for i in req.insumos if i["necesario"] > 0)
+    if not totales:
+        return req
+
+    filas_kardex = []
+    for p, s, c in lineas:
+        for ch in req.por_linea[(p, s)]:
+            if ch["necesario"] > 0:
+                filas_kardex.append((ch["insumo_id"], ch["necesario"], f"Pedido {pedido_id} – prod {p}/{s} x{c}"))
+
+    with transaction.atomic():
+        if ajustar_stock({ins: -nec for ins, nec in totales}, exigir_stock=True) != len(totales):
+            # Otro proceso consumió antes: la excepción revierte el bloque
+            actual = calcular_requerimientos(((p, s), p, c) for p, s, c in lineas)
+            raise StockInsuficiente(actual.faltantes or [
+                {"insumo_id": i, "insumo": f"#{i}"} for i, _ in totales
+            ])
+
+        with connection.cursor() as cur:
+            cur.execute(f"""
+                INSERT INTO kardex (insumo_id, fecha, tipo, motivo, cantidad, observacion)
+                VALUES {", ".join(["(%s, NOW(), 'SALIDA', 'CONSUMO', %s, %s)"] * len(filas_kardex))}
+            """, [x for fila in filas_kardex for x in fila])
+        marcar_insumos(ins for ins, _ in totales)  # el costo FIFO depende del stock
+    return req
+
+
+class PedidoNoProducible(ValueError):
+    """El pedido no está en producción o sus líneas ya se consumieron."""
+
+
+ESTADOS_PRODUCIBLES = ("CONFIRMADO", "EN_PRODUCCION")
+# Observación que deja consumir_lineas: "Pedido {id} – prod {p}/{s} x{c}"
+_LINEA_CONSUMIDA = re.compile(r"prod (\d+)/(\d+) x")
+
+
+def _lineas_consumidas(cur, pedido_id: int, creado) -> set[tuple[int, int]]:
+    """(producto_id, sabor_id) que ya tienen SALIDA/CONSUMO en kardex para el pedido."""
+    # El consumo es posterior al pedido: rango por kardex_fecha_idx (un día de
+    # holgura por la zona horaria de NOW() frente a created_at)
+    rango, params = "", []
+    if creado:
+        rango, params = "AND fecha >= %s", [creado - timedelta(days=1)]
+    cur.execute(f"""
+        SELECT observacion FROM kardex
+        WHERE motivo = 'CONSUMO' AND observacion LIKE %s {rango}
+    """, [f"Pedido {int(pedido_id)} –%", *params])
+    hechas = set()
+    for (obs,) in cur.fetchall():
+        m = _LINEA_CONSUMIDA.search(obs or "")
+        if m:
+            hechas.add((int(m.group(1)), int(m.group(2))))
+    return hechas
+
+
+@transaction.atomic
+def consumir_pedido(pedido_id: int, solo=None) -> Requerimientos:
+    """
+    Produce las líneas del pedido (todas, o las (producto_id, sabor_id) de
+    `solo`) que aún no se consumieron. Bloquea la fila del pedido, así un
+    reenvío o doble clic espera y luego ve el consumo ya hecho. Lanza
+    PedidoNoProducible si el pedido no está CONFIRMADO / EN_PRODUCCION o si
+    no queda nada por consumir.
+    """
+    with connection.cursor() as cur:
+        cur.execute("SELECT estado, created_at FROM pedido WHERE id = %s FOR UPDATE", [pedido_id])
+        fila = cur.fetchone()
+        if not fila or fila[0] not in ESTADOS_PRODUCIBLES:
+            raise PedidoNoProducible("Solo se producen pedidos confirmados o en producción.")
+        hechas = _lineas_consumidas(cur, pedido_id, fila[1])
+
+    solo = None if solo is None else {(int(p), int(s)) for p, s in solo}
+    lineas = [
+        (prod, sab, cant) for (_, prod, sab), _, cant in lineas_de_pedidos([pedido_id])
+        if (prod, sab) not in hechas and (solo is None or (prod, sab) in solo)
+    ]
+    if not lineas:
+        raise PedidoNoProducible("Los insumos de estas líneas ya se descontaron.")
+    return consumir_lineas(pedido_id, lineas)
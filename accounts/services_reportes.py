@@ -0,0 +1,262 @@
+# accounts/services_reportes.py
+"""
+Constructor de consultas para reportes (views_reportes / resúmenes).
+
+Problema que resuelve: unir `pago` o `detalle_pedido` directo contra `pedido`
+multiplica filas (fan-out) y `SUM(p.total)` cuenta el pedido una vez por pago
+o por línea. Aquí los hijos se pre-agregan en tablas derivadas (una fila por
+pedido, o por pedido+producto/sabor) antes del JOIN, y además se restringen
+con los mismos filtros del pedido para no agregar toda la historia.
+
+También define el filtro de rango de fechas común a reportes y listados:
+los días `d1`/`d2` (hora local, settings.TIME_ZONE) se convierten en límites
+semiabiertos [inicio, fin) comparables directo contra la columna, para que
+MySQL use el índice en vez de evaluar `DATE(col)` fila por fila.
+"""
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+
+# -------------------------------------------------------------------
+# Rango de fechas (días locales -> límites en la zona de la BD)
+# -------------------------------------------------------------------
+def zona_local() -> ZoneInfo:
+    return ZoneInfo(settings.TIME_ZONE)
+
+
+def _a_fecha(d) -> date | None:
+    if d is None or d == "":
+        return None
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    try:
+        return datetime.strptime(str(d).strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def inicio_dia(d: date) -> datetime:
+    """Primer instante del día local `d`, en la zona en que la BD guarda fechas."""
+    dt = datetime.combine(d, time.min)
+    if not settings.USE_TZ:
+        return dt
+    # Con USE_TZ la BD guarda UTC (naive): así se comparan los parámetros crudos.
+    return dt.replace(tzinfo=zona_local()).astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+def limites_rango(d1, d2) -> tuple[datetime | None, datetime | None]:
+    """
+    Días `d1`..`d2` (inclusive, 'YYYY-MM-DD' o date) -> [inicio, fin).
+    Fechas vacías o inválidas dejan ese extremo abierto (None).
+    """
+    f1, f2 = _a_fecha(d1), _a_fecha(d2)
+    inicio = inicio_dia(f1) if f1 else None
+    fin = inicio_dia(f2 + timedelta(days=1)) if f2 else None
+    return inicio, fin
+
+
+def rango_fechas(col: str, d1, d2) -> tuple[list[str], list]:
+    """Condiciones sargables `col >= %s` / `col < %s` y sus parámetros."""
+    inicio, fin = limites_rango(d1, d2)
+    conds, params = [], []
+    if inicio:
+        conds.append(f"{col} >= %s")
+        params.append(inicio)
+    if fin:
+        conds.append(f"{col} < %s")
+        params.append(fin)
+    return conds, params
+
+
+def _offset_local() -> str:
+    # America/La_Paz no tiene horario de verano: un offset fijo basta y evita
+    # depender de las tablas de zonas horarias de MySQL en CONVERT_TZ.
+    off = datetime.now(zona_local()).utcoffset() or timedelta(0)
+    mins = int(off.total_seconds() // 60)
+    signo = "-" if mins < 0 else "+"
+    return f"{signo}{abs(mins) // 60:02d}:{abs(mins) % 60:02d}"
+
+
+def dia_local(col: str) -> str:
+    """Expresión SQL del día local de `col` (para SELECT / GROUP BY, no para WHERE)."""
+    if not settings.USE_TZ:
+        return f"DATE({col})"
+    return f"DATE(CONVERT_TZ({col}, '+00:00', '{_offset_local()}'))"
+
+
+def a_dia_local(dt: datetime | None) -> date | None:
+    """Día local de un datetime leído de la BD (naive = zona de la BD)."""
+    if dt is None:
+        return None
+    if not isinstance(dt, datetime):
+        return dt
+    if settings.USE_TZ:
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=dt_timezone.utc)
+        dt = dt.astimezone(zona_local())
+    return dt.date()
+
+
+class ConsultaReporte:
+    """
+    SELECT armado por partes sobre `pedido p`.
+
+        q = ConsultaReporte()
+        q.where_rango("p.created_at", d1, d2)
+        q.pagos_por_pedido()                # LEFT JOIN (...) pg -> pg.pagado
+        q.select(f"{dia_local('p.created_at')} AS fecha", "SUM(p.total) AS total")
+        q.group_by("fecha")
+        sql, params = q.sql()
+
+    Los filtros `where_pedido` solo pueden referirse a `p` y a las tablas de
+    `joins_base` (p.ej. la factura en CU27); se copian dentro de las tablas
+    derivadas al generar el SQL. Los filtros `where` generales (clientes,
+    búsqueda, etc.) van solo en la consulta externa.
+    """
+
+    def __init__(self, joins_base: str = ""):
+        self.joins_base = joins_base.strip()
+        self._select: list[str] = []
+        self._joins: list = []  # (sql, params) o callable -> (sql, params)
+        self._where_pedido: list[tuple[str, list]] = []
+        self._where: list[tuple[str, list]] = []
+        self._group_by: list[str] = []
+        self._order_by: str | None = None
+        self._limit: int | None = None
+
+    # ---------- partes ----------
+    def select(self, *cols: str):
+        self._select.extend(cols)
+        return self
+
+    def join(self, sql: str, *params):
+        self._joins.append((sql, list(params)))
+        return self
+
+    def where_pedido(self, cond: str, *params):
+        self._where_pedido.append((cond, list(params)))
+        return self
+
+    def where_rango(self, col: str, d1, d2):
+        """Rango de días locales sobre `col` como filtro de pedido (ver `rango_fechas`)."""
+        conds, params = rango_fechas(col, d1, d2)
+        for cond, param in zip(conds, params):
+            self.where_pedido(cond, param)
+        return self
+
+    def where(self, cond: str, *params):
+        self._where.append((cond, list(params)))
+        return self
+
+    def group_by(self, *cols: str):
+        self._group_by.extend(cols)
+        return self
+
+    def order_by(self, order_sql: str | None):
+        self._order_by = order_sql
+        return self
+
+    def limit(self, n: int | None):
+        self._limit = n
+        return self
+
+    # ---------- hijos pre-agregados ----------
+    def _filtro_pedido(self) -> tuple[str, list]:
+        if not self._where_pedido:
+            return "", []
+        conds = " AND ".join(c for c, _ in self._where_pedido)
+        params = [x for _, ps in self._where_pedido for x in ps]
+        return f"WHERE {conds}", params
+
+    def _derivada(self, tipo_join: str, cuerpo_select: str, tabla: str, group_by: str, alias: str):
+        def _render():
+            filtro, params = self._filtro_pedido()
+            return f"""
+                {tipo_join} (
+                    SELECT {cuerpo_select}
+                    FROM {tabla} x
+                    JOIN pedido p ON p.id = x.pedido_id
+                    {self.joins_base}
+                    {filtro}
+                    GROUP BY {group_by}
+                ) {alias} ON {alias}.pedido_id = p.id
+            """, params
+        self._joins.append(_render)
+        return self
+
+    def pagos_por_pedido(self, alias: str = "pg"):
+        """LEFT JOIN con una fila por pedido: `{alias}.pagado`, `{alias}.pagos`."""
+        return self._derivada(
+            "LEFT JOIN",
+            "x.pedido_id, SUM(x.monto) AS pagado, COUNT(*) AS pagos",
+            "pago", "x.pedido_id", alias,
+        )
+
+    def lineas_por_pedido(self, alias: str = "dp", por: str | None = None, tipo_join: str = "LEFT JOIN"):
+        """
+        JOIN con las líneas pre-agregadas: `{alias}.subtotal`, `{alias}.unidades`.
+        `por` = 'producto_id' o 'sabor_id' deja una fila por pedido+producto/sabor.
+        """
+        if por not in (None, "producto_id", "sabor_id"):
+            raise ValueError(f"Agrupación de líneas no soportada: {por}")
+        extra = f", x.{por}" if por else ""
+        return self._derivada(
+            tipo_join,
+            f"x.pedido_id{extra}, SUM(x.sub_total) AS subtotal, SUM(x.cantidad) AS unidades",
+            "detalle_pedido", f"x.pedido_id{extra}", alias,
+        )
+
+    # ---------- salida ----------
+    def sql(self) -> tuple[str, list]:
+        params: list = []
+        partes = [f"SELECT {', '.join(self._select) or '*'}", "FROM pedido p"]
+        if self.joins_base:
+            partes.append(self.joins_base)
+        for j in self._joins:
+            sql, ps = j() if callable(j) else j
+            partes.append(sql.strip())
+            params.extend(ps)
+
+        conds = self._where_pedido + self._where
+        if conds:
+            partes.append("WHERE " + " AND ".join(c for c, _ in conds))
+            params.extend(x for _, ps in conds for x in ps)
+        if self._group_by:
+            partes.append("GROUP BY " + ", ".join(self._group_by))
+        if self._order_by:
+            partes.append(f"ORDER BY {self._order_by}")
+        if self._limit:
+            partes.append(f"LIMIT {int(self._limit)}")
+        return "\n".join(partes), params
+
+
+# -------------------------------------------------------------------
+# Consultas compartidas
+# -------------------------------------------------------------------
+ESTADOS_VENTA = ("CONFIRMADO", "ENTREGADO")
+
+
+def consulta_ventas_diarias() -> ConsultaReporte:
+    """
+    CU23 por día (local) de creación: pedidos, total, pagado y diferencia.
+    Los pagos llegan pre-agregados por pedido (sin doble conteo de p.total).
+    El llamador agrega filtros de fecha (`where_rango`), orden y límite.
+    """
+    dia = dia_local("p.created_at")
+    return (
+        ConsultaReporte()
+        .pagos_por_pedido()
+        .where_pedido(f"p.estado IN ({', '.join(['%s'] * len(ESTADOS_VENTA))})", *ESTADOS_VENTA)
+        .select(
+            f"{dia} AS fecha",
+            "COUNT(*) AS pedidos",
+            "COALESCE(SUM(p.total), 0) AS total",
+            "COALESCE(SUM(pg.pagado), 0) AS pagado",
+            "COALESCE(SUM(p.total), 0) - COALESCE(SUM(pg.pagado), 0) AS diferencia",
+        )
+        .group_by(dia)
+    )
@@ -0,0 +1,190 @@
+# accounts/services_resumen_ventas.py
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models_resumen import VentaDiaria, VentaDiariaDimension  # noqa: F401 (registra modelos)
+from .services_reportes import a_dia_local, consulta_ventas_diarias, dia_local, limites_rango
+
+logger = logging.getLogger(__name__)
+
+
+def resumen_habilitado() -> bool:
+    return getattr(settings, "REPORTES_USAR_RESUMEN", True)
+
+
+# -------------------------------------------------------------------
+# Recalcular un rango de días locales [d1, d2] (ambos inclusive)
+# -------------------------------------------------------------------
+def _refrescar_ventas_diarias(cur, d1: date, d2: date):
+    cur.execute(
+        "DELETE FROM resumen_venta_diaria WHERE fecha >= %s AND fecha <= %s", [d1, d2]
+    )
+    sql, params = (
+        consulta_ventas_diarias()
+        .where_rango("p.created_at", d1, d2)
+        .sql()
+    )
+    cur.execute(f"""
+        INSERT INTO resumen_venta_diaria (fecha, pedidos, total, pagado, actualizado_en)
+        SELECT r.fecha, r.pedidos, r.total, r.pagado, NOW()
+        FROM ({sql}) r
+    """, params)
+
+
+def _refrescar_dimensiones(cur, d1: date, d2: date):
+    cur.execute(
+        "DELETE FROM resumen_venta_dimension WHERE fecha >= %s AND fecha <= %s", [d1, d2]
+    )
+    insert = """
+        INSERT INTO resumen_venta_dimension (fecha, dimension, clave, etiqueta, ventas, total)
+    """
+    rango = "f.fecha >= %s AND f.fecha < %s"
+    limites = list(limites_rango(d1, d2))
+    dia = dia_local("f.fecha")
+
+    # Por día y por cliente: total del pedido (una factura por pedido)
+    cur.execute(insert + f"""
+        SELECT {dia}, 'dia', 0, DATE_FORMAT({dia}, '%%Y-%%m-%%d'),
+               COUNT(*), COALESCE(SUM(p.total), 0)
+        FROM factura f
+        JOIN pedido p ON p.id = f.pedido_id
+        WHERE {rango}
+        GROUP BY {dia}
+    """, limites)
+    cur.execute(insert + f"""
+        SELECT {dia}, 'cliente', p.cliente_id,
+               MAX(COALESCE(NULLIF(TRIM(c.nombre), ''), u.email, '—')),
+               COUNT(*), COALESCE(SUM(p.total), 0)
+        FROM factura f
+        JOIN pedido p ON p.id = f.pedido_id
+        LEFT JOIN cliente c ON c.id = p.cliente_id
+        LEFT JOIN usuario u ON u.id = c.usuario_id
+        WHERE {rango}
+        GROUP BY {dia}, p.cliente_id
+    """, limites)
+
+    # Por producto / sabor: subtotal de las líneas correspondientes
+    for dimension, tabla, col in (("producto", "producto", "producto_id"), ("sabor", "sabor", "sabor_id")):
+        cur.execute(insert + f"""
+            SELECT {dia}, '{dimension}', dp.{col},
+                   MAX(COALESCE(NULLIF(TRIM(t.nombre), ''), '—')),
+                   COUNT(DISTINCT p.id), COALESCE(SUM(dp.sub_total), 0)
+            FROM factura f
+            JOIN pedido p          ON p.id = f.pedido_id
+            JOIN detalle_pedido dp ON dp.pedido_id = p.id
+            LEFT JOIN {tabla} t    ON t.id = dp.{col}
+            WHERE {rango}
+            GROUP BY {dia}, dp.{col}
+        """, limites)
+
+
+@transaction.atomic
+def refrescar_rango(d1: date, d2: date):
+    """Reconstruye ambos resúmenes para los días [d1, d2]."""
+    with connection.cursor() as cur:
+        _refrescar_ventas_diarias(cur, d1, d2)
+        _refrescar_dimensiones(cur, d1, d2)
+
+
+def reconstruir(d1: date | None = None, d2: date | None = None, bloque: int = 31):
+    """
+    Reconstruye [d1, d2] (por defecto todo el historial) en transacciones de
+    `bloque` días (comando `resumen_ventas`). Devuelve los bloques
+    [(desde, hasta)] procesados.
+    """
+    ini, fin = limites_historicos()
+    d1, d2 = d1 or ini, d2 or fin
+    bloques = []
+    if not d1 or not d2 or d1 > d2:
+        return bloques
+    paso = timedelta(days=max(1, bloque))
+    actual = d1
+    while actual <= d2:
+        hasta = min(actual + paso - timedelta(days=1), d2)
+        refrescar_rango(actual, hasta)
+        bloques.append((actual, hasta))
+        actual = hasta + timedelta(days=1)
+    return bloques
+
+
+def refrescar_dias(dias):
+    """Recalcula solo los días indicados (agrupando días contiguos)."""
+    dias = sorted(set(d for d in dias if d))
+    if not dias:
+        return
+    ini = fin = dias[0]
+    for d in dias[1:]:
+        if d == fin + timedelta(days=1):
+            fin = d
+            continue
+        refrescar_rango(ini, fin)
+        ini = fin = d
+    refrescar_rango(ini, fin)
+
+
+def _dias_de_pedidos(pedido_ids) -> set:
+    """Días afectados por los pedidos: día de creación y día de factura."""
+    ids = list(pedido_ids)
+    if not ids:
+        return set()
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT p.created_at, f.fecha
+            FROM pedido p
+            LEFT JOIN factura f ON f.pedido_id = p.id
+            WHERE p.id IN ({", ".join(["%s"] * len(ids))})
+        """, ids)
+        dias = set()
+        for creado, facturado in cur.fetchall():
+            dias.update(a_dia_local(d) for d in (creado, facturado) if d)
+    return dias
+
+
+# -------------------------------------------------------------------
+# Mantenimiento incremental desde las escrituras
+# -------------------------------------------------------------------
+def marcar_pedido(pedido_id: int, dias=()):
+    """
+    Marca un pedido como modificado (pedido, pago, factura o detalle).
+    Sus días se recalculan al confirmar la transacción en curso, junto con
+    `dias`: los que ya no se deducen del pedido (fecha anterior de una
+    factura, factura borrada).
+    Nunca propaga errores (quedan en el log): el resumen se puede
+    reconstruir con el comando.
+    """
+    dias = {d for d in dias if d}
+    if not (pedido_id or dias) or not resumen_habilitado():
+        return
+    ids = [int(pedido_id)] if pedido_id else []
+    transaction.on_commit(lambda: _refrescar_pedidos(ids, dias))
+
+
+def marcar_dias(dias):
+    """Recalcula `dias` al confirmar (p.ej. los de un pedido borrado)."""
+    marcar_pedido(None, dias)
+
+
+def _refrescar_pedidos(pedido_ids, dias=()):
+    try:
+        refrescar_dias(_dias_de_pedidos(pedido_ids) | set(dias))
+    except Exception:
+        logger.exception(
+            "No se pudo refrescar el resumen de ventas (pedidos %s, días %s); "
+            "reconstruir con `manage.py resumen_ventas`.", list(pedido_ids), sorted(dias),
+        )
+
+
+def limites_historicos() -> tuple[date | None, date | None]:
+    """Primer y último día con pedidos o facturas (para el backfill)."""
+    with connection.cursor() as cur:
+        cur.execute("""
+            SELECT LEAST(COALESCE((SELECT MIN(created_at) FROM pedido), NOW()),
+                         COALESCE((SELECT MIN(fecha) FROM factura), NOW())),
+                   GREATEST(COALESCE((SELECT MAX(created_at) FROM pedido), NOW()),
+                            COALESCE((SELECT MAX(fecha) FROM factura), NOW()))
+        """)
+        ini, fin = cur.fetchone()
+    return (a_dia_local(ini), a_dia_local(fin))
@@ -0,0 +1,200 @@
+# accounts/services_stripe.py
+"""
+Webhook de Stripe con bandeja local.
+
+El webhook solo verifica la firma (STRIPE_WEBHOOK_SECRET) y guarda el
+evento crudo en `stripe_evento` con un INSERT (los reintentos de Stripe
+chocan con el `evento_id` único y se descartan); responde 200 sin llamar a
+la API de Stripe. El comando `procesar_stripe` aplica los pendientes, cada
+uno en su transacción junto con el cambio de estado, así un evento se
+aplica una sola vez aunque corran varios workers.
+
+Para pruebas locales, `firmar()` arma la cabecera Stripe-Signature de un
+payload y el comando `reproducir_stripe` envía eventos de ejemplo firmados
+(accounts/fixtures/stripe/).
+"""
+import hashlib
+import hmac
+import json
+import time
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models_stripe import EventoStripe
+from .services_pagos import registrar_pago
+
+TOLERANCIA = getattr(settings, "STRIPE_WEBHOOK_TOLERANCIA", 300)
+MAX_INTENTOS = getattr(settings, "STRIPE_EVENTOS_MAX_INTENTOS", 5)
+
+
+class FirmaInvalida(ValueError):
+    pass
+
+
+# -------------------------------------------------------------------
+# Recepción
+# -------------------------------------------------------------------
+def firmar(payload: bytes, secreto: str, t: int | None = None) -> str:
+    """Cabecera Stripe-Signature para `payload` (mismo esquema v1 que Stripe)."""
+    t = int(time.time()) if t is None else t
+    firma = hmac.new(secreto.encode(), f"{t}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={t},v1={firma}"
+
+
+def verificar(payload: bytes, cabecera: str) -> dict:
+    """Evento (dict) si la firma es válida y reciente; si no, FirmaInvalida."""
+    secreto = settings.STRIPE_WEBHOOK_SECRET
+    if not secreto:
+        raise FirmaInvalida("STRIPE_WEBHOOK_SECRET no está configurado.")
+    try:
+        stripe.WebhookSignature.verify_header(payload.decode("utf-8"), cabecera or "", secreto, TOLERANCIA)
+        evento = json.loads(payload)
+    except (stripe.error.SignatureVerificationError, UnicodeDecodeError, ValueError) as e:
+        raise FirmaInvalida(str(e))
+    if not isinstance(evento, dict) or not evento.get("id") or not evento.get("type"):
+        raise FirmaInvalida("Evento sin id o tipo.")
+    return evento
+
+
+def encolar(evento: dict, payload: bytes):
+    """Un INSERT (IGNORE si el evento ya estaba)."""
+    objeto = (evento.get("data") or {}).get("object") or {}
+    EventoStripe.objects.bulk_create([
+        EventoStripe(
+            evento_id=evento["id"],
+            tipo=evento["type"][:100],
+            objeto_id=str(objeto.get("id") or "")[:255],
+            payload=payload.decode("utf-8"),
+        )
+    ], ignore_conflicts=True)
+
+
+def estado_sesion(session_id: str) -> str | None:
+    """Estado del último evento recibido para una sesión de checkout (None si aún no llegó)."""
+    if not session_id:
+        return None
+    return (
+        EventoStripe.objects.filter(objeto_id=session_id)
+        .order_by("-id").values_list("estado", flat=True).first()
+    )
+
+
+# -------------------------------------------------------------------
+# Aplicación de eventos
+# -------------------------------------------------------------------
+def _usuario_id_por_email(email: str) -> int | None:
+    if not email:
+        return None
+    with connection.cursor() as cur:
+        cur.execute("SELECT id FROM usuario WHERE email=%s LIMIT 1", [email])
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def _usuario_id_dueno_pedido(pedido_id: int) -> int | None:
+    with connection.cursor() as cur:
+        cur.execute("""
+            SELECT c.usuario_id FROM pedido p
+            JOIN cliente c ON c.id = p.cliente_id
+            WHERE p.id = %s
+        """, [pedido_id])
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def _existe_referencia(ref: str) -> bool:
+    # Pagos de sesiones registradas por el flujo anterior (pago_exitoso);
+    # búsqueda por el índice pago_referencia_idx (migración 0017)
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1 FROM pago WHERE referencia=%s LIMIT 1", [ref])
+        return cur.fetchone() is not None
+
+
+def _checkout_pagado(sesion: dict) -> bool:
+    """checkout.session.completed / async_payment_succeeded: registra el pago."""
+    if sesion.get("payment_status") != "paid":
+        return False
+    metadata = sesion.get("metadata") or {}
+    try:
+        pedido_id = int(metadata.get("pedido_id") or 0)
+    except (TypeError, ValueError):
+        return False
+    if not pedido_id:
+        return False
+    # Bloquea el pedido: otro evento de la misma sesión (completed y
+    # async_payment_succeeded) espera aquí y luego ve el pago ya registrado
+    with connection.cursor() as cur:
+        cur.execute("SELECT id FROM pedido WHERE id = %s FOR UPDATE", [pedido_id])
+        if cur.fetchone() is None:
+            return False
+    if _existe_referencia(sesion["id"]):
+        return False
+
+    monto = Decimal(sesion.get("amount_total") or 0) / Decimal("100")
+    registrador = (
+        _usuario_id_por_email(metadata.get("user_email") or "")
+        or _usuario_id_dueno_pedido(pedido_id)
+    )
+    registrar_pago(pedido_id, "TRANSFERENCIA", monto, sesion["id"], registrador)
+    return True
+
+
+# tipo de evento -> función(objeto) que devuelve True si aplicó algo
+MANEJADORES = {
+    "checkout.session.completed": _checkout_pagado,
+    "checkout.session.async_payment_succeeded": _checkout_pagado,
+}
+
+
+def procesar(pk: int) -> str | None:
+    """
+    Aplica un evento pendiente (o con error) y deja su estado en la misma
+    transacción. None si otro worker lo tiene tomado o ya estaba aplicado.
+    """
+    with transaction.atomic():
+        ev = (
+            EventoStripe.objects.select_for_update(skip_locked=True)
+            .filter(pk=pk, estado__in=(EventoStripe.PENDIENTE, EventoStripe.ERROR))
+            .first()
+        )
+        if ev is None:
+            return None
+        try:
+            with transaction.atomic():
+                datos = json.loads(ev.payload)
+                manejador = MANEJADORES.get(ev.tipo)
+                aplicado = bool(manejador and manejador((datos.get("data") or {}).get("object") or {}))
+        except Exception as e:
+            ev.estado, ev.error = EventoStripe.ERROR, f"{type(e).__name__}: {e}"[:2000]
+        else:
+            ev.estado = EventoStripe.PROCESADO if aplicado else EventoStripe.IGNORADO
+            ev.error = ""
+            ev.procesado_en = timezone.now()
+        ev.intentos += 1
+        ev.save(update_fields=["estado", "error", "intentos", "procesado_en"])
+        return ev.estado
+
+
+def procesar_pendientes(lote: int = 100, max_intentos: int = MAX_INTENTOS) -> dict[str, int]:
+    """Una pasada sobre la bandeja (pendientes y errores con intentos < max). {estado: n}."""
+    resumen: dict[str, int] = {}
+    ultimo = 0
+    while True:
+        ids = list(
+            EventoStripe.objects.filter(
+                Q(estado=EventoStripe.PENDIENTE) | Q(estado=EventoStripe.ERROR, intentos__lt=max_intentos),
+                id__gt=ultimo,
+            ).order_by("id").values_list("id", flat=True)[:lote]
+        )
+        for pk in ids:
+            estado = procesar(pk)
+            if estado:
+                resumen[estado] = resumen.get(estado, 0) + 1
+        if len(ids) < lote:
+            return resumen
+        ultimo = ids[-1]
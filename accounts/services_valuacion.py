@@ -0,0 +1,276 @@
+# accounts/services_valuacion.py
+"""
+Valuación FIFO del inventario y costo de ventas.
+
+`kardex` solo guarda cantidades. Este módulo deriva las capas de costo:
+- cada entrada (o ajuste positivo) abre una capa en `fifo_capa` con el costo
+  de su compra (observación "Compra #N" -> compra_detalle) o, si no la hay,
+  con el último costo conocido del insumo;
+- cada salida (o ajuste negativo) consume las capas más antiguas y deja el
+  detalle valuado en `fifo_consumo`.
+
+Es incremental: `fifo_corte` guarda el último id de kardex procesado y
+`valuar()` solo recorre los movimientos posteriores (en orden de registro).
+Lo corre el comando `valuar_inventario` (cron); las pantallas leen las
+tablas derivadas, nunca el historial completo.
+
+Un INSERT en kardex dentro de una transacción larga (consumo, recepción)
+toma su id al insertar pero se ve al confirmar: puede aparecer un id menor
+que otros ya valuados. Por eso solo se valúa hasta el MAX(id) visto hace al
+menos VALUACION_MARGEN segundos, y cada pasada concilia además los ids de
+las últimas VALUACION_VENTANA filas que no tengan capa ni consumo.
+"""
+import re
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models_db import Kardex
+from .models_valuacion import CapaFifo, ConsumoFifo, ValuacionCorte
+from .services_costos import costos_insumos
+from .services_kardex import delta
+from .services_reportes import dia_local, rango_fechas
+
+CERO = Decimal("0")
+MARGEN = getattr(settings, "VALUACION_MARGEN", 60)
+VENTANA = getattr(settings, "VALUACION_VENTANA", 10000)
+_COMPRA_RE = re.compile(r"Compra #(\d+)")
+
+
+# -------------------------------------------------------------------
+# Proceso incremental
+# -------------------------------------------------------------------
+def _costos_compra(movs) -> dict[tuple[int, int], Decimal]:
+    """{(compra_id, insumo_id): costo unitario ponderado} de las entradas por compra."""
+    pares = set()
+    for _, ins, _, tipo, motivo, _, obs in movs:
+        m = _COMPRA_RE.search(obs or "") if tipo == "ENTRADA" and motivo == "COMPRA" else None
+        if m:
+            pares.add((int(m.group(1)), ins))
+    if not pares:
+        return {}
+    compras = sorted({c for c, _ in pares})
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT compra_id, insumo_id, SUM(cantidad * costo_unitario) / NULLIF(SUM(cantidad), 0)
+            FROM compra_detalle
+            WHERE compra_id IN ({", ".join(["%s"] * len(compras))})
+            GROUP BY compra_id, insumo_id
+        """, compras)
+        return {
+            (c, i): Decimal(str(costo))
+            for c, i, costo in cur.fetchall()
+            if (c, i) in pares and costo is not None
+        }
+
+
+def _ultimos_costos(insumo_ids) -> dict[int, Decimal]:
+    """Costo de la capa más reciente de cada insumo; si no tiene, el de costo_insumo."""
+    ids = list(insumo_ids)
+    ultimas = (
+        CapaFifo.objects.filter(insumo_id__in=ids)
+        .values("insumo_id").annotate(m=Max("kardex_id")).values("m")
+    )
+    costos = {ins: Decimal(c) for ins, c in costos_insumos(ids, "ultimo").items()}
+    costos.update(
+        CapaFifo.objects.filter(kardex_id__in=ultimas).values_list("insumo_id", "costo_unitario")
+    )
+    return costos
+
+
+_CAMPOS = ("pk", "insumo_id", "fecha", "tipo", "motivo", "cantidad", "observacion")
+
+
+def _corte() -> ValuacionCorte:
+    # La fila de corte serializa los procesos: dos valuaciones no se pisan
+    return ValuacionCorte.objects.select_for_update().get_or_create(pk=1)[0]
+
+
+@transaction.atomic
+def _fijar_tope():
+    """Pasado el margen, el MAX(id) observado antes pasa a ser valuable y se observa uno nuevo."""
+    corte = _corte()
+    ahora = timezone.now()
+    if corte.tope_en and ahora - corte.tope_en < timedelta(seconds=MARGEN):
+        return
+    maximo = Kardex.objects.aggregate(m=Max("pk"))["m"] or 0
+    corte.hasta_kardex_id = max(corte.hasta_kardex_id, maximo if MARGEN <= 0 else corte.tope_kardex_id)
+    corte.tope_kardex_id, corte.tope_en = maximo, ahora
+    corte.save(update_fields=["hasta_kardex_id", "tope_kardex_id", "tope_en", "actualizado_en"])
+
+
+@transaction.atomic
+def _valuar_bloque(bloque: int) -> int:
+    corte = _corte()
+    movs = list(
+        Kardex.objects.filter(pk__gt=corte.ultimo_kardex_id, pk__lte=corte.hasta_kardex_id)
+        .order_by("pk").values_list(*_CAMPOS)[:bloque]
+    )
+    if not movs:
+        return 0
+    _aplicar(movs)
+    corte.ultimo_kardex_id = movs[-1][0]
+    corte.save(update_fields=["ultimo_kardex_id", "actualizado_en"])
+    return len(movs)
+
+
+@transaction.atomic
+def _conciliar(bloque: int) -> int:
+    """Movimientos ya dejados atrás por el corte que no tienen capa ni consumo (confirmados tarde)."""
+    corte = _corte()
+    movs = list(
+        Kardex.objects.filter(
+            pk__gt=max(0, corte.ultimo_kardex_id - VENTANA), pk__lte=corte.ultimo_kardex_id,
+            tipo__in=("ENTRADA", "SALIDA", "AJUSTE"),
+        )
+        .exclude(cantidad=0)
+        .exclude(pk__in=CapaFifo.objects.values("kardex_id"))
+        .exclude(pk__in=ConsumoFifo.objects.values("kardex_id"))
+        .order_by("pk").values_list(*_CAMPOS)[:bloque]
+    )
+    if movs:
+        _aplicar(movs)
+    return len(movs)
+
+
+def _aplicar(movs):
+    """Abre y consume capas para `movs` (el llamador tiene tomada la fila de corte)."""
+    insumos = {m[1] for m in movs}
+    abiertas: dict[int, deque] = {ins: deque() for ins in insumos}
+    for c in CapaFifo.objects.filter(insumo_id__in=insumos, restante__gt=0).order_by("insumo_id", "kardex_id"):
+        abiertas[c.insumo_id].append(c)
+    ultimo_costo = _ultimos_costos(insumos)
+    costo_compra = _costos_compra(movs)
+
+    nuevas: list[CapaFifo] = []
+    tocadas: dict[int, CapaFifo] = {}
+    consumos: list[ConsumoFifo] = []
+
+    for pk, ins, fecha, tipo, motivo, cantidad, obs in movs:
+        d = delta(tipo, cantidad)
+        if d > 0:
+            m = _COMPRA_RE.search(obs or "") if tipo == "ENTRADA" and motivo == "COMPRA" else None
+            costo = costo_compra.get((int(m.group(1)), ins)) if m else None
+            if costo is None:
+                costo = ultimo_costo.get(ins, CERO)
+            capa = CapaFifo(kardex_id=pk, insumo_id=ins, fecha=fecha,
+                            cantidad=d, restante=d, costo_unitario=costo)
+            nuevas.append(capa)
+            abiertas[ins].append(capa)
+            ultimo_costo[ins] = costo
+        elif d < 0:
+            falta = -d
+            cola = abiertas[ins]
+            while falta > 0 and cola:
+                capa = cola[0]
+                toma = min(capa.restante, falta)
+                consumos.append(ConsumoFifo(
+                    kardex_id=pk, capa_kardex_id=capa.kardex_id, insumo_id=ins, fecha=fecha,
+                    motivo=motivo, cantidad=toma, costo_unitario=capa.costo_unitario,
+                ))
+                capa.restante -= toma
+                falta -= toma
+                tocadas[capa.kardex_id] = capa
+                if capa.restante <= 0:
+                    cola.popleft()
+            if falta > 0:
+                # Salida sin capas (stock negativo o historial previo a la valuación)
+                consumos.append(ConsumoFifo(
+                    kardex_id=pk, capa_kardex_id=None, insumo_id=ins, fecha=fecha,
+                    motivo=motivo, cantidad=falta, costo_unitario=ultimo_costo.get(ins, CERO),
+                ))
+
+    ids_nuevas = {c.kardex_id for c in nuevas}
+    CapaFifo.objects.bulk_create(nuevas)
+    CapaFifo.objects.bulk_update(
+        [c for k, c in tocadas.items() if k not in ids_nuevas], ["restante"], batch_size=500
+    )
+    ConsumoFifo.objects.bulk_create(consumos, batch_size=500)
+
+
+def valuar(bloque: int = 2000) -> int:
+    """Concilia los rezagados y procesa los movimientos nuevos (en bloques). Devuelve cuántos."""
+    _fijar_tope()
+    total = 0
+    for paso in (_conciliar, _valuar_bloque):
+        while True:
+            n = paso(bloque)
+            total += n
+            if n < bloque:
+                break
+    return total
+
+
+def estado() -> ValuacionCorte | None:
+    """Fila de corte para mostrar (sin bloquearla)."""
+    return ValuacionCorte.objects.filter(pk=1).first()
+
+
+@transaction.atomic
+def reiniciar():
+    """Borra las tablas derivadas; el siguiente `valuar()` recorre todo el kardex."""
+    ConsumoFifo.objects.all().delete()
+    CapaFifo.objects.all().delete()
+    ValuacionCorte.objects.update_or_create(pk=1, defaults={"ultimo_kardex_id": 0})
+
+
+# -------------------------------------------------------------------
+# Lecturas para reportes
+# -------------------------------------------------------------------
+def valor_stock(insumo_ids=None) -> dict[int, dict]:
+    """{insumo_id: {'cantidad', 'valor'}} según las capas abiertas."""
+    where, params = "", []
+    if insumo_ids is not None:
+        ids = [int(i) for i in insumo_ids]
+        if not ids:
+            return {}
+        where = f"AND insumo_id IN ({', '.join(['%s'] * len(ids))})"
+        params = ids
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT insumo_id, SUM(restante), SUM(restante * costo_unitario)
+            FROM fifo_capa
+            WHERE restante > 0 {where}
+            GROUP BY insumo_id
+        """, params)
+        return {
+            ins: {"cantidad": Decimal(str(cant or 0)), "valor": Decimal(str(valor or 0))}
+            for ins, cant, valor in cur.fetchall()
+        }
+
+
+def costo_ventas(d1=None, d2=None, periodo: str = "mes") -> list[dict]:
+    """
+    Costo de lo consumido por período ('dia' o 'mes', día local):
+    `consumo` = salidas por producción (COGS), `otros` = mermas/ajustes,
+    `sin_capa` = cantidad valuada sin capa (a último costo).
+    """
+    dia = dia_local("cf.fecha")
+    col = dia if periodo == "dia" else f"DATE_SUB({dia}, INTERVAL DAYOFMONTH({dia}) - 1 DAY)"
+    conds, params = rango_fechas("cf.fecha", d1, d2)
+    where = f"WHERE {' AND '.join(conds)}" if conds else ""
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT {col} AS periodo,
+                   SUM(CASE WHEN cf.motivo = 'CONSUMO' THEN cf.cantidad * cf.costo_unitario ELSE 0 END),
+                   SUM(CASE WHEN cf.motivo <> 'CONSUMO' THEN cf.cantidad * cf.costo_unitario ELSE 0 END),
+                   SUM(CASE WHEN cf.capa_kardex_id IS NULL THEN cf.cantidad ELSE 0 END)
+            FROM fifo_consumo cf
+            {where}
+            GROUP BY periodo
+            ORDER BY periodo
+        """, params)
+        return [
+            {
+                "periodo": per,
+                "consumo": Decimal(str(cons or 0)),
+                "otros": Decimal(str(otros or 0)),
+                "sin_capa": Decimal(str(sin or 0)),
+            }
+            for per, cons, otros, sin in cur.fetchall()
+        ]
@@ -1,8 +1,25 @@
 # accounts/signals.py
+import hashlib
+import threading
+
+from django.conf import settings
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import connection, transaction
+from .models_db import (
+    Cliente, Compra, CompraDetalle, Factura, Pago, Pedido, Permiso, Producto, ProductoSabor,
+    Proveedor, RolPermiso, Sabor, Usuario, UsuarioRol,
+)
+from .permissions import invalidar_permisos
+from .services_catalogo import invalidar as invalidar_catalogo
+from .services_costos import marcar_insumos
+from .services_pagos import recalcular as recalcular_saldo
+from .services_busqueda import al_confirmar, desindexar, indexar_clientes, indexar_clientes_de_usuario, indexar_proveedores
+from .services_reportes import a_dia_local
+from .services_resumen_ventas import marcar_dias, marcar_pedido
 from .utils import log_event
 
 User = get_user_model()
@@ -10,9 +27,10 @@ User = get_user_model()
 # -------------------------------------------------------------------
 # Helpers DB
 # -------------------------------------------------------------------
-def _exec(sql, params=None):
+def _exec(sql, params=None) -> int:
     with connection.cursor() as cur:
         cur.execute(sql, params or [])
+        return cur.rowcount
 
 def _fetchone(sql, params=None):
     with connection.cursor() as cur:
@@ -45,83 +63,113 @@ def ensure_role_has_perm(rol: str, permiso: str):
     if not row:
         return
     permiso_id = row[0]
-    _exec("""
+    creado = _exec("""
         INSERT INTO rol_permiso (rol_id, permiso_id)
         SELECT %s, %s
         WHERE NOT EXISTS(
           SELECT 1 FROM rol_permiso WHERE rol_id=%s AND permiso_id=%s
         )
     """, [rol_id, permiso_id, rol_id, permiso_id])
+    if creado:
+        invalidar_permisos()
+
+_bootstrap_hecho = False
+_bootstrap_lock = threading.Lock()
+
 
-def bootstrap_roles_perms():
-    ensure_perm_exists("PEDIDO_READ", "Puede ver pedidos")
-    ensure_role_exists("CLIENTE")
-    ensure_role_has_perm("CLIENTE", "PEDIDO_READ")
+def bootstrap_roles_perms(forzar: bool = False):
+    """
+    Permisos/roles mínimos. Lo corre la migración 0010; en cada proceso se
+    verifica una sola vez (primer login) por si la base se migró antes.
+    """
+    global _bootstrap_hecho
+    if _bootstrap_hecho and not forzar:
+        return
+    with _bootstrap_lock:
+        if _bootstrap_hecho and not forzar:
+            return
+        ensure_perm_exists("PEDIDO_READ", "Puede ver pedidos")
+        ensure_role_exists("CLIENTE")
+        ensure_role_has_perm("CLIENTE", "PEDIDO_READ")
+        _bootstrap_hecho = True
 
 # -------------------------------------------------------------------
 # Sincronización Django User -> tabla accounts.usuario
 # -------------------------------------------------------------------
-def ensure_usuario_row(email: str, nombre: str = "", password_hash: str = "") -> int | None:
+USUARIO_SYNC_TTL = getattr(settings, "USUARIO_SYNC_TTL", 86400)
+
+
+def _clave_sync(email: str) -> str:
+    return f"usuario_sync:{(email or '').strip().lower()}"
+
+
+def _huella(nombre: str, password_hash: str) -> str:
+    return hashlib.sha1(f"{nombre}\0{password_hash}".encode()).hexdigest()
+
+
+def upsert_usuario(email: str, nombre: str = "", password_hash: str = "") -> tuple[int | None, int]:
     """
-    Crea (o actualiza) la fila en `usuario` para el email dado.
-    Escribe también `hash_password` para cumplir NOT NULL.
+    Crea o actualiza la fila de `usuario` para el email (clave única) en una
+    sola sentencia; escribe `hash_password` para cumplir NOT NULL.
+    Devuelve (id, filas afectadas): 1 = alta (o sin cambios), 2 = actualizada.
     """
     if not email:
-        return None
-
-    # ¿existe ya?
-    row = _fetchone("SELECT id, hash_password FROM usuario WHERE LOWER(email)=LOWER(%s) LIMIT 1", [email])
-    if row:
-        uid, db_hash = row[0], row[1]
-        # Si tenemos un hash nuevo de Django y cambió, lo sincronizamos.
-        if password_hash and password_hash != (db_hash or ""):
-            _exec("""
-                UPDATE usuario
-                   SET hash_password = %s,
-                       nombre = CASE WHEN %s <> '' THEN %s ELSE nombre END
-                 WHERE id = %s
-            """, [password_hash, nombre or "", nombre or "", uid])
-        return uid
-
-    # No existe: insertamos incluyendo hash_password
-    _exec("""
-        INSERT INTO usuario (nombre, email, activo, hash_password)
-        VALUES (%s, %s, 1, %s)
-    """, [nombre or email, email, password_hash or ""])
-
-    row = _fetchone("SELECT id FROM usuario WHERE LOWER(email)=LOWER(%s) LIMIT 1", [email])
-    return row[0] if row else None
+        return None, 0
+    with connection.cursor() as cur:
+        cur.execute("""
+            INSERT INTO usuario (nombre, email, activo, hash_password)
+            VALUES (%s, %s, 1, %s)
+            ON DUPLICATE KEY UPDATE
+                id = LAST_INSERT_ID(id),
+                hash_password = IF(%s <> '', %s, hash_password),
+                nombre = IF(%s <> '', %s, nombre)
+        """, [nombre or email, email, password_hash,
+              password_hash, password_hash, nombre, nombre])
+        return cur.lastrowid or None, cur.rowcount
 
-def ensure_usuario_has_role(usuario_id: int, rol_nombre: str):
-    row = _fetchone("SELECT id FROM rol WHERE nombre=%s", [rol_nombre])
-    if not row:
-        return
-    rol_id = row[0]
-    _exec("""
+def ensure_usuario_has_role(usuario_id: int, rol_nombre: str, email: str | None = None):
+    creado = _exec("""
         INSERT INTO usuario_rol (usuario_id, rol_id)
-        SELECT %s, %s
-        WHERE NOT EXISTS(
-          SELECT 1 FROM usuario_rol WHERE usuario_id=%s AND rol_id=%s
-        )
-    """, [usuario_id, rol_id, usuario_id, rol_id])
+        SELECT %s, r.id FROM rol r
+        WHERE r.nombre = %s
+          AND NOT EXISTS (
+            SELECT 1 FROM usuario_rol ur WHERE ur.usuario_id = %s AND ur.rol_id = r.id
+          )
+    """, [usuario_id, rol_nombre, usuario_id])
+    if creado:
+        if email is None:
+            row = _fetchone("SELECT email FROM usuario WHERE id=%s", [usuario_id])
+            email = row[0] if row else None
+        if email:
+            invalidar_permisos(email)
 
 def sync_app_usuario_from_auth(user: User):
     """
     A partir del auth.User de Django, asegura fila en `usuario`,
     sincroniza el hash y asigna rol CLIENTE con PEDIDO_READ.
+    Si nombre y hash no cambiaron desde la última sincronización (huella en
+    caché) no toca la base; si cambiaron, es un solo upsert.
     """
     if not user or not getattr(user, "email", ""):
         return
-    bootstrap_roles_perms()
 
     nombre = (user.get_full_name() or user.first_name or user.username or "").strip()
     # Django guarda el hash en user.password (pbkdf2_sha256$....)
     password_hash = user.password or ""
 
+    clave, huella = _clave_sync(user.email), _huella(nombre, password_hash)
+    if cache.get(clave) == huella:
+        return
+
+    bootstrap_roles_perms()
     with transaction.atomic():
-        uid = ensure_usuario_row(user.email, nombre, password_hash=password_hash)
-        if uid:
-            ensure_usuario_has_role(uid, "CLIENTE")
+        uid, filas = upsert_usuario(user.email, nombre, password_hash=password_hash)
+        if uid and filas == 1:
+            # Alta (o fila idéntica con la huella vencida): el INSERT del rol es idempotente
+            ensure_usuario_has_role(uid, "CLIENTE", user.email)
+        if uid and filas == 2 and nombre:
+            al_confirmar(indexar_clientes_de_usuario, uid)
+        transaction.on_commit(lambda: cache.set(clave, huella, USUARIO_SYNC_TTL))
 
 # -------------------------------------------------------------------
 # Receivers (bitácora + auto-sync)
@@ -140,3 +188,112 @@ def on_login(sender, request, user, **kwargs):
 @receiver(user_logged_out)
 def on_logout(sender, request, user, **kwargs):
     log_event(request, "Auth", getattr(user, "id", 0), "Logout")
+
+
+# -------------------------------------------------------------------
+# Invalidación de la caché de permisos (admin / ORM)
+# -------------------------------------------------------------------
+@receiver(post_save, sender=UsuarioRol)
+@receiver(post_delete, sender=UsuarioRol)
+def on_usuario_rol_change(sender, instance, **kwargs):
+    try:
+        invalidar_permisos(instance.usuario.email)
+    except Exception:
+        invalidar_permisos()
+
+@receiver(post_save, sender=RolPermiso)
+@receiver(post_delete, sender=RolPermiso)
+@receiver(post_save, sender=Permiso)
+@receiver(post_delete, sender=Permiso)
+def on_rol_permiso_change(sender, instance, **kwargs):
+    invalidar_permisos()
+
+
+# -------------------------------------------------------------------
+# Resumen de ventas (escrituras vía ORM; el SQL crudo llama marcar_pedido)
+# -------------------------------------------------------------------
+# Al confirmar, un pedido o factura borrados (o la fecha anterior de una
+# factura) ya no están en la BD: sus días se toman aquí.
+@receiver(post_save, sender=Pedido)
+def on_pedido_change(sender, instance, **kwargs):
+    marcar_pedido(instance.pk)
+
+@receiver(pre_delete, sender=Pedido)
+def on_pedido_delete(sender, instance, **kwargs):
+    facturado = Factura.objects.filter(pedido_id=instance.pk).values_list("fecha", flat=True)
+    marcar_dias(a_dia_local(d) for d in (instance.created_at, *facturado))
+
+@receiver(pre_save, sender=Factura)
+def on_factura_pre_save(sender, instance, **kwargs):
+    instance._fecha_anterior = (
+        Factura.objects.filter(pk=instance.pk).values_list("fecha", flat=True).first() if instance.pk else None
+    )
+
+@receiver(post_save, sender=Factura)
+def on_factura_change(sender, instance, **kwargs):
+    marcar_pedido(instance.pedido_id, [a_dia_local(getattr(instance, "_fecha_anterior", None))])
+
+@receiver(post_delete, sender=Factura)
+def on_factura_delete(sender, instance, **kwargs):
+    marcar_pedido(instance.pedido_id, [a_dia_local(instance.fecha)])
+
+
+@receiver(post_save, sender=Pago)
+@receiver(post_delete, sender=Pago)
+def on_pago_change(sender, instance, **kwargs):
+    # Pagos por ORM (admin): services_pagos.registrar_pago ya suma en pedido_saldo
+    recalcular_saldo([instance.pedido_id])
+    marcar_pedido(instance.pedido_id)
+
+
+# -------------------------------------------------------------------
+# Índice de búsqueda (clientes / proveedores)
+# -------------------------------------------------------------------
+@receiver(post_save, sender=Cliente)
+def on_cliente_save(sender, instance, **kwargs):
+    al_confirmar(indexar_clientes, [instance.pk])
+
+@receiver(post_save, sender=Usuario)
+def on_usuario_save(sender, instance, **kwargs):
+    al_confirmar(indexar_clientes_de_usuario, instance.pk)
+    # Editado fuera del login (admin/perfil): la próxima sincronización escribe
+    cache.delete(_clave_sync(instance.email))
+
+@receiver(post_save, sender=Proveedor)
+def on_proveedor_save(sender, instance, **kwargs):
+    al_confirmar(indexar_proveedores, [instance.pk])
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Proveedor)
+def on_busqueda_delete(sender, instance, **kwargs):
+    entidad = "cliente" if sender is Cliente else "proveedor"
+    al_confirmar(desindexar, entidad, instance.pk)
+
+
+# -------------------------------------------------------------------
+# Costos por insumo (al guardar compras)
+# -------------------------------------------------------------------
+@receiver(post_save, sender=CompraDetalle)
+@receiver(post_delete, sender=CompraDetalle)
+def on_compra_detalle_change(sender, instance, **kwargs):
+    marcar_insumos([instance.insumo_id])
+
+@receiver(post_save, sender=Compra)
+def on_compra_change(sender, instance, **kwargs):
+    # La fecha de la compra cambia el orden de los costos de sus insumos
+    marcar_insumos(
+        CompraDetalle.objects.filter(compra_id=instance.pk).values_list("insumo_id", flat=True)
+    )
+
+
+# -------------------------------------------------------------------
+# Catálogo público en caché
+# -------------------------------------------------------------------
+@receiver(post_save, sender=Sabor)
+@receiver(post_delete, sender=Sabor)
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=ProductoSabor)
+@receiver(post_delete, sender=ProductoSabor)
+def on_catalogo_change(sender, instance, **kwargs):
+    al_confirmar(invalidar_catalogo)
@@ -1,45 +1,266 @@
-from django.conf import settings
+# accounts/stripe_service.py
+"""
+Cliente de Stripe del proceso.
+
+`cliente()` devuelve un único ClienteStripe por proceso. Al crearse instala en
+la librería su transporte HTTP: una sesión `requests` con keep-alive y timeouts
+explícitos de conexión y de lectura. Cada llamada lleva su `api_key`, sin tocar
+`stripe.api_key`. Los errores de red, 429 y 5xx se reintentan con espera
+exponencial con jitter, solo mientras la llamada no pase de su presupuesto
+(STRIPE_PRESUPUESTO segundos); las altas llevan idempotency_key, así el
+reintento no duplica. Cada intento fallido cuenta para un circuito que corta
+las llamadas tras varios fallos seguidos. Mientras está abierto se falla al
+instante con StripeNoDisponible, en vez de dejar workers esperando a Stripe.
+
+Para pruebas: `reiniciar(transporte=TransporteFalso([...]))` cambia el
+transporte por respuestas en memoria.
+"""
+import io
+import json
+import random
+import threading
+import time
+import uuid
+
+import requests
 import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from stripe.http_client import HTTPClient, RequestsClient
+
+from .services_pedidos import cargar_pedido
+
+# Fallos que se reintentan y que cuentan para el circuito (no los 4xx)
+_TRANSITORIOS = (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError)
+
+
+class StripeNoDisponible(Exception):
+    """Stripe no respondió a tiempo o el circuito está abierto."""
+    user_message = "El servicio de pagos no responde en este momento. Intenta de nuevo en unos minutos."
+
+
+# -------------------------------------------------------------------
+# Circuito
+# -------------------------------------------------------------------
+class Circuito:
+    """
+    Cerrado: deja pasar. Tras `fallos` errores transitorios seguidos se abre
+    por `espera` segundos; luego deja pasar una llamada de prueba (semiabierto)
+    que lo cierra si sale bien o lo vuelve a abrir si falla.
+    """
+
+    def __init__(self, fallos: int = 5, espera: float = 30.0, reloj=time.monotonic):
+        self.umbral = max(1, fallos)
+        self.espera = espera
+        self._reloj = reloj
+        self._fallos = 0
+        self._abierto_hasta = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._abierto_hasta is None:
+                return "cerrado"
+            return "abierto" if self._reloj() < self._abierto_hasta else "semiabierto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self._abierto_hasta is None:
+                return True
+            if self._reloj() < self._abierto_hasta or self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_hasta = None
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._prueba_en_curso or self._fallos >= self.umbral:
+                self._abierto_hasta = self._reloj() + self.espera
+            self._prueba_en_curso = False
+
+
+# -------------------------------------------------------------------
+# Transportes
+# -------------------------------------------------------------------
+def transporte_http(timeout_conexion: float, timeout_lectura: float, conexiones: int = 10) -> HTTPClient:
+    """RequestsClient sobre una sesión compartida (pool keep-alive) y sin reintentos propios."""
+    sesion = requests.Session()
+    sesion.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=conexiones, max_retries=0))
+    return RequestsClient(timeout=(timeout_conexion, timeout_lectura), session=sesion)
+
+
+class TransporteFalso(HTTPClient):
+    """
+    Transporte en memoria para pruebas. `respuestas`: lista consumida en
+    orden; cada elemento es (status, dict), una excepción a lanzar (p.ej.
+    `TransporteFalso.corte()`) o una función (method, url, headers, data)
+    que devuelve (status, dict). Sin respuestas pendientes responde 200 {}.
+    Las llamadas quedan en `llamadas`.
+    """
+    name = "falso"
+
+    def __init__(self, respuestas=None):
+        super().__init__()
+        self.respuestas = list(respuestas or [])
+        self.llamadas = []
 
-def init_stripe():
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-    return stripe
+    @staticmethod
+    def corte(mensaje: str = "Timeout simulado") -> stripe.error.APIConnectionError:
+        return stripe.error.APIConnectionError(mensaje, should_retry=True)
 
-def create_checkout_session(pedido, success_url, cancel_url):
-    stripe = init_stripe()
+    def _responder(self, method, url, headers, post_data):
+        self.llamadas.append({"method": method, "url": url, "headers": headers, "data": post_data})
+        r = self.respuestas.pop(0) if self.respuestas else (200, {})
+        if isinstance(r, Exception):
+            raise r
+        if callable(r):
+            r = r(method, url, headers, post_data)
+        status, cuerpo = r
+        return json.dumps(cuerpo), status
 
-    # Obtiene detalles (ajusta si tus related_name cambian)
-    detalles = getattr(pedido, "detalles", None) or getattr(pedido, "detallepedido_set", None)
-    if callable(detalles):
-        detalles = detalles.all()
+    def request(self, method, url, headers, post_data=None):
+        cuerpo, status = self._responder(method, url, headers, post_data)
+        return cuerpo, status, {}
 
-    line_items = []
-    for d in detalles:
-        nombre = getattr(d, "producto_nombre", None) or str(d)
-        cantidad = int(getattr(d, "cantidad", 1))
-        precio_unitario = float(getattr(d, "precio_unitario", 0))
-        unit_amount = int(round(precio_unitario * 100))  # centavos
+    def request_stream(self, method, url, headers, post_data=None):
+        # Mismas respuestas, con el cuerpo como flujo (igual que `response.raw`)
+        cuerpo, status = self._responder(method, url, headers, post_data)
+        return io.BytesIO(cuerpo.encode("utf-8")), status, {}
 
+
+# -------------------------------------------------------------------
+# Cliente
+# -------------------------------------------------------------------
+class ClienteStripe:
+    def __init__(self, api_key: str, transporte: HTTPClient, reintentos: int = 2,
+                 espera_base: float = 0.25, espera_max: float = 2.0, presupuesto: float = 8.0,
+                 circuito: Circuito | None = None, dormir=time.sleep, reloj=time.monotonic):
+        self.api_key = api_key
+        self.transporte = transporte
+        self.reintentos = max(0, reintentos)
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.presupuesto = presupuesto
+        self.circuito = circuito or Circuito()
+        self._dormir = dormir
+        self._reloj = reloj
+        # La librería usa un solo cliente HTTP global; los reintentos son los de aquí
+        stripe.default_http_client = transporte
+        stripe.max_network_retries = 0
+
+    def _espera(self, intento: int) -> float:
+        # Backoff exponencial con "full jitter"
+        return random.uniform(0, min(self.espera_max, self.espera_base * (2 ** intento)))
+
+    def _llamar(self, fn, *args, **params):
+        params["api_key"] = self.api_key
+        inicio = self._reloj()
+        for intento in range(self.reintentos + 1):
+            if not self.circuito.permitir():
+                raise StripeNoDisponible("Circuito abierto")
+            try:
+                resultado = fn(*args, **params)
+            except _TRANSITORIOS as e:
+                # Cada intento cuenta: unas pocas llamadas lentas bastan para abrir
+                self.circuito.fallo()
+                espera = self._espera(intento)
+                if intento >= self.reintentos or self._reloj() - inicio + espera >= self.presupuesto:
+                    raise StripeNoDisponible(str(e)) from e
+                self._dormir(espera)
+            except stripe.error.StripeError:
+                # 4xx: el servicio responde; no es fallo del circuito
+                self.circuito.exito()
+                raise
+            except Exception:
+                self.circuito.fallo()
+                raise
+            else:
+                self.circuito.exito()
+                return resultado
+
+    # ---- operaciones ----
+    def crear_checkout(self, **params):
+        params.setdefault("idempotency_key", f"checkout-{uuid.uuid4()}")
+        return self._llamar(stripe.checkout.Session.create, **params)
+
+    def obtener_checkout(self, session_id: str):
+        return self._llamar(stripe.checkout.Session.retrieve, session_id)
+
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def _nuevo_cliente(transporte: HTTPClient | None = None) -> ClienteStripe:
+    return ClienteStripe(
+        settings.STRIPE_SECRET_KEY,
+        transporte or transporte_http(settings.STRIPE_TIMEOUT_CONEXION, settings.STRIPE_TIMEOUT_LECTURA),
+        reintentos=settings.STRIPE_REINTENTOS,
+        presupuesto=settings.STRIPE_PRESUPUESTO,
+        circuito=Circuito(settings.STRIPE_CIRCUITO_FALLOS, settings.STRIPE_CIRCUITO_ESPERA),
+    )
+
+
+def cliente() -> ClienteStripe:
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = _nuevo_cliente()
+    return _cliente
+
+
+def reiniciar(transporte: HTTPClient | None = None) -> ClienteStripe:
+    """Reemplaza el cliente del proceso (p.ej. con un TransporteFalso en pruebas)."""
+    global _cliente
+    with _cliente_lock:
+        _cliente = _nuevo_cliente(transporte)
+    return _cliente
+
+
+# -------------------------------------------------------------------
+# Checkout de un pedido con sus líneas
+# -------------------------------------------------------------------
+def create_checkout_session(pedido, success_url: str, cancel_url: str, metadata: dict | None = None):
+    """Sesión de checkout con una línea por detalle del pedido (`pedido`: instancia o id)."""
+    pedido_id = getattr(pedido, "pk", pedido)
+    pedido = cargar_pedido(pedido_id)
+    if pedido is None:
+        raise ValueError(f"Pedido {pedido_id} no existe")
+    moneda = settings.CURRENCY.lower()
+    line_items = [
+        {
+            "price_data": {
+                "currency": moneda,
+                "product_data": {"name": f"{d['producto']} – {d['sabor']}"},
+                "unit_amount": int(round(d["precio_unitario"] * 100)),
+            },
+            "quantity": int(d["cantidad"]),
+        }
+        for d in pedido["lineas"]
+    ]
+    if pedido["costo_envio"]:
         line_items.append({
             "price_data": {
-                "currency": settings.CURRENCY.lower(),
-                "product_data": {"name": nombre},
-                "unit_amount": unit_amount,
+                "currency": moneda,
+                "product_data": {"name": "Envío"},
+                "unit_amount": int(round(pedido["costo_envio"] * 100)),
             },
-            "quantity": cantidad,
+            "quantity": 1,
         })
-
-    metadata = {
-        "pedido_id": str(pedido.id),
-        "monto_esperado": str(getattr(pedido, "total", 0)),
-        "user_id": str(getattr(pedido, "user_id", "")),
-    }
-
-    session = stripe.checkout.Session.create(
+    return cliente().crear_checkout(
         mode="payment",
         success_url=success_url,
         cancel_url=cancel_url,
         line_items=line_items,
-        metadata=metadata,
+        metadata={"pedido_id": str(pedido_id), "monto_esperado": str(pedido["total"]), **(metadata or {})},
     )
-    return session
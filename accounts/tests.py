@@ -1,3 +1,442 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from unittest import mock
+
+import stripe
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import services_kardex, services_pagos
+from .models_db import Cliente, DetallePedido, Insumo, Kardex, Pago, Pedido, Producto, Sabor, Usuario
+from .models_kardex import KardexCorte
+from .models_pagos import SaldoPedido
+from .models_recetas import Receta
+from .models_stripe import EventoStripe
+from .services_produccion import PedidoNoProducible, consumir_pedido
+from .services_stripe import firmar, procesar_pendientes
+from .services_pedidos import CarritoInvalido, guardar_lineas
+from .stripe_service import Circuito, ClienteStripe, StripeNoDisponible, TransporteFalso
+
+SESION = (200, {"id": "cs_test_1", "object": "checkout.session", "url": "https://checkout.stripe.test/cs_test_1"})
+ERROR_500 = (500, {"error": {"type": "api_error", "message": "Falla interna"}})
+ERROR_400 = (400, {"error": {"type": "invalid_request_error", "message": "Parámetro inválido"}})
+FIXTURES_STRIPE = Path(__file__).resolve().parent / "fixtures" / "stripe"
+SECRETO_WEBHOOK = "whsec_test"
+
+
+class Reloj:
+    """Reloj manual: `dormir` avanza el tiempo en vez de esperar."""
+
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def dormir(self, segundos):
+        self.t += segundos
+
+
+class TablasLegadas:
+    """
+    Crea las tablas legadas (managed=False) que usa la prueba; las migraciones
+    no las crean. `ajustes` son sentencias extra (p.ej. columnas generadas).
+    """
+    legadas = ()
+    ajustes = ()
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            for modelo in cls.legadas:
+                editor.create_model(modelo)
+            for sql in cls.ajustes:
+                editor.execute(sql)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            for modelo in reversed(cls.legadas):
+                editor.delete_model(modelo)
+
+
+class CorteKardexTests(TablasLegadas, TestCase):
+    legadas = (Insumo, Kardex)
+
+    def setUp(self):
+        self.insumo = Insumo.objects.create(nombre="Harina", unidad_medida="kg")
+        self.t0 = timezone.now()
+
+    def _mov(self, cantidad, **kwargs):
+        return Kardex.objects.create(
+            insumo=self.insumo, fecha=timezone.now(), tipo="ENTRADA", motivo="COMPRA",
+            cantidad=Decimal(cantidad), **kwargs,
+        )
+
+    def test_fila_confirmada_tarde_entra_en_el_saldo(self):
+        self._mov("10")
+        tarde = self._mov("5")
+        tarde_id = tarde.pk
+        tarde.delete()  # id tomado por una transacción que aún no confirma
+        ultimo = self._mov("3")
+
+        # Primera corrida: solo observa el tope, no cierra
+        self.assertEqual(services_kardex.cerrar_saldos(self.t0), 0)
+        # La transacción abierta confirma después de observar el tope
+        self._mov("5", id=tarde_id)
+
+        margen = timedelta(seconds=services_kardex.MARGEN)
+        self.assertEqual(services_kardex.cerrar_saldos(self.t0 + margen), 1)
+        corte = KardexCorte.objects.get(insumo_id=self.insumo.pk)
+        self.assertEqual(corte.ultimo_kardex_id, ultimo.pk)
+        self.assertEqual(corte.saldo, Decimal("18"))
+        self.assertEqual(services_kardex.saldo(self.insumo.pk), Decimal("18"))
+
+        self._mov("2")
+        self.assertEqual(services_kardex.saldo(self.insumo.pk), Decimal("20"))
+
+    def test_no_cierra_antes_del_margen(self):
+        self._mov("4")
+        services_kardex.cerrar_saldos(self.t0)
+        self.assertEqual(services_kardex.cerrar_saldos(self.t0 + timedelta(seconds=1)), 0)
+        self.assertFalse(KardexCorte.objects.exists())
+        self.assertEqual(services_kardex.saldo(self.insumo.pk), Decimal("4"))
+
+
+class SaldoPedidoTests(TablasLegadas, TestCase):
+    legadas = (Usuario, Cliente, Pedido, Pago)
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nombre="Ana", email="ana@test.bo", hash_password="x", activo=1)
+        cliente = Cliente.objects.create(usuario=self.usuario, nombre="Ana", direccion="Calle 1")
+        self.pedido = Pedido.objects.create(
+            cliente=cliente, metodo_envio="RETIRO", total=Decimal("100.00"), created_at=timezone.now(),
+        )
+
+    def _pago_orm(self, monto):
+        return Pago.objects.create(
+            pedido=self.pedido, metodo="EFECTIVO", monto=Decimal(monto),
+            registrado_por=self.usuario, created_at=timezone.now(),
+        )
+
+    def assertSaldoCuadra(self):
+        pagos = Pago.objects.filter(pedido=self.pedido).aggregate(s=Sum("monto"))["s"] or Decimal("0.00")
+        self.assertEqual(services_pagos.total_pagado(self.pedido.pk), pagos)
+        self.assertEqual(services_pagos.tiene_pagos(self.pedido.pk), pagos > 0)
+        balance = services_pagos.balances_for([self.pedido.pk])[self.pedido.pk]
+        self.assertEqual(balance["pagado"], pagos)
+        self.assertEqual(balance["saldo"], self.pedido.total - pagos)
+
+    def test_registrar_pago_suma_en_el_saldo(self):
+        self.assertSaldoCuadra()
+        services_pagos.registrar_pago(self.pedido.pk, "QR", "30.50", "ref-1", self.usuario.pk)
+        services_pagos.registrar_pago(self.pedido.pk, "EFECTIVO", "20.00", None, self.usuario.pk)
+        self.assertSaldoCuadra()
+        self.assertEqual(SaldoPedido.objects.get(pk=self.pedido.pk).pagos, 2)
+
+    def test_pago_por_orm_recalcula_al_guardar_y_borrar(self):
+        primero = self._pago_orm("40.00")
+        self._pago_orm("15.00")
+        self.assertSaldoCuadra()
+        primero.monto = Decimal("45.00")
+        primero.save()
+        self.assertSaldoCuadra()
+        primero.delete()
+        self.assertSaldoCuadra()
+        Pago.objects.get(pedido=self.pedido).delete()
+        self.assertSaldoCuadra()
+        self.assertFalse(SaldoPedido.objects.filter(pk=self.pedido.pk).exists())
+
+    def test_recalcular_repara_el_saldo(self):
+        services_pagos.registrar_pago(self.pedido.pk, "QR", "60.00", None, self.usuario.pk)
+        SaldoPedido.objects.filter(pk=self.pedido.pk).update(pagado=Decimal("999.00"), pagos=7)
+        services_pagos.recalcular([self.pedido.pk])
+        self.assertSaldoCuadra()
+        SaldoPedido.objects.all().delete()
+        services_pagos.recalcular()
+        self.assertSaldoCuadra()
+        self.assertEqual(SaldoPedido.objects.get(pk=self.pedido.pk).pagos, 1)
+
+
+class GuardarLineasTests(TablasLegadas, TestCase):
+    legadas = (Usuario, Cliente, Pedido, Producto, Sabor, DetallePedido)
+    # En la base real sub_total es una columna generada
+    ajustes = (
+        "ALTER TABLE detalle_pedido MODIFY sub_total DECIMAL(12,2) "
+        "AS (cantidad * precio_unitario) STORED",
+    )
+
+    def setUp(self):
+        usuario = Usuario.objects.create(nombre="Ana", email="ana@test.bo", hash_password="x", activo=1)
+        cliente = Cliente.objects.create(usuario=usuario, nombre="Ana", direccion="Calle 1")
+        self.producto = Producto.objects.create(nombre="Galleta", precio_unitario=Decimal("10.00"), activo=1)
+        self.sabores = [Sabor.objects.create(nombre=n, activo=1).pk for n in ("Chocolate", "Avena")]
+        self.pedido = Pedido.objects.create(
+            cliente=cliente, metodo_envio="DELIVERY", costo_envio=Decimal("5.00"),
+            total=Decimal("0.00"), created_at=timezone.now(),
+        )
+        foto = {
+            "productos": [{"id": self.producto.pk}],
+            "sabores": [{"id": s} for s in self.sabores],
+        }
+        parche = mock.patch("accounts.services_pedidos.catalogo_foto", return_value=foto)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _total_guardado(self):
+        lineas = DetallePedido.objects.filter(pedido=self.pedido).aggregate(s=Sum("sub_total"))["s"]
+        return (lineas or Decimal("0.00")) + self.pedido.costo_envio
+
+    def test_total_coincide_con_las_lineas_guardadas(self):
+        choco, avena = self.sabores
+        guardar_lineas(self.pedido.pk, [
+            (self.producto.pk, choco, Decimal("3"), Decimal("10.005")),
+            (self.producto.pk, avena, Decimal("2"), Decimal("7.50")),
+        ])
+        self.pedido.refresh_from_db()
+        linea = DetallePedido.objects.get(pedido=self.pedido, sabor_id=choco)
+        self.assertEqual(linea.precio_unitario, Decimal("10.01"))
+        self.assertEqual(self.pedido.total, Decimal("50.03"))
+        self.assertEqual(self.pedido.total, self._total_guardado())
+
+        # Mismo precio ya redondeado: no reescribe la línea; quita la otra
+        r = guardar_lineas(self.pedido.pk, [(self.producto.pk, choco, Decimal("3"), Decimal("10.01"))])
+        self.assertEqual(r, {"borradas": 1, "escritas": 0})
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.total, self._total_guardado())
+
+    def test_rechaza_cantidad_fraccionaria(self):
+        choco = self.sabores[0]
+        guardar_lineas(self.pedido.pk, [(self.producto.pk, choco, Decimal("2"), Decimal("10.00"))])
+        with self.assertRaises(CarritoInvalido):
+            guardar_lineas(self.pedido.pk, [(self.producto.pk, choco, Decimal("2.5"), Decimal("10.00"))])
+        self.pedido.refresh_from_db()
+        self.assertEqual(DetallePedido.objects.get(pedido=self.pedido).cantidad, 2)
+        self.assertEqual(self.pedido.total, Decimal("25.00"))
+
+
+class ConsumirPedidoTests(TablasLegadas, TestCase):
+    legadas = (Usuario, Cliente, Pedido, Producto, Sabor, DetallePedido, Insumo, Kardex, Receta)
+    ajustes = GuardarLineasTests.ajustes
+
+    def setUp(self):
+        usuario = Usuario.objects.create(nombre="Ana", email="ana@test.bo", hash_password="x", activo=1)
+        self.cliente = Cliente.objects.create(usuario=usuario, nombre="Ana", direccion="Calle 1")
+        self.producto = Producto.objects.create(nombre="Galleta", precio_unitario=Decimal("10.00"), activo=1)
+        self.choco, self.avena = (Sabor.objects.create(nombre=n, activo=1) for n in ("Chocolate", "Avena"))
+        self.harina = Insumo.objects.create(
+            nombre="Harina", unidad_medida="kg", cantidad_disponible=Decimal("100"),
+        )
+        Kardex.objects.create(
+            insumo=self.harina, fecha=timezone.now(), tipo="ENTRADA", motivo="COMPRA", cantidad=Decimal("100"),
+        )
+        Receta.objects.create(producto=self.producto, insumo=self.harina, cantidad=Decimal("0.5"))
+
+    def _pedido(self, estado):
+        pedido = Pedido.objects.create(
+            cliente=self.cliente, estado=estado, metodo_envio="RETIRO",
+            total=Decimal("50.00"), created_at=timezone.now(),
+        )
+        for sabor, cant in ((self.choco, 2), (self.avena, 4)):
+            DetallePedido.objects.create(
+                pedido=pedido, producto=self.producto, sabor=sabor, cantidad=cant, precio_unitario=Decimal("10.00"),
+            )
+        return pedido
+
+    def _salidas(self):
+        return Kardex.objects.filter(insumo=self.harina, tipo="SALIDA").count()
+
+    def _stock(self):
+        self.harina.refresh_from_db()
+        return self.harina.cantidad_disponible
+
+    def test_segundo_consumo_se_rechaza(self):
+        pedido = self._pedido("CONFIRMADO")
+        consumir_pedido(pedido.pk)
+        self.assertEqual(self._salidas(), 2)
+        self.assertEqual(self._stock(), Decimal("97"))
+        with self.assertRaises(PedidoNoProducible):
+            consumir_pedido(pedido.pk)
+        self.assertEqual(self._salidas(), 2)
+        self.assertEqual(self._stock(), Decimal("97"))
+
+    def test_solo_consume_lineas_pendientes(self):
+        pedido = self._pedido("EN_PRODUCCION")
+        consumir_pedido(pedido.pk, solo=[(self.producto.pk, self.choco.pk)])
+        self.assertEqual(self._stock(), Decimal("99"))
+        with self.assertRaises(PedidoNoProducible):
+            consumir_pedido(pedido.pk, solo=[(self.producto.pk, self.choco.pk)])
+        consumir_pedido(pedido.pk)
+        self.assertEqual(self._salidas(), 2)
+        self.assertEqual(self._stock(), Decimal("97"))
+
+    def test_estado_no_producible(self):
+        for estado in ("PENDIENTE", "ENTREGADO", "CANCELADO"):
+            with self.assertRaises(PedidoNoProducible):
+                consumir_pedido(self._pedido(estado).pk)
+        self.assertEqual(self._salidas(), 0)
+        self.assertEqual(self._stock(), Decimal("100"))
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=SECRETO_WEBHOOK)
+class WebhookStripeTests(TablasLegadas, TestCase):
+    legadas = (Usuario, Cliente, Pedido, Pago)
+
+    def setUp(self):
+        usuario = Usuario.objects.create(nombre="Ana", email="ana@test.bo", hash_password="x", activo=1)
+        cliente = Cliente.objects.create(usuario=usuario, nombre="Ana", direccion="Calle 1")
+        self.pedido = Pedido.objects.create(
+            cliente=cliente, metodo_envio="RETIRO", total=Decimal("30.00"), created_at=timezone.now(),
+        )
+
+    def _evento(self, **cambios):
+        evento = json.loads((FIXTURES_STRIPE / "checkout_session_completed.json").read_text(encoding="utf-8"))
+        evento["data"]["object"]["metadata"]["pedido_id"] = str(self.pedido.pk)
+        evento.update(cambios)
+        return json.dumps(evento).encode()
+
+    def _enviar(self, payload, firma=None):
+        return self.client.post(
+            reverse("stripe_webhook"), data=payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=firma or firmar(payload, SECRETO_WEBHOOK),
+        )
+
+    def test_reenvio_registra_un_solo_pago(self):
+        payload = self._evento()
+        self.assertEqual(self._enviar(payload).status_code, 200)
+        self.assertEqual(self._enviar(payload).status_code, 200)
+        self.assertEqual(procesar_pendientes(), {EventoStripe.PROCESADO: 1})
+        self.assertEqual(procesar_pendientes(), {})
+        self.assertEqual(EventoStripe.objects.count(), 1)
+        pago = Pago.objects.get()
+        self.assertEqual((pago.pedido_id, pago.monto, pago.referencia),
+                         (self.pedido.pk, Decimal("30.00"), "cs_test_pagado_0001"))
+        self.assertEqual(services_pagos.total_pagado(self.pedido.pk), Decimal("30.00"))
+
+    def test_otro_evento_de_la_misma_sesion_no_duplica(self):
+        self._enviar(self._evento())
+        self._enviar(self._evento(id="evt_test_async", type="checkout.session.async_payment_succeeded"))
+        self.assertEqual(
+            procesar_pendientes(), {EventoStripe.PROCESADO: 1, EventoStripe.IGNORADO: 1},
+        )
+        self.assertEqual(Pago.objects.count(), 1)
+
+    def test_firma_invalida_responde_400(self):
+        payload = self._evento()
+        self.assertEqual(self._enviar(payload, firma=firmar(payload, "whsec_otro")).status_code, 400)
+        self.assertEqual(self._enviar(payload, firma="t=1,v1=00").status_code, 400)
+        self.assertFalse(EventoStripe.objects.exists())
+
+
+class CircuitoTests(SimpleTestCase):
+    def setUp(self):
+        self.reloj = Reloj()
+        self.circuito = Circuito(fallos=2, espera=30, reloj=self.reloj)
+
+    def test_se_abre_tras_fallos_seguidos(self):
+        self.circuito.fallo()
+        self.assertEqual(self.circuito.estado, "cerrado")
+        self.circuito.fallo()
+        self.assertEqual(self.circuito.estado, "abierto")
+        self.assertFalse(self.circuito.permitir())
+
+    def test_exito_reinicia_la_cuenta(self):
+        self.circuito.fallo()
+        self.circuito.exito()
+        self.circuito.fallo()
+        self.assertEqual(self.circuito.estado, "cerrado")
+
+    def test_semiabierto_deja_una_sola_prueba(self):
+        self.circuito.fallo()
+        self.circuito.fallo()
+        self.reloj.t += 30
+        self.assertEqual(self.circuito.estado, "semiabierto")
+        self.assertTrue(self.circuito.permitir())
+        self.assertFalse(self.circuito.permitir())
+        self.circuito.exito()
+        self.assertEqual(self.circuito.estado, "cerrado")
+
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        self.circuito.fallo()
+        self.circuito.fallo()
+        self.reloj.t += 30
+        self.assertTrue(self.circuito.permitir())
+        self.circuito.fallo()
+        self.assertEqual(self.circuito.estado, "abierto")
+
+
+class ClienteStripeTests(SimpleTestCase):
+    def setUp(self):
+        self._http = stripe.default_http_client
+        self.reloj = Reloj()
+
+    def tearDown(self):
+        stripe.default_http_client = self._http
+
+    def _cliente(self, respuestas, fallos=5, presupuesto=8.0):
+        self.transporte = TransporteFalso(respuestas)
+        return ClienteStripe(
+            "sk_test_x", self.transporte, reintentos=2, presupuesto=presupuesto,
+            circuito=Circuito(fallos=fallos, espera=30, reloj=self.reloj),
+            dormir=self.reloj.dormir, reloj=self.reloj,
+        )
+
+    def _lento(self, segundos):
+        def responder(*args):
+            self.reloj.t += segundos
+            raise TransporteFalso.corte()
+        return responder
+
+    def test_reintento_usa_la_misma_idempotency_key(self):
+        cliente = self._cliente([TransporteFalso.corte(), SESION])
+        sesion = cliente.crear_checkout(mode="payment")
+        self.assertEqual(sesion.id, "cs_test_1")
+        claves = {c["headers"].get("Idempotency-Key") for c in self.transporte.llamadas}
+        self.assertEqual(len(self.transporte.llamadas), 2)
+        self.assertEqual(len(claves), 1)
+        self.assertIsNone(stripe.api_key)
+
+    def test_no_reintenta_fuera_del_presupuesto(self):
+        cliente = self._cliente([self._lento(8), SESION])
+        with self.assertRaises(StripeNoDisponible):
+            cliente.crear_checkout(mode="payment")
+        self.assertEqual(len(self.transporte.llamadas), 1)
+
+    def test_cada_intento_cuenta_para_el_circuito(self):
+        cliente = self._cliente([ERROR_500, ERROR_500, SESION], fallos=2)
+        with self.assertRaises(StripeNoDisponible):
+            cliente.crear_checkout(mode="payment")
+        self.assertEqual(len(self.transporte.llamadas), 2)
+        self.assertEqual(cliente.circuito.estado, "abierto")
+        with self.assertRaises(StripeNoDisponible):
+            cliente.obtener_checkout("cs_test_1")
+        self.assertEqual(len(self.transporte.llamadas), 2)
+
+    def test_semiabierto_cierra_con_una_llamada_buena(self):
+        cliente = self._cliente([ERROR_500, ERROR_500, SESION], fallos=2)
+        with self.assertRaises(StripeNoDisponible):
+            cliente.crear_checkout(mode="payment")
+        self.reloj.t += 30
+        self.assertEqual(cliente.obtener_checkout("cs_test_1").id, "cs_test_1")
+        self.assertEqual(cliente.circuito.estado, "cerrado")
+
+    def test_error_4xx_no_abre_el_circuito(self):
+        cliente = self._cliente([ERROR_400], fallos=1)
+        with self.assertRaises(stripe.error.InvalidRequestError):
+            cliente.crear_checkout(mode="payment")
+        self.assertEqual(len(self.transporte.llamadas), 1)
+        self.assertEqual(cliente.circuito.estado, "cerrado")
+
+    def test_transporte_falso_con_flujo(self):
+        transporte = TransporteFalso([SESION])
+        cuerpo, status, _ = transporte.request_stream("get", "https://api.stripe.com/v1/x", {})
+        self.assertEqual(status, 200)
+        self.assertIn(b"cs_test_1", cuerpo.read())
@@ -75,10 +75,13 @@ urlpatterns = [
 
     # Catálogo y pedido
     path("catalogo/", views.catalogo_view, name="catalogo"),
+    path("catalogo/api/", views.catalogo_api, name="catalogo_api"),
     path("pedido/<int:sabor_id>/", views.crear_pedido, name="crear_pedido"),
+    path("pedido/carrito/", views.crear_pedido_carrito, name="crear_pedido_carrito"),
     path("cancelar-pedido/<int:pedido_id>/", views.cancelar_pedido, name="cancelar_pedido"),
     path("confirmar-pedido/<int:pedido_id>/", views.confirmar_pedido, name="confirmar_pedido"),
     path("bitacora/", views.bitacora_view, name="bitacora"),
+    path("bitacora/archivo/", views.bitacora_archivo, name="bitacora_archivo"),
 
     # Proveedores
     path("proveedores/", views.proveedores_list, name="proveedores_list"),
@@ -96,10 +99,12 @@ urlpatterns = [
     path("inventario/movimiento/", views_inventario.movimiento_crear, name="movimiento_crear"),
     path("inventario/kardex/", views_inventario.kardex_list, name="kardex_list"),
     path("inventario/kardex/<int:pk>/", views_inventario.kardex_por_insumo, name="kardex_por_insumo"),
+    path("inventario/valuacion/", views_inventario.valuacion_inventario, name="valuacion_inventario"),
 
     # Compras
     path("compras/", views_compras.compras_list, name="compras_list"),
     path("compras/nueva/", views_compras.compra_crear, name="compra_crear"),
+    path("compras/recepcionar/", views_compras.compras_recepcionar, name="compras_recepcionar"),
     path("compras/<int:compra_id>/", views_compras.compra_detalle, name="compra_detalle"),
     path("compras/<int:compra_id>/recepcionar/", views_compras.compra_recepcionar, name="compra_recepcionar"),
 
@@ -114,6 +119,7 @@ urlpatterns = [
     path("pago/<int:pedido_id>/", views_pagos.crear_checkout_session, name="crear_checkout"),
     path("pagos/success/<int:pedido_id>/", views_pagos.pago_exitoso, name="pago_exitoso"),
     path("pagos/cancel/<int:pedido_id>/", views_pagos.pago_cancelado, name="pago_cancelado"),
+    path("pagos/stripe/webhook/", views_pagos.stripe_webhook, name="stripe_webhook"),
 
     # Facturas (CU17)
     path("facturas/", views_facturas.factura_list, name="factura_list"),
@@ -167,12 +173,18 @@ urlpatterns += [
 ]
 
 # CU32 - Producción de pedidos
-from .views_produccion import pedidos_para_produccion, gestionar_produccion, producir_item
+from .views_produccion import (
+    pedidos_para_produccion, gestionar_produccion, producir_item, producir_pedido,
+    planificacion_produccion, planificacion_produccion_api,
+)
 
 urlpatterns += [
     path('produccion/pedidos/', pedidos_para_produccion, name='pedidos_para_produccion'),
+    path('produccion/planificacion/', planificacion_produccion, name='planificacion_produccion'),
+    path('produccion/planificacion/api/', planificacion_produccion_api, name='planificacion_produccion_api'),
     path('produccion/pedido/<int:pedido_id>/', gestionar_produccion, name='gestionar_produccion'),
     path('produccion/pedido/<int:pedido_id>/item/<int:producto_id>/<int:sabor_id>/producir/', producir_item, name='producir_item'),
+    path('produccion/pedido/<int:pedido_id>/producir/', producir_pedido, name='producir_pedido'),
 ]
 
 
@@ -1,24 +1,32 @@
 # accounts/utils.py
+from django.conf import settings
 from django.utils import timezone
 
 def ip_from_request(request):
     return request.META.get("HTTP_X_FORWARDED_FOR", request.META.get("REMOTE_ADDR", ""))
 
-def log_event(request, entidad: str, entidad_id: int | None, accion: str):
+def log_event(request, entidad: str, entidad_id: int | None, accion: str, detalle: str | None = None):
+    """
+    Registra un evento en bitácora. Por defecto se encola y lo escribe en lote
+    el hilo de `services_bitacora` (AUDIT_ASYNC=False para escribir en línea).
+    `detalle` se acepta por compatibilidad con las vistas; la tabla no lo guarda.
+    """
     # Import local para evitar import circular con signals/apps/models_db
-    from .models_db import Bitacora, Usuario
+    from .services_bitacora import cola_bitacora
 
     try:
-        email = (getattr(request.user, "email", "") or "").strip().lower()
-        u = Usuario.objects.filter(email=email).first()
-        Bitacora.objects.create(
-            usuario=u,                 # si no permite NULL, usa un usuario “sistema”
-            entidad=entidad,
-            entidad_id=entidad_id or 0,
-            accion=accion,
-            ip=ip_from_request(request),
-            fecha=timezone.now(),
-        )
+        evento = {
+            "email": (getattr(request.user, "email", "") or "").strip().lower(),
+            "entidad": entidad,
+            "entidad_id": entidad_id or 0,
+            "accion": accion,
+            "ip": ip_from_request(request),
+            "fecha": timezone.now(),
+        }
+        if getattr(settings, "AUDIT_ASYNC", True):
+            cola_bitacora.put(evento)
+        else:
+            cola_bitacora.write([evento])
     except Exception:
         # No bloquear el flujo si la bitácora falla
         pass
@@ -1,116 +1,171 @@
+import json
 from datetime import datetime
 from decimal import Decimal
 
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import transaction, connection, IntegrityError
+from django.db import transaction, IntegrityError
 from django.db.models import Q
-from django.core.paginator import Paginator
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
 
 from .models_db import (
-    Usuario, Cliente, Sabor, Pedido, Bitacora,
-    Producto, Proveedor, Insumo, Rol, Permiso,
+    Usuario, Cliente, Pedido, Bitacora,
+    Proveedor, Insumo, Rol, Permiso,
     UsuarioRol, RolPermiso, Pago
 )
 from .utils import log_event
+from .paginacion import PaginaKeyset
 from .permissions import requiere_permiso
+from .services_bitacora_archivo import buscar as buscar_bitacora
+from .services_busqueda import filtro_orm
+from .services_catalogo import a_json as catalogo_json, foto as catalogo_foto, ttl as catalogo_ttl
+from .services_pedidos import COSTO_DELIVERY, CarritoInvalido, crear_pedido as crear_pedido_cliente, leer_carrito
 from .forms_proveedor import ProveedorForm
 from .forms import InsumoForm
 
 # ---------- Catálogo ----------
+# Se sirve desde services_catalogo (caché): un visitante anónimo no toca la
+# base, y un GET condicional con el mismo ETag recibe 304. Solo para anónimos
+# sin mensajes pendientes: con sesión la página lleva el token CSRF del logout
+# y los mensajes flash (p.ej. errores de crear_pedido), que el ETag no cubre.
+def _catalogo_condicional(request) -> bool:
+    return not request.user.is_authenticated and not len(messages.get_messages(request))
+
+
+def _catalogo_etag(request):
+    return catalogo_foto()["version"] if _catalogo_condicional(request) else None
+
+
+def _catalogo_pagina_modificado(request):
+    return catalogo_foto()["modificado"] if _catalogo_condicional(request) else None
+
+
+def _catalogo_api_etag(request):
+    return catalogo_foto()["version"]
+
+
+def _catalogo_modificado(request):
+    return catalogo_foto()["modificado"]
+
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_catalogo_etag, last_modified_func=_catalogo_pagina_modificado)
 def catalogo_view(request):
-    sabores = Sabor.objects.filter(activo=1).order_by("nombre")
-    precio = Decimal(str(getattr(settings, "COOKIE_UNIT_PRICE_BS", 10)))
+    datos = catalogo_foto()
     return render(
         request,
         "accounts/catalogo.html",
-        {"sabores": sabores, "precio": precio},
+        {"sabores": datos["sabores"], "precio": Decimal(datos["precio"]), "cache_ttl": catalogo_ttl()},
     )
 
 
-# ---------- Crear pedido ----------
-@login_required
-def crear_pedido(request, sabor_id):
-    sabor = get_object_or_404(Sabor, id=sabor_id, activo=1)
-    from .views_auth import get_cliente_actual
-    cliente = get_cliente_actual(request)
+@require_GET
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_catalogo_api_etag, last_modified_func=_catalogo_modificado)
+def catalogo_api(request):
+    """Productos activos (con sus sabores) y sabores activos, en JSON."""
+    return JsonResponse(catalogo_json(catalogo_foto()))
 
-    if request.method == "GET":
-        cantidad = int(request.GET.get("cantidad", "1") or 1)
-        return render(
-            request,
-            "accounts/crear_pedido.html",
-            {"sabor": sabor, "cantidad": cantidad, "precio_unit": Decimal("10.00")},
-        )
 
-    cantidad = int(request.POST.get("cantidad", "1") or 1)
-    metodo = (request.POST.get("metodo_envio") or "").strip().upper()
-    if metodo not in ("RETIRO", "DELIVERY"):
-        metodo = "RETIRO"
+# ---------- Crear pedido ----------
+def _form_pedido(request, items):
+    """Formulario de pedido (uno o varios sabores) con datos del catálogo en caché."""
+    datos = catalogo_foto()
+    por_id = {s["id"]: s for s in datos["sabores"]}
+    lineas = [{"sabor": por_id[s], "cantidad": c} for s, c in items if s in por_id]
+    if not lineas:
+        raise Http404("Sabor no disponible")
+    return render(
+        request,
+        "accounts/crear_pedido.html",
+        {"items": lineas, "precio_unit": Decimal(datos["precio"]), "costo_delivery": COSTO_DELIVERY},
+    )
 
-    direccion = (request.POST.get("direccion_entrega") or "").strip()
-    if metodo == "RETIRO":
-        direccion = None
 
-    fecha_str = request.POST.get("fecha_entrega_programada", "")
-    fecha_entrega = None
-    if fecha_str:
-        try:
-            fecha_entrega = timezone.make_aware(datetime.strptime(fecha_str, "%Y-%m-%dT%H:%M"))
-        except Exception:
-            pass
-
-    costo_envio = Decimal("5.00") if metodo == "DELIVERY" else Decimal("0.00")
-    pedido = Pedido.objects.create(
-        cliente=cliente,
-        estado="PENDIENTE",
-        metodo_envio=metodo,
-        costo_envio=costo_envio,
-        direccion_entrega=direccion,
-        total=Decimal("0.00"),
-        created_at=timezone.now(),
-        fecha_entrega_programada=fecha_entrega,
-    )
+def _fecha_entrega(valor: str):
+    if not valor:
+        return None
+    try:
+        return timezone.make_aware(datetime.strptime(valor, "%Y-%m-%dT%H:%M"))
+    except Exception:
+        return None
 
-    producto = Producto.objects.filter(nombre__iexact="Galleta").first() or Producto.objects.first()
-    if not producto:
-        messages.error(request, "No hay productos definidos.")
-        return redirect("catalogo")
 
-    with connection.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO detalle_pedido (pedido_id, producto_id, sabor_id, cantidad, precio_unitario)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            [pedido.id, producto.id, sabor.id, cantidad, Decimal("10.00")],
+def _registrar_pedido(request, items):
+    """POST común de crear_pedido / crear_pedido_carrito (formulario)."""
+    metodo = (request.POST.get("metodo_envio") or "").strip().upper()
+    try:
+        crear_pedido_cliente(
+            request.cliente.pk, items,
+            metodo_envio=metodo,
+            direccion=(request.POST.get("direccion_entrega") or "").strip(),
+            fecha_entrega=_fecha_entrega(request.POST.get("fecha_entrega_programada", "")),
+            observaciones=request.POST.get("observaciones"),
         )
+    except CarritoInvalido as e:
+        messages.error(request, str(e))
+        return redirect("catalogo")
+    messages.success(request, "Pedido creado correctamente.")
+    return redirect("perfil")
 
-    with connection.cursor() as cur:
-        cur.execute(
-            "SELECT COALESCE(SUM(sub_total), 0) FROM detalle_pedido WHERE pedido_id=%s",
-            [pedido.id],
-        )
-        subtotal = Decimal(cur.fetchone()[0] or 0)
 
-    pedido.total = subtotal + costo_envio
-    pedido.save(update_fields=["total"])
+@login_required
+def crear_pedido(request, sabor_id):
+    try:
+        if request.method == "GET":
+            return _form_pedido(request, [(sabor_id, int(request.GET.get("cantidad", "1") or 1))])
+        items = leer_carrito(request.POST) or [(sabor_id, int(request.POST.get("cantidad", "1") or 1))]
+    except (CarritoInvalido, ValueError):
+        messages.error(request, "Cantidad inválida.")
+        return redirect("catalogo")
+    return _registrar_pedido(request, items)
 
-    messages.success(request, "Pedido creado correctamente.")
-    return redirect("perfil")
+
+@login_required
+def crear_pedido_carrito(request):
+    """
+    Pedido con varios sabores. GET: formulario con los sabores marcados en el
+    catálogo. POST: formulario, o JSON {"items": [...], "metodo_envio", ...}
+    que responde {"pedido_id", "total"}.
+    """
+    if request.method == "POST" and request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+            pedido = crear_pedido_cliente(
+                request.cliente.pk, leer_carrito(data),
+                metodo_envio=(data.get("metodo_envio") or "").upper(),
+                direccion=data.get("direccion_entrega"),
+                fecha_entrega=_fecha_entrega(data.get("fecha_entrega_programada") or ""),
+                observaciones=data.get("observaciones"),
+            )
+        except (CarritoInvalido, ValueError, AttributeError) as e:
+            return JsonResponse({"detail": str(e) or "Carrito inválido."}, status=400)
+        return JsonResponse({"pedido_id": pedido.id, "total": str(pedido.total)}, status=201)
+
+    datos = request.GET if request.method == "GET" else request.POST
+    try:
+        # Desde el catálogo solo cuentan los sabores marcados
+        items = leer_carrito(datos) if request.method == "POST" or "sel" in datos else []
+    except CarritoInvalido as e:
+        messages.error(request, str(e))
+        return redirect("catalogo")
+    if not items:
+        messages.info(request, "Marca al menos un sabor en el catálogo.")
+        return redirect("catalogo")
+    if request.method == "GET":
+        return _form_pedido(request, items)
+    return _registrar_pedido(request, items)
 
 
 # ---------- Confirmar / Cancelar ----------
 @login_required
 @require_POST
 def confirmar_pedido(request, pedido_id):
-    from .views_auth import get_cliente_actual
-    cliente = get_cliente_actual(request)
-    pedido = get_object_or_404(Pedido, id=pedido_id, cliente=cliente, estado="PENDIENTE")
+    pedido = get_object_or_404(Pedido, id=pedido_id, cliente_id=request.cliente.pk, estado="PENDIENTE")
     pedido.estado = "CONFIRMADO"
     pedido.save(update_fields=["estado"])
     messages.success(request, "Tu pedido ha sido confirmado.")
@@ -120,9 +175,7 @@ def confirmar_pedido(request, pedido_id):
 @login_required
 @require_POST
 def cancelar_pedido(request, pedido_id):
-    from .views_auth import get_cliente_actual
-    cliente = get_cliente_actual(request)
-    pedido = get_object_or_404(Pedido, id=pedido_id, cliente=cliente, estado="PENDIENTE")
+    pedido = get_object_or_404(Pedido, id=pedido_id, cliente_id=request.cliente.pk, estado="PENDIENTE")
     pedido.estado = "CANCELADO"
     pedido.save(update_fields=["estado"])
     messages.info(request, "Tu pedido ha sido cancelado.")
@@ -133,8 +186,31 @@ def cancelar_pedido(request, pedido_id):
 @login_required
 @requiere_permiso("permisos.ver")
 def bitacora_view(request):
-    logs = Bitacora.objects.all().order_by("-fecha")
-    return render(request, "accounts/bitacora.html", {"logs": logs})
+    page = PaginaKeyset(request, Bitacora.objects.select_related("usuario"), ("-fecha", "-id"), por_pagina=50)
+    return render(request, "accounts/bitacora.html", {"page": page, "logs": page.object_list})
+
+
+@login_required
+@requiere_permiso("permisos.ver")
+def bitacora_archivo(request):
+    """Búsqueda en la bitácora archivada (tablas mensuales) + la tabla activa."""
+    email = (request.GET.get("usuario") or "").strip().lower()
+    entidad = (request.GET.get("entidad") or "").strip()
+    d1 = (request.GET.get("d1") or "").strip()
+    d2 = (request.GET.get("d2") or "").strip()
+
+    filtrado = bool(email or entidad or d1 or d2)
+    usuario_id = None
+    if email:
+        usuario_id = Usuario.objects.filter(email__iexact=email).values_list("id", flat=True).first()
+    logs = []
+    if filtrado and (usuario_id or not email):
+        logs = buscar_bitacora(usuario_id=usuario_id, entidad=entidad or None, d1=d1, d2=d2, limite=500)
+
+    return render(request, "accounts/bitacora_archivo.html", {
+        "logs": logs, "filtrado": filtrado,
+        "usuario": email, "entidad": entidad, "d1": d1, "d2": d2,
+    })
 
 
 # ---------- CRUD Proveedores ----------
@@ -142,10 +218,10 @@ def bitacora_view(request):
 @requiere_permiso("PROVEEDOR_READ")
 def proveedores_list(request):
     q = request.GET.get("q", "").strip()
-    qs = Proveedor.objects.all().order_by("nombre")
+    qs = Proveedor.objects.all()
     if q:
-        qs = qs.filter(nombre__icontains=q)
-    page = Paginator(qs, 10).get_page(request.GET.get("page"))
+        qs = qs.filter(filtro_orm("proveedor", "id", q))
+    page = PaginaKeyset(request, qs, ("nombre", "id"), por_pagina=10)
     return render(request, "accounts/proveedores_list.html", {"page": page, "q": q})
 
 
@@ -201,7 +277,7 @@ def insumos_list(request):
     qs = Insumo.objects.all()
     if q:
         qs = qs.filter(Q(nombre__icontains=q) | Q(unidad_medida__icontains=q))
-    page = Paginator(qs, 10).get_page(request.GET.get("page"))
+    page = PaginaKeyset(request, qs, ("nombre", "id"), por_pagina=10)
     return render(request, "accounts/insumos_list.html", {"page": page, "q": q})
 
 
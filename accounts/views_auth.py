@@ -28,11 +28,34 @@ def ip_from_request(request):
     return request.META.get("HTTP_X_FORWARDED_FOR", request.META.get("REMOTE_ADDR", ""))
 
 
+SESION_CLIENTE = "cliente_actual"
+
+
+def _recordar_cliente(request, cliente):
+    request.session[SESION_CLIENTE] = {
+        "user": request.user.pk,
+        "cliente_id": cliente.pk,
+        "usuario_id": cliente.usuario_id,
+    }
+
+
 def get_cliente_actual(request):
-    """Obtiene o crea el cliente vinculado al usuario autenticado."""
+    """
+    Cliente vinculado al usuario autenticado. La primera vez se obtiene o
+    crea y sus ids quedan en la sesión; después se devuelve una instancia
+    diferida (solo id / usuario_id) sin consultar la base: los demás campos
+    se cargan recién si se leen. En vistas usar `request.cliente`
+    (core.middleware.ClienteActualMiddleware).
+    """
     if not request.user.is_authenticated:
         raise Http404("No autenticado")
 
+    guardado = request.session.get(SESION_CLIENTE)
+    if guardado and guardado.get("user") == request.user.pk:
+        return Cliente.from_db(
+            "default", ["id", "usuario_id"], [guardado["cliente_id"], guardado["usuario_id"]]
+        )
+
     email = (request.user.email or "").strip().lower()
     if not email:
         raise Http404("El usuario no tiene email asignado")
@@ -60,6 +83,7 @@ def get_cliente_actual(request):
             },
         )
 
+    _recordar_cliente(request, cliente)
     return cliente
 
 
@@ -95,7 +119,7 @@ def register_view(request):
                     },
                 )
 
-                Cliente.objects.get_or_create(
+                cliente, _ = Cliente.objects.get_or_create(
                     usuario=usuario_base,
                     defaults={
                         "nombre": usuario_base.nombre,
@@ -106,6 +130,7 @@ def register_view(request):
         except IntegrityError:
             messages.error(request, "Este correo ya está registrado. Intenta iniciar sesión.")
             return redirect("login")
+        _recordar_cliente(request, cliente)
 
         try:
             Bitacora.objects.create(
@@ -134,8 +159,8 @@ def register_view(request):
 # ---------- Perfil ----------
 @login_required
 def perfil_view(request):
-    cliente = get_cliente_actual(request)
-    pedidos = Pedido.objects.filter(cliente=cliente).order_by("-created_at")
+    cliente = request.cliente
+    pedidos = Pedido.objects.filter(cliente_id=cliente.pk).order_by("-created_at")
     gran_total = pedidos.filter(estado="PENDIENTE").aggregate(
         total=Sum("total")
     )["total"] or Decimal("0.00")
@@ -2,22 +2,22 @@ from decimal import Decimal
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import F, ExpressionWrapper, DecimalField, Sum
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .paginacion import PaginaKeyset
 from .permissions import requiere_permiso
 from .models_db import Compra, CompraDetalle
 from .forms_compras import CompraForm, CompraDetalleFormSet
-from .services_compras import recepcionar_compra
+from .services_compras import recepcionar_compra, recepcionar_compras
 
 
 @login_required
 @requiere_permiso("COMPRA_READ")
 def compras_list(request):
-    qs = Compra.objects.select_related("proveedor").order_by("-fecha", "-id")
-    page = Paginator(qs, 20).get_page(request.GET.get("page"))
+    qs = Compra.objects.select_related("proveedor")
+    page = PaginaKeyset(request, qs, ("-fecha", "-id"), por_pagina=20)
     return render(request, "accounts/compras_list.html", {"page": page})
 
 
@@ -95,3 +95,22 @@ def compra_recepcionar(request, compra_id):
     else:
         messages.info(request, "La compra ya estaba recepcionada o no tiene detalles.")
     return redirect("compra_detalle", compra_id=compra_id)
+
+
+@login_required
+@requiere_permiso("COMPRA_WRITE")
+def compras_recepcionar(request):
+    """Recepciona varias compras seleccionadas en una sola transacción (POST)."""
+    if request.method != "POST":
+        return redirect("compras_list")
+    ids = [c for c in request.POST.getlist("compra") if c.isdigit()]
+    procesadas = recepcionar_compras(ids)
+    if procesadas:
+        lineas = sum(procesadas.values())
+        messages.success(
+            request,
+            f"Compras recepcionadas: {len(procesadas)}. Entradas al Kardex: {lineas}.",
+        )
+    else:
+        messages.info(request, "Ninguna compra pendiente con detalles fue seleccionada.")
+    return redirect("compras_list")
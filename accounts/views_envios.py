@@ -2,9 +2,12 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import connection, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
 from .models_db import Pedido
+from .services_pedidos import cargar_pedido
+from .services_resumen_ventas import marcar_pedido
 
 
 # --- helpers -------------------------------------------------
@@ -22,32 +25,24 @@ def _envio_by_pedido(pid: int):
         return dict(zip(cols, row))
 
 
-def _total_pagado(pid: int):
-    with connection.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(monto),0) FROM pago WHERE pedido_id=%s", [pid])
-        (suma,) = cur.fetchone()
-        return float(suma or 0)
-
-
 def _pedidos_listos():
     """
     Precondición CU24:
     - pedido.estado IN ('CONFIRMADO')
-    - suma(pago.monto) >= pedido.total
+    - pagado (pedido_saldo) >= pedido.total
     - sin registro en envio
     """
     with connection.cursor() as cur:
         cur.execute("""
           SELECT p.id, c.nombre AS cliente, p.metodo_envio, p.direccion_entrega,
-                 p.total, COALESCE(SUM(pg.monto),0) AS pagado
+                 p.total, s.pagado
           FROM pedido p
           JOIN cliente c ON c.id = p.cliente_id
-          LEFT JOIN pago pg ON pg.pedido_id = p.id
+          JOIN pedido_saldo s ON s.pedido_id = p.id
           LEFT JOIN envio e ON e.pedido_id = p.id
           WHERE e.id IS NULL
             AND p.estado IN ('CONFIRMADO')
-          GROUP BY p.id, c.nombre, p.metodo_envio, p.direccion_entrega, p.total
-          HAVING pagado >= p.total
+            AND s.pagado >= p.total
           ORDER BY p.id DESC
         """)
         cols = [c[0] for c in cur.description]
@@ -71,14 +66,17 @@ def envio_crear_editar(request, pedido_id: int):
     Paso 2 del flujo: seleccionar pedido y asignar repartidor.
     También permite editar si ya existe el envío.
     """
-    pedido = get_object_or_404(Pedido, pk=pedido_id)
-    envio = _envio_by_pedido(pedido.id)
-    pagado = _total_pagado(pedido.id)
-
-    metodo_envio = (pedido.metodo_envio or "").strip().upper()
+    # Cabecera + envío + pagado en una consulta (sin líneas)
+    pedido = cargar_pedido(pedido_id, con_lineas=False)
+    if pedido is None:
+        raise Http404("Pedido no encontrado")
+    envio = pedido["envio"]
+    pagado = pedido["pagado"]
+
+    metodo_envio = (pedido["metodo_envio"] or "").strip().upper()
     is_delivery = (metodo_envio == "DELIVERY")
 
-    if pagado < float(pedido.total or 0):
+    if pedido["saldo"] > 0:
         messages.error(request, "El pedido no está listo: aún tiene saldo pendiente.")
         return redirect("envio_list")
 
@@ -89,7 +87,7 @@ def envio_crear_editar(request, pedido_id: int):
         # Validación solo para delivery
         if is_delivery and not nombre:
             messages.error(request, "Debes asignar un repartidor para DELIVERY.")
-            return redirect("envio_crear_editar", pedido_id=pedido.id)
+            return redirect("envio_crear_editar", pedido_id=pedido_id)
 
         with transaction.atomic():
             with connection.cursor() as cur:
@@ -98,15 +96,15 @@ def envio_crear_editar(request, pedido_id: int):
                       UPDATE envio
                          SET nombre_repartidor=%s, telefono_repartidor=%s
                        WHERE pedido_id=%s
-                    """, [nombre, fono, pedido.id])
+                    """, [nombre, fono, pedido_id])
                     messages.success(request, "Datos de envío actualizados.")
                 else:
                     cur.execute("""
                       INSERT INTO envio (pedido_id, estado, nombre_repartidor, telefono_repartidor)
                       VALUES (%s, 'PENDIENTE', %s, %s)
-                    """, [pedido.id, nombre, fono])
+                    """, [pedido_id, nombre, fono])
                     messages.success(request, "Envío registrado correctamente.")
-        return redirect("envio_crear_editar", pedido_id=pedido.id)
+        return redirect("envio_crear_editar", pedido_id=pedido_id)
 
     return render(request, "accounts/envio_form.html", {
         "pedido": pedido,
@@ -132,6 +130,7 @@ def envio_marcar_entregado(request, pedido_id: int):
         with connection.cursor() as cur:
             cur.execute("UPDATE envio SET estado='ENTREGADO' WHERE pedido_id=%s", [pedido.id])
             cur.execute("UPDATE pedido SET estado='ENTREGADO' WHERE id=%s", [pedido.id])
+        marcar_pedido(pedido.id)
 
     messages.success(request, "El pedido fue marcado como ENTREGADO.")
     return redirect("envio_crear_editar", pedido_id=pedido.id)
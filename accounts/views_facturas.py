@@ -1,17 +1,16 @@
 # accounts/views_facturas.py
-from decimal import Decimal
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import connection, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
 from .models_db import Pedido, Pago, Factura
-
-def _total_pagado(pedido_id: int) -> Decimal:
-    with connection.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(monto),0) FROM pago WHERE pedido_id=%s", [pedido_id])
-        (suma,) = cur.fetchone()
-    return Decimal(suma or 0)
+from .services_busqueda import filtro_sql
+from .services_pagos import total_pagado as _total_pagado
+from .services_pedidos import cargar_pedido
+from .services_reportes import rango_fechas
+from .services_resumen_ventas import marcar_pedido
 
 @login_required
 def factura_emitir(request, pedido_id: int):
@@ -61,6 +60,7 @@ def factura_emitir(request, pedido_id: int):
                     """,
                     [pedido.id, nro, nit, razon, str(pedido.total or 0)],
                 )
+            marcar_pedido(pedido.id)
 
         messages.success(request, f"Factura {nro} generada correctamente.")
         return redirect("factura_detalle", pedido_id=pedido.id)
@@ -74,40 +74,17 @@ def factura_emitir(request, pedido_id: int):
 
 @login_required
 def factura_detalle(request, pedido_id: int):
-    pedido = get_object_or_404(Pedido, pk=pedido_id)
-    factura = get_object_or_404(Factura, pedido_id=pedido.id)
-    items = _items_pedido(pedido.id)      # <--- NUEVO
+    pedido = cargar_pedido(pedido_id)
+    if pedido is None or pedido["factura"] is None:
+        raise Http404("Factura no encontrada")
     return render(request, "accounts/factura_detalle.html", {
         "pedido": pedido,
-        "factura": factura,
-        "items": items,                   # <--- NUEVO
+        "factura": pedido["factura"],
+        "items": pedido["lineas"],
     })
 
 
 
-# ---- agrega al inicio del archivo (import ya existente) ----
-from django.db import connection
-
-# ---- agrega debajo de _total_pagado() ----
-def _items_pedido(pedido_id: int):
-    """Devuelve el detalle del pedido para imprimir en factura."""
-    with connection.cursor() as cur:
-        cur.execute("""
-            SELECT pr.nombre AS producto,
-                   s.nombre  AS sabor,
-                   dp.cantidad,
-                   dp.precio_unitario,
-                   dp.sub_total
-            FROM detalle_pedido dp
-            JOIN producto pr ON pr.id = dp.producto_id
-            JOIN sabor    s  ON s.id = dp.sabor_id
-            WHERE dp.pedido_id = %s
-            ORDER BY pr.nombre, s.nombre
-        """, [pedido_id])
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, row)) for row in cur.fetchall()]
-
-
 from datetime import datetime
 
 @login_required
@@ -120,16 +97,20 @@ def factura_list(request):
     params = []
 
     if q:
-        where.append("(f.nro LIKE %s OR u.email LIKE %s OR c.nombre LIKE %s)")
-        like = f"%{q}%"
-        params += [like, like, like]
-
-    if desde:
-        where.append("DATE(f.fecha) >= %s")
-        params.append(desde)
-    if hasta:
-        where.append("DATE(f.fecha) <= %s")
-        params.append(hasta)
+        # nro por prefijo; nombre/email vía índice de búsqueda
+        # (sin palabras útiles, p.ej. "#", filtro_sql da "1=1": solo queda el nro)
+        cond, ps = filtro_sql("cliente", "p.cliente_id", q)
+        nro = q.replace("%", "").replace("_", "") + "%"
+        if ps:
+            where.append(f"(f.nro LIKE %s OR {cond})")
+            params += [nro, *ps]
+        else:
+            where.append("f.nro LIKE %s")
+            params.append(nro)
+
+    conds, ps = rango_fechas("f.fecha", desde, hasta)
+    where += conds
+    params += ps
 
     sql = f"""
       SELECT f.id, f.nro, f.fecha, f.total,
@@ -2,13 +2,16 @@
 from decimal import Decimal
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import F
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
+from .paginacion import PaginaKeyset
 from .permissions import requiere_permiso
+from .services_costos import marcar_insumos
+from .services_kardex import con_saldo, delta, saldo, saldo_tras
+from .services_valuacion import costo_ventas, estado as estado_valuacion, valor_stock
 from .models_db import Insumo, Kardex
 from .forms_inventario import MovimientoInventarioForm
 
@@ -52,6 +55,7 @@ def movimiento_crear(request):
                 cantidad=cantidad,
                 observacion=observacion[:200] or None,
             )
+            marcar_insumos([obj.pk])  # el costo FIFO depende del stock
 
         messages.success(request, "Movimiento registrado.")
         return redirect("kardex_list")
@@ -66,7 +70,7 @@ def kardex_list(request):
     insumo_id = request.GET.get("insumo")
     if insumo_id:
         qs = qs.filter(insumo_id=insumo_id)
-    page = Paginator(qs, 20).get_page(request.GET.get("page"))
+    page = PaginaKeyset(request, qs, ("-fecha", "-id"), por_pagina=20)
     insumos = Insumo.objects.all().order_by("nombre")
     return render(
         request, "accounts/kardex_list.html",
@@ -78,11 +82,62 @@ def kardex_list(request):
 @requiere_permiso("INVENTARIO_READ")
 def kardex_por_insumo(request, pk: int):
     insumo = get_object_or_404(Insumo, pk=pk)
-    page = Paginator(
-        Kardex.objects.filter(insumo=insumo).order_by("-fecha", "-id"),
-        20
-    ).get_page(request.GET.get("page"))
+    page = PaginaKeyset(request, Kardex.objects.filter(insumo=insumo), ("-fecha", "-id"), por_pagina=20)
+
+    # Saldo por fila: la primera página parte del saldo actual (último corte +
+    # movimientos nuevos); las demás reciben en el cursor el saldo de la fila
+    # borde, así ninguna página suma movimientos fuera de ella.
+    stock_kardex = saldo(insumo.pk)
+    movimientos = page.object_list
+    if movimientos:
+        if not page.direccion:
+            inicial = stock_kardex
+        elif page.extra is None:
+            # Cursor sin saldo (enlace viejo): se calcula desde el saldo actual
+            primero = movimientos[0]
+            inicial = saldo_tras(insumo.pk, primero.fecha, primero.id, total=stock_kardex)
+        elif page.direccion == "despues":
+            inicial = Decimal(page.extra)
+        else:
+            # `extra` = saldo tras la fila más antigua siguiente a esta página
+            inicial = Decimal(page.extra) + sum(delta(m.tipo, m.cantidad) for m in movimientos)
+        page.object_list = con_saldo(movimientos, inicial)
+        ultimo = page.object_list[-1]
+        page.extra_siguiente = str(ultimo.saldo - delta(ultimo.tipo, ultimo.cantidad))
+        page.extra_anterior = str(page.object_list[0].saldo)
+
     return render(
         request, "accounts/kardex_por_insumo.html",
-        {"insumo": insumo, "page": page}
+        {"insumo": insumo, "page": page, "stock_kardex": stock_kardex}
     )
+
+
+@login_required
+@requiere_permiso("INVENTARIO_READ")
+def valuacion_inventario(request):
+    """
+    Valor del stock por insumo (capas FIFO) y costo de lo consumido por período.
+    Solo lee las tablas derivadas; las actualiza el comando `valuar_inventario`.
+    """
+    d1 = (request.GET.get("d1") or "").strip()
+    d2 = (request.GET.get("d2") or "").strip()
+    periodo = "dia" if request.GET.get("periodo") == "dia" else "mes"
+
+    stock = valor_stock()
+    insumos = Insumo.objects.filter(pk__in=stock).order_by("nombre")
+    filas = [
+        {**stock[i.pk], "insumo": i, "costo_medio": stock[i.pk]["valor"] / stock[i.pk]["cantidad"]}
+        for i in insumos
+    ]
+    periodos = costo_ventas(d1, d2, periodo)
+
+    return render(request, "accounts/valuacion_inventario.html", {
+        "filas": filas,
+        "valor_total": sum((f["valor"] for f in filas), Decimal("0")),
+        "periodos": periodos,
+        "total_consumo": sum((p["consumo"] for p in periodos), Decimal("0")),
+        "total_otros": sum((p["otros"] for p in periodos), Decimal("0")),
+        "hay_sin_capa": any(p["sin_capa"] for p in periodos),
+        "corte": estado_valuacion(),
+        "d1": d1, "d2": d2, "periodo": periodo,
+    })
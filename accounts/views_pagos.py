@@ -5,57 +5,22 @@ import stripe
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import connection
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
 from .models_db import Pedido
+from .models_stripe import EventoStripe
+from .services_pagos import saldo as saldo_pedido
+from .services_stripe import FirmaInvalida, encolar, estado_sesion, verificar
+from .stripe_service import StripeNoDisponible, cliente as cliente_stripe
 
 
 # -----------------------
-# Helpers SQL
+# Helpers
 # -----------------------
-def _total_pagado(pedido_id: int) -> Decimal:
-    with connection.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(monto),0) FROM pago WHERE pedido_id=%s", [pedido_id])
-        (s,) = cur.fetchone()
-        return Decimal(str(s or 0))
-
-
-def _existe_referencia(ref: str) -> bool:
-    """Evita duplicados por session_id."""
-    if not ref:
-        return False
-    with connection.cursor() as cur:
-        cur.execute("SELECT 1 FROM pago WHERE referencia=%s LIMIT 1", [ref])
-        return cur.fetchone() is not None
-
-
-def _usuario_id_por_email(email: str) -> int | None:
-    """Retorna id en tabla 'usuario' a partir del email."""
-    if not email:
-        return None
-    with connection.cursor() as cur:
-        cur.execute("SELECT id FROM usuario WHERE email=%s LIMIT 1", [email])
-        row = cur.fetchone()
-        return row[0] if row else None
-
-
-def _usuario_id_dueno_pedido(pedido_id: int) -> int | None:
-    """Devuelve el id del usuario dueño del pedido."""
-    with connection.cursor() as cur:
-        cur.execute("""
-            SELECT u.id
-            FROM pedido p
-            JOIN cliente c ON c.id = p.cliente_id
-            JOIN usuario u ON u.id = c.usuario_id
-            WHERE p.id = %s
-            LIMIT 1
-        """, [pedido_id])
-        row = cur.fetchone()
-        return row[0] if row else None
-
-
 def _es_duenio_del_pedido(request, pedido: Pedido) -> bool:
     """Compara email del cliente con el del usuario logueado."""
     try:
@@ -71,8 +36,6 @@ def _es_duenio_del_pedido(request, pedido: Pedido) -> bool:
 # -----------------------
 @login_required
 def crear_checkout_session(request, pedido_id: int):
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
     # Trae el pedido y valida propiedad por email
     pedido = get_object_or_404(
         Pedido.objects.select_related("cliente__usuario"),
@@ -83,8 +46,7 @@ def crear_checkout_session(request, pedido_id: int):
         return redirect("pedido_detalle", pedido_id=pedido.id)
 
     # Calcula saldo
-    pagado = _total_pagado(pedido.id)
-    saldo = (Decimal(pedido.total or 0) - pagado)
+    saldo = saldo_pedido(pedido)
     if saldo <= 0:
         messages.info(request, "Este pedido ya no tiene saldo pendiente.")
         return redirect("pedido_detalle", pedido_id=pedido.id)
@@ -98,7 +60,7 @@ def crear_checkout_session(request, pedido_id: int):
     cancel_url  = f"{domain}{reverse('pago_cancelado', args=[pedido.id])}"
 
     try:
-        session = stripe.checkout.Session.create(
+        session = cliente_stripe().crear_checkout(
             mode="payment",
             payment_method_types=["card"],
             line_items=[{
@@ -117,6 +79,9 @@ def crear_checkout_session(request, pedido_id: int):
                 "saldo": str(saldo),
             }
         )
+    except StripeNoDisponible as e:
+        messages.error(request, e.user_message)
+        return redirect("pedido_detalle", pedido_id=pedido.id)
     except stripe.error.StripeError as e:
         messages.error(request, f"Error creando sesión de Stripe: {getattr(e, 'user_message', str(e))}")
         return redirect("pedido_detalle", pedido_id=pedido.id)
@@ -126,61 +91,35 @@ def crear_checkout_session(request, pedido_id: int):
 
 @login_required
 def pago_exitoso(request, pedido_id: int):
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+    """
+    Vuelta desde Stripe. No consulta la API: el pago lo registra el webhook
+    (bandeja `stripe_evento` + `procesar_stripe`); aquí solo se informa.
+    """
     session_id = request.GET.get("session_id")
     if not session_id:
         messages.warning(request, "No se encontró la sesión de pago.")
         return redirect("pedido_detalle", pedido_id=pedido_id)
 
-    # Idempotencia
-    if _existe_referencia(session_id):
-        messages.success(request, "Pago ya registrado anteriormente.")
-        return redirect("pedido_detalle", pedido_id=pedido_id)
-
-    try:
-        session = stripe.checkout.Session.retrieve(session_id)
-    except stripe.error.StripeError as e:
-        messages.warning(request, f"No se pudo validar la sesión de pago: {getattr(e, 'user_message', str(e))}")
-        return redirect("pedido_detalle", pedido_id=pedido_id)
-
-    if session.get("payment_status") != "paid":
-        messages.warning(request, "El pago no aparece como 'paid'.")
-        return redirect("pedido_detalle", pedido_id=pedido_id)
-
-    amount_paid = Decimal(session.get("amount_total", 0)) / Decimal("100")
-
-    # Validación contra saldo actual
-    pagado = _total_pagado(pedido_id)
-    with connection.cursor() as cur:
-        cur.execute("SELECT total FROM pedido WHERE id=%s", [pedido_id])
-        (total_db,) = cur.fetchone() or (0,)
-    saldo_actual = Decimal(str(total_db or 0)) - pagado
-    if amount_paid > saldo_actual + Decimal("0.01"):
-        messages.warning(request, "El monto cobrado supera el saldo pendiente. Revisa el pedido.")
+    estado = estado_sesion(session_id)
+    if estado == EventoStripe.PROCESADO:
+        messages.success(request, "Pago registrado correctamente (Stripe).")
+    elif estado == EventoStripe.IGNORADO:
+        messages.warning(request, "Stripe no informó el pago como completado. Revisa el pedido.")
+    else:
+        messages.info(request, "Pago recibido. Se verá en el pedido en cuanto Stripe lo confirme.")
+    return redirect("pedido_detalle", pedido_id=pedido_id)
 
-    # Resolver registrado_por_id:
-    registrador_id = _usuario_id_por_email(getattr(request.user, "email", ""))
-    if registrador_id is None:
-        registrador_id = _usuario_id_dueno_pedido(pedido_id)
 
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Verifica la firma, guarda el evento (un INSERT) y responde 200."""
     try:
-        with connection.cursor() as cur:
-            cur.execute("""
-                INSERT INTO pago (pedido_id, metodo, monto, referencia, registrado_por_id, created_at)
-                VALUES (%s, %s, %s, %s, %s, NOW())
-            """, [pedido_id, "TRANSFERENCIA", float(amount_paid), session_id, registrador_id])
-        messages.success(request, "Pago registrado correctamente (Stripe).")
-    except Exception as e:
-        print("Error insertando pago:", e)
-        import traceback
-        traceback.print_exc()
-        messages.success(
-            request,
-            "Pago aprobado en Stripe, pero no se pudo insertar el registro. "
-            "Si no aparece en la lista, regístralo manualmente con la referencia."
-        )
-
-    return redirect("pedido_detalle", pedido_id=pedido_id)
+        evento = verificar(request.body, request.headers.get("Stripe-Signature", ""))
+    except FirmaInvalida:
+        return HttpResponse(status=400)
+    encolar(evento, request.body)
+    return HttpResponse(status=200)
 
 
 @login_required
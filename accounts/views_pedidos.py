@@ -4,19 +4,22 @@ from decimal import Decimal
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db import connection, models, transaction
+from django.db import connection, models
 from django.db.models import F, Q, Value
 from django.db.models.functions import Coalesce, NullIf, Trim
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
 from .models_db import (
     Pedido,
-    Producto,
-    Sabor,
     Usuario,
-    Pago,
 )
 from .permissions import requiere_permiso, owner_or_staff_pedido
+from .services_busqueda import filtro_orm
+from .services_catalogo import foto as catalogo_foto
+from .services_pagos import con_saldos, registrar_pago, total_pagado as _total_pagado
+from .services_pedidos import CarritoInvalido, cargar_pedido, guardar_lineas
+from .services_resumen_ventas import marcar_pedido
 
 
 # ----------------------------
@@ -43,33 +46,6 @@ def _fetch_detalle(pedido_id: int):
         return [dict(zip(cols, r)) for r in cur.fetchall()]
 
 
-def _recalcular_total(pedido_id: int):
-    """Recalcula total (items + costo_envio)."""
-    with connection.cursor() as cur:
-        cur.execute(
-            """
-            UPDATE pedido p
-            JOIN (
-              SELECT pedido_id, SUM(cantidad*precio_unitario) AS items
-              FROM detalle_pedido
-              WHERE pedido_id=%s
-              GROUP BY pedido_id
-            ) x ON x.pedido_id=p.id
-            SET p.total = x.items + p.costo_envio
-            WHERE p.id=%s
-            """,
-            [pedido_id, pedido_id],
-        )
-
-
-def _total_pagado(pedido_id: int) -> Decimal:
-    """Suma de pagos registrados para un pedido."""
-    with connection.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(monto),0) FROM pago WHERE pedido_id=%s", [pedido_id])
-        (suma,) = cur.fetchone()
-    return Decimal(suma or 0)
-
-
 # ----------------------------
 # CUxx – Pedidos pendientes
 # ----------------------------
@@ -77,11 +53,16 @@ def _total_pagado(pedido_id: int) -> Decimal:
 @requiere_permiso("PEDIDO_READ")
 def pedidos_pendientes(request):
     qs = (
-        Pedido.objects.select_related("cliente")
+        Pedido.objects.select_related("cliente", "cliente__usuario")
         .filter(estado="PENDIENTE")
         .order_by("-created_at", "-id")
     )
-    return render(request, "accounts/pedidos_pendientes.html", {"pedidos": qs})
+    page_obj = Paginator(qs, 15).get_page(request.GET.get("page"))
+    return render(
+        request,
+        "accounts/pedidos_pendientes.html",
+        {"pedidos": con_saldos(page_obj.object_list), "page_obj": page_obj},
+    )
 
 
 # ----------------------------
@@ -90,45 +71,27 @@ def pedidos_pendientes(request):
 @login_required
 @requiere_permiso("PEDIDO_READ")
 def pedido_detalle(request, pedido_id):
-    pedido = get_object_or_404(Pedido, pk=pedido_id)
-
-    # Detalle e importes
-    detalle = _fetch_detalle(pedido.id)
-    pagos = list(
-        Pago.objects.filter(pedido_id=pedido.id)
-        .select_related("registrado_por")
-        .order_by("-created_at")
-        .values(
-            "id",
-            "metodo",
-            "monto",
-            "referencia",
-            "created_at",
-            "registrado_por__nombre",
-        )
-    )
-    total_pagado = _total_pagado(pedido.id)
-    saldo = (pedido.total or 0) - total_pagado
+    # Cabecera, cliente, saldo, líneas y pagos: dos consultas (services_pedidos)
+    pedido = cargar_pedido(pedido_id)
+    if pedido is None:
+        raise Http404("Pedido no encontrado")
+    saldo = pedido["saldo"]
 
     # Flags de permisos/acciones (para que el template esté limpio)
-    es_duenio = False
-    try:
-        # Emparejamos por email app_user <-> cliente.usuario
-        if request.user.is_authenticated and pedido.cliente and pedido.cliente.usuario:
-            es_duenio = (pedido.cliente.usuario.email or "").lower() == (request.user.email or "").lower()
-    except Exception:
-        es_duenio = False
+    # Emparejamos por email app_user <-> cliente.usuario
+    email_cliente = ((pedido["cliente"] or {}).get("email") or "").lower()
+    es_duenio = bool(email_cliente) and email_cliente == (getattr(request.user, "email", "") or "").lower()
 
-    puede_editar = es_duenio and (saldo or 0) > 0 and pedido.estado not in ("ENTREGADO", "CANCELADO")
+    puede_editar = es_duenio and (saldo or 0) > 0 and pedido["estado"] not in ("ENTREGADO", "CANCELADO")
 
     return render(
         request,
         "accounts/pedido_detalle.html",
         {
             "pedido": pedido,
-            "detalle": detalle,
-            "pagos": pagos,
-            "total_pagado": total_pagado,
+            "detalle": pedido["lineas"],
+            "pagos": pedido["pagos"],
+            "total_pagado": pedido["pagado"],
             "saldo_pendiente": saldo,
             "es_duenio": es_duenio,
             "puede_editar": puede_editar,
@@ -144,13 +107,13 @@ def pedido_detalle(request, pedido_id):
 def pedido_editar(request, pedido_id):
     pedido = get_object_or_404(Pedido, pk=pedido_id)
 
-    # Catálogo para selects
-    productos = list(
-        Producto.objects.filter(activo=True)
-        .order_by("nombre")
-        .values("id", "nombre", "precio_unitario")
-    )
-    sabores = list(Sabor.objects.filter(activo=True).order_by("nombre").values("id", "nombre"))
+    # Catálogo para selects (caché del catálogo, sin consultas)
+    catalogo = catalogo_foto()
+    productos = [
+        {"id": p["id"], "nombre": p["nombre"], "precio_unitario": p["precio_unitario"]}
+        for p in catalogo["productos"]
+    ]
+    sabores = [{"id": sv["id"], "nombre": sv["nombre"]} for sv in catalogo["sabores"]]
 
     if request.method == "POST":
         filas = int(request.POST.get("filas", "0"))
@@ -173,42 +136,18 @@ def pedido_editar(request, pedido_id):
             if cant <= 0 or prec < 0:
                 messages.error(request, "Cantidad y precio unitario deben ser positivos.")
                 return redirect("pedido_editar", pedido_id=pedido.id)
+            if cant != cant.to_integral_value():
+                messages.error(request, "La cantidad debe ser un número entero de unidades.")
+                return redirect("pedido_editar", pedido_id=pedido.id)
             items.append((pid, sid, cant, prec))
 
-        # Aplicar cambios con upsert
-        with transaction.atomic():
-            with connection.cursor() as cur:
-                if items:
-                    cur.execute(
-                        """
-                        DELETE FROM detalle_pedido
-                        WHERE pedido_id=%s
-                          AND (producto_id, sabor_id) NOT IN (
-                              """
-                        + ",".join(["(%s,%s)"] * len(items))
-                        + """
-                          )
-                        """,
-                        [pedido.id]
-                        + [x for t in [(p, s) for p, s, _, _ in items] for x in t],
-                    )
-                else:
-                    cur.execute("DELETE FROM detalle_pedido WHERE pedido_id=%s", [pedido.id])
-
-                for (p_id, s_id, cant, pu) in items:
-                    cur.execute(
-                        """
-                        INSERT INTO detalle_pedido
-                          (pedido_id, producto_id, sabor_id, cantidad, precio_unitario)
-                        VALUES (%s, %s, %s, %s, %s)
-                        ON DUPLICATE KEY UPDATE
-                           cantidad=VALUES(cantidad),
-                           precio_unitario=VALUES(precio_unitario)
-                        """,
-                        [pedido.id, p_id, s_id, str(cant), str(pu)],
-                    )
-
-            _recalcular_total(pedido.id)
+        # Diff en memoria + un DELETE y un upsert multi-fila (services_pedidos)
+        try:
+            guardar_lineas(pedido.id, items)
+        except CarritoInvalido as e:
+            messages.error(request, str(e))
+            return redirect("pedido_editar", pedido_id=pedido.id)
+        marcar_pedido(pedido.id)
 
         messages.success(request, "Pedido actualizado.")
         return redirect("pedido_detalle", pedido_id=pedido.id)
@@ -268,16 +207,16 @@ def pedidos_confirmados(request):
     q = request.GET.get("q", "").strip()
     if q:
         if q.isdigit():
-            qs = qs.filter(Q(id=int(q)) | Q(cliente_nombre__icontains=q))
+            qs = qs.filter(Q(id=int(q)) | filtro_orm("cliente", "cliente_id", q))
         else:
-            qs = qs.filter(cliente_nombre__icontains=q)
+            qs = qs.filter(filtro_orm("cliente", "cliente_id", q))
 
     page_obj = Paginator(qs, 15).get_page(request.GET.get("page"))
     return render(
         request,
         "accounts/pedidos_confirmados.html",
         {
-            "pedidos": page_obj.object_list,
+            "pedidos": con_saldos(page_obj.object_list),
             "page_obj": page_obj,
             "q": q,
             "estados_confirmados": ESTADOS_CONFIRMADOS,
@@ -331,14 +270,7 @@ def pago_registrar(request, pedido_id):
         if not app_user:
             app_user = Usuario.objects.order_by("id").first()
 
-        with connection.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO pago (pedido_id, metodo, monto, referencia, registrado_por_id, created_at)
-                VALUES (%s, %s, %s, %s, %s, NOW())
-                """,
-                [pedido.id, metodo, str(monto), ref or None, app_user.id if app_user else None],
-            )
+        registrar_pago(pedido.id, metodo, monto, ref, app_user.id if app_user else None)
 
         total_pagado = _total_pagado(pedido.id)
         if (pedido.total or 0) <= total_pagado:
@@ -1,64 +1,28 @@
 from django.contrib.auth.decorators import login_required, permission_required
-from django.db import connection, transaction
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
+from django.http import Http404, JsonResponse
 
 
 from .models_db import Pedido, DetallePedido, Producto, Sabor, Insumo, Kardex
 from .models_recetas import Receta
+from .services_pedidos import cargar_pedido
+from .services_produccion import (
+    PedidoNoProducible, StockInsuficiente, calcular_requerimientos, consumir_pedido, planificar,
+)
+from .services_resumen_ventas import marcar_pedido
 
 
 # Util: verificar stock de insumos para un producto
-from decimal import Decimal
-from django.db import connection
-
 def _insumos_necesarios(producto_id: int, cantidad_producto: int):
     """
     Devuelve los insumos requeridos para producir `cantidad_producto` unidades del producto,
     junto con stock por kardex y faltante.
-    Requiere tablas: receta(producto_id, insumo_id, cantidad), insumo, kardex.
+    Para varias líneas usar `calcular_requerimientos` (mismas consultas para todas).
     """
-    with connection.cursor() as cur:
-        cur.execute("""
-            SELECT
-                r.insumo_id                                AS insumo_id,
-                i.nombre                                   AS insumo,
-                i.unidad_medida                            AS um,
-                i.cantidad_disponible                      AS stock_db,
-                -- Stock por movimientos: entradas - salidas ± ajustes
-                COALESCE(SUM(
-                    CASE
-                        WHEN k.tipo = 'ENTRADA' THEN k.cantidad
-                        WHEN k.tipo = 'SALIDA'  THEN -k.cantidad
-                        WHEN k.tipo = 'AJUSTE'  THEN k.cantidad
-                        ELSE 0
-                    END
-                ), 0)                                       AS stock_kardex,
-                (r.cantidad * %s)                          AS necesario
-            FROM receta r
-            JOIN insumo i   ON i.id = r.insumo_id
-            LEFT JOIN kardex k ON k.insumo_id = r.insumo_id
-            WHERE r.producto_id = %s
-            GROUP BY r.insumo_id, i.nombre, i.unidad_medida, i.cantidad_disponible, r.cantidad
-            ORDER BY i.nombre
-        """, [cantidad_producto, producto_id])
-
-        cols = [c[0] for c in cur.description]
-        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-
-    # Calcula faltante (usa el mejor stock disponible)
-    for r in rows:
-        stock_ref = r["stock_kardex"] if r["stock_kardex"] is not None else 0
-        if not stock_ref:  # si kardex aún no tiene movimientos, usa el stock_db
-            stock_ref = r["stock_db"] or 0
-        r["faltante"] = max(Decimal(r["necesario"]) - Decimal(stock_ref), Decimal("0"))
-
-    return rows
-
-
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
-from .models_db import Pedido
+    req = calcular_requerimientos([(producto_id, producto_id, cantidad_producto)])
+    return req.por_linea[producto_id]
+
 
 @login_required
 def pedidos_para_produccion(request):
@@ -70,142 +34,138 @@ def pedidos_para_produccion(request):
     )
     return render(request, 'produccion/pedidos_para_produccion.html', {'pedidos': pedidos})
 
-from decimal import Decimal
+
+# ----------------------------
+# Planificación de producción (varios pedidos)
+# ----------------------------
+def _plan_desde_request(request):
+    desde = (request.GET.get("desde") or "").strip()
+    hasta = (request.GET.get("hasta") or "").strip()
+    return desde, hasta, planificar(desde or None, hasta or None)
+
+
+@login_required
+def planificacion_produccion(request):
+    desde, hasta, plan = _plan_desde_request(request)
+    return render(request, 'produccion/planificacion_produccion.html', {
+        'plan': plan, 'desde': desde, 'hasta': hasta,
+    })
+
+
+def _num(x):
+    return str(x) if x is not None else None
+
+
+@login_required
+def planificacion_produccion_api(request):
+    desde, hasta, plan = _plan_desde_request(request)
+    return JsonResponse({
+        "desde": desde or None,
+        "hasta": hasta or None,
+        "pedidos": [
+            {
+                "id": p["id"],
+                "cliente": p["cliente"],
+                "estado": p["estado"],
+                "fecha_entrega_programada": p["fecha_entrega_programada"].isoformat() if p["fecha_entrega_programada"] else None,
+                "cumple": p["cumple"],
+                "faltantes": [
+                    {"insumo_id": f["insumo_id"], "insumo": f["insumo"], "um": f["um"],
+                     "necesario": _num(f["necesario"]), "faltante": _num(f["faltante"])}
+                    for f in p["faltantes"]
+                ],
+            }
+            for p in plan.pedidos
+        ],
+        "insumos": [
+            {"insumo_id": i["insumo_id"], "insumo": i["insumo"], "um": i["um"],
+             "necesario": _num(i["necesario"]), "stock": _num(i["stock"]),
+             "asignado": _num(i["asignado"]), "faltante": _num(i["faltante"])}
+            for i in plan.insumos
+        ],
+    })
+
 @login_required
 def gestionar_produccion(request, pedido_id: int):
     """
     Muestra los ítems del pedido y permite cambiar a EN_PRODUCCION / LISTO_ENTREGA
     """
-    pedido = get_object_or_404(Pedido, id=pedido_id)
-    # Detalles del pedido
-    items = (DetallePedido.objects
-             .filter(pedido_id=pedido_id)
-             .select_related('producto', 'sabor')
-             .order_by('producto_id', 'sabor_id'))
-
-    # Verificar insumos por cada ítem (agregamos un atributo calculado)
-    verificados = []
-    for it in items:
-        checks = _insumos_necesarios(it.producto_id, it.cantidad)
-        ok = all(Decimal(ch.get("faltante", 0)) <= 0 for ch in checks)
-        verificados.append((it, ok, checks))
+    # Pedido con sus líneas (services_pedidos: 2 consultas)
+    pedido = cargar_pedido(pedido_id)
+    if pedido is None:
+        raise Http404("Pedido no encontrado")
+    items = sorted(pedido["lineas"], key=lambda it: (it["producto_id"], it["sabor_id"]))
+
+    # Verificar insumos de todas las líneas en lote (recetas + stock: 2 consultas)
+    req = calcular_requerimientos((it["id"], it["producto_id"], it["cantidad"]) for it in items)
+    verificados = [(it, req.ok_linea(it["id"]), req.por_linea[it["id"]]) for it in items]
 
     # Acciones de estado
     if request.method == 'POST':
         accion = request.POST.get('accion')
-        if accion == 'en_produccion' and pedido.estado == 'CONFIRMADO':
-            Pedido.objects.filter(id=pedido.id).update(estado='EN_PRODUCCION')
+        if accion == 'en_produccion' and pedido['estado'] == 'CONFIRMADO':
+            Pedido.objects.filter(id=pedido_id).update(estado='EN_PRODUCCION')
+            marcar_pedido(pedido_id)
             messages.success(request, 'Pedido pasado a EN_PRODUCCION.')
-            return redirect('gestionar_produccion', pedido_id=pedido.id)
-
-        if accion == 'listo_entrega' and pedido.estado in ['CONFIRMADO', 'EN_PRODUCCION']:
-            # Requiere que TODOS los ítems estén OK
-            if all(ok for _, ok, _ in verificados):
-                Pedido.objects.filter(id=pedido.id).update(estado='LISTO_ENTREGA')
+            return redirect('gestionar_produccion', pedido_id=pedido_id)
+
+        if accion == 'listo_entrega' and pedido['estado'] in ['CONFIRMADO', 'EN_PRODUCCION']:
+            # Requiere que TODOS los ítems estén OK y que el stock alcance
+            # para el pedido completo (insumos compartidos entre líneas)
+            if all(ok for _, ok, _ in verificados) and req.ok:
+                Pedido.objects.filter(id=pedido_id).update(estado='LISTO_ENTREGA')
+                marcar_pedido(pedido_id)
                 messages.success(request, 'Pedido marcado como LISTO_ENTREGA.')
-                return redirect('gestionar_produccion', pedido_id=pedido.id)
+                return redirect('gestionar_produccion', pedido_id=pedido_id)
             else:
                 messages.error(request, 'Faltan insumos para al menos un ítem.')
 
     return render(request, 'produccion/gestionar_produccion.html', {
         'pedido': pedido,
-        'verificados': verificados,  # [(detalle, ok_bool, [(insumo_id,nombre,req,stock,ok), ...])]
+        'verificados': verificados,  # [(detalle, ok_bool, [check dict, ...])]
+        'insumos': req.insumos,      # totales por insumo de todo el pedido
+        'stock_ok': req.ok,
     })
 
-# accounts/views_produccion.py
-from decimal import Decimal
-from django.contrib import messages
-from django.db import connection, transaction
-from django.shortcuts import get_object_or_404, redirect
-
 @login_required
 def producir_item(request, pedido_id: int, producto_id: int, sabor_id: int):
     """
     Descuenta del stock (kardex SALIDA/CONSUMO) los insumos requeridos
     para el ítem (producto_id, sabor_id) del pedido indicado.
-    Soporta tanto 'checks' como lista de tuplas o de diccionarios.
     """
-    # 1) Obtener el item (único por pedido/producto/sabor)
     item = get_object_or_404(
         DetallePedido,
         pedido_id=pedido_id,
         producto_id=producto_id,
         sabor_id=sabor_id,
     )
-
-    # 2) Calcular insumos necesarios (ya incluye la cantidad del item)
-    checks = _insumos_necesarios(producto_id, item.cantidad)
-
-    # 3) Si falta algo, no descontamos
-    def hay_faltante(c):
-        if isinstance(c, dict):
-            # si viene como dict (nuestro formato nuevo)
-            return Decimal(str(c.get("faltante", "0"))) > 0
-        else:
-            # si viene como tupla: (id, nombre, [um], requerido, stock, ok, ...)
-            # tomamos requerido y stock de posiciones seguras
-            try:
-                requerido = Decimal(str(c[2]))  # si el formato era (id, nombre, requerido, stock, ok)
-                stock = Decimal(str(c[3]))
-            except Exception:
-                # formato extendido: (id, nombre, um, requerido, stock, ok, ...)
-                requerido = Decimal(str(c[3]))
-                stock = Decimal(str(c[4]))
-            return (requerido - stock) > 0
-
-    if any(hay_faltante(c) for c in checks):
-        messages.error(request, "No se puede descontar: hay insumos con faltantes.")
+    try:
+        consumir_pedido(pedido_id, solo=[(item.producto_id, item.sabor_id)])
+    except PedidoNoProducible as e:
+        messages.warning(request, str(e))
+        return redirect("gestionar_produccion", pedido_id=pedido_id)
+    except StockInsuficiente as e:
+        messages.error(request, f"No se puede descontar: hay insumos con faltantes ({e}).")
         return redirect("gestionar_produccion", pedido_id=pedido_id)
-
-    # 4) Descontar en una transacción
-    with transaction.atomic():
-        with connection.cursor() as cur:
-            for c in checks:
-                # Normalizar a (insumo_id, requerido)
-                if isinstance(c, dict):
-                    # Formato dict
-                    insumo_id = c.get("insumo_id")
-                    if not insumo_id:
-                        # Si no vino el id, buscamos por nombre (último recurso)
-                        cur.execute("SELECT id FROM insumo WHERE nombre=%s LIMIT 1", [c["insumo"]])
-                        row = cur.fetchone()
-                        if not row:
-                            raise ValueError(f"No existe insumo '{c['insumo']}' en la base de datos.")
-                        insumo_id = row[0]
-                    requerido = Decimal(str(c["necesario"]))
-                else:
-                    # Formato tupla
-                    # Puede ser (id, nombre, requerido, stock, ok)  -> len>=5
-                    # o (id, nombre, um, requerido, stock, ok, ...) -> len>=6
-                    if len(c) >= 5:
-                        try:
-                            insumo_id, _nombre, requerido, _stock, _ok = c[:5]
-                            requerido = Decimal(str(requerido))
-                        except Exception:
-                            # Versión con 'um'
-                            insumo_id, _nombre, _um, requerido, _stock, *_rest = c
-                            requerido = Decimal(str(requerido))
-                    else:
-                        raise ValueError("Formato de 'checks' no reconocido.")
-
-                # Insertar movimiento en kardex (SALIDA / CONSUMO)
-                cur.execute(
-                    """
-                    INSERT INTO kardex(insumo_id, fecha, tipo, motivo, cantidad, observacion)
-                    VALUES (%s, NOW(), 'SALIDA', 'CONSUMO', %s, %s)
-                    """,
-                    [
-                        insumo_id,
-                        requerido,
-                        f"Pedido {pedido_id} – prod {producto_id}/{sabor_id} x{item.cantidad}",
-                    ],
-                )
-
-                # Actualizar stock del insumo
-                cur.execute(
-                    "UPDATE insumo SET cantidad_disponible = cantidad_disponible - %s WHERE id = %s",
-                    [requerido, insumo_id],
-                )
 
     messages.success(request, "Insumos descontados correctamente.")
     return redirect("gestionar_produccion", pedido_id=pedido_id)
+
+
+@login_required
+def producir_pedido(request, pedido_id: int):
+    """Descuenta de una vez los insumos de todas las líneas del pedido (POST)."""
+    pedido = get_object_or_404(Pedido, id=pedido_id)
+    if request.method != "POST":
+        return redirect("gestionar_produccion", pedido_id=pedido.id)
+    try:
+        consumir_pedido(pedido.id)
+    except PedidoNoProducible as e:
+        messages.warning(request, str(e))
+        return redirect("gestionar_produccion", pedido_id=pedido.id)
+    except StockInsuficiente as e:
+        messages.error(request, f"No se puede descontar: hay insumos con faltantes ({e}).")
+        return redirect("gestionar_produccion", pedido_id=pedido.id)
+
+    messages.success(request, "Insumos de todo el pedido descontados correctamente.")
+    return redirect("gestionar_produccion", pedido_id=pedido.id)
@@ -1,44 +1,35 @@
 # accounts/views_recetas.py (solo cabecera de imports)
+from decimal import Decimal
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import transaction, IntegrityError, connection
+from django.db import transaction, IntegrityError
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
 from .models_db import Producto, Insumo      # <- Importa aquí
 from .models_recetas import Receta           # <- Y aquí solo Receta
 from .forms_recetas import AddRecipeItemForm, RecipeItemForm
+from .services_costos import costos_insumos, costos_productos, margen, metodo_actual
 
 
 
 
-def _ultimo_costo_unitario(insumo_id: int) -> float:
-    """
-    Retorna el costo_unitario más reciente del insumo según compra_detalle/compra.
-    Si no hay compras, retorna 0.0
-    """
-    with connection.cursor() as cur:
-        cur.execute("""
-            SELECT COALESCE((
-                SELECT cd.costo_unitario
-                FROM compra_detalle cd
-                JOIN compra c ON c.id = cd.compra_id
-                WHERE cd.insumo_id = %s
-                ORDER BY c.fecha DESC, cd.compra_id DESC
-                LIMIT 1
-            ), 0)
-        """, [insumo_id])
-        row = cur.fetchone()
-    return float(row[0]) if row else 0.0
-
 @login_required
 def recetas_list(request):
     productos_qs = Producto.objects.filter(activo=True).order_by('nombre')
+    costos = costos_productos()  # todos los productos en una consulta
     productos = []
     for p in productos_qs:
-        cnt = Receta.objects.filter(producto=p).count()
-        productos.append({'id': p.id, 'nombre': p.nombre, 'items': cnt})
-    return render(request, 'accounts/recetas_list.html', {'productos': productos})
+        c = costos.get(p.id, {"items": 0, "costo": Decimal("0")})
+        productos.append({
+            'id': p.id, 'nombre': p.nombre, 'items': c["items"],
+            'precio': p.precio_unitario, 'costo': c["costo"],
+            **margen(p.precio_unitario, c["costo"]),
+        })
+    return render(request, 'accounts/recetas_list.html', {
+        'productos': productos, 'metodo': metodo_actual(),
+    })
 
 @login_required
 def receta_edit(request, producto_id: int):
@@ -88,15 +79,22 @@ def receta_edit(request, producto_id: int):
     items = Receta.objects.filter(producto=producto).select_related('insumo').order_by('insumo__nombre')
     row_forms = [(r, RecipeItemForm(instance=r, prefix=str(r.insumo_id))) for r in items]
 
-    # Costo aprox por unidad
-    costo_total = 0.0
-    for r in items:
-        costo_total += float(r.cantidad) * _ultimo_costo_unitario(r.insumo_id)
+    # Costo por unidad: costos de todos los insumos en una consulta
+    costos = costos_insumos([r.insumo_id for r in items])
+    costo_total = Decimal("0")
+    filas = []
+    for r, form in row_forms:
+        costo_unit = costos.get(r.insumo_id, Decimal("0"))
+        subtotal = r.cantidad * costo_unit
+        costo_total += subtotal
+        filas.append((r, form, costo_unit, subtotal))
 
     ctx = {
         'producto': producto,
-        'row_forms': row_forms,
+        'row_forms': filas,
         'add_form': add_form,
-        'costo_por_unidad': round(costo_total, 4)
+        'costo_por_unidad': round(costo_total, 4),
+        'metodo': metodo_actual(),
+        **margen(producto.precio_unitario, costo_total),
     }
     return render(request, 'accounts/recetas_edit.html', ctx)
@@ -4,8 +4,9 @@ from __future__ import annotations
 from datetime import datetime
 from decimal import Decimal
 import csv
+import io
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.db import connection
 from django.contrib.auth.decorators import login_required
@@ -13,6 +14,9 @@ from django.utils.timezone import now
 
 # Decorador de permisos propio (ajústalo si no lo usas)
 from .permissions import requiere_permiso
+from .services_busqueda import filtro_sql
+from .services_reportes import ConsultaReporte, consulta_ventas_diarias, dia_local, rango_fechas
+from .services_resumen_ventas import resumen_habilitado
 
 # Si no usas estos, puedes quitarlos
 from django.db.models import Sum  # noqa: F401
@@ -57,55 +61,117 @@ def _parse_date(s: str | None):
     return None
 
 
+# Filas por fetchmany() en exportaciones (cursor del lado del servidor)
+CSV_CHUNK_SIZE = 500
+
+
+def _limit_sql(limit: int | None) -> str:
+    return f"LIMIT {int(limit)}" if limit else ""
+
+
+def _export_completo(request) -> bool:
+    """?todo=1 quita el tope de filas en las exportaciones CSV."""
+    return (request.GET.get("todo") or "").lower() in ("1", "true", "si", "on")
+
+
+def _fetch_rows(sql: str, params: list) -> list[dict]:
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+
+def _iter_rows(sql: str, params: list, chunk_size: int = CSV_CHUNK_SIZE):
+    """
+    Itera filas (dict) en bloques de `chunk_size` sin cargar todo el resultado.
+    En MySQL usa SSCursor (cursor del lado del servidor): el cliente no
+    materializa el result set, así la memoria queda plana en exportes grandes.
+    """
+    connection.ensure_connection()
+    if connection.vendor == "mysql":
+        from MySQLdb.cursors import SSCursor
+        cur = connection.connection.cursor(SSCursor)
+    else:
+        cur = connection.cursor()
+    try:
+        cur.execute(sql, params)
+        cols = [c[0] for c in cur.description]
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for row in chunk:
+                yield dict(zip(cols, row))
+    finally:
+        cur.close()
+
+
+def _csv_streaming_response(filename: str, header: list, filas, chunk_size: int = CSV_CHUNK_SIZE):
+    """
+    StreamingHttpResponse CSV: escribe `header` y luego cada lista de `filas`
+    (iterable perezoso), enviando un bloque cada `chunk_size` filas.
+    """
+    def _gen():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(header)
+        n = 0
+        for fila in filas:
+            w.writerow(fila)
+            n += 1
+            if n % chunk_size == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        yield buf.getvalue()
+
+    resp = StreamingHttpResponse(_gen(), content_type="text/csv; charset=utf-8")
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
+
+
 # ================================================================
 # CU18 – Historial de compras de clientes
 # ================================================================
-def _fetch_historial(q: str | None, d1: str | None, d2: str | None, order_sql: str):
+def _sql_historial(
+    q: str | None, d1: str | None, d2: str | None, order_sql: str, limit: int | None = 500,
+) -> tuple[str, list]:
     """
     Trae los pedidos CONFIRMADO con totales y pagado agregado.
-    Filtro por nombre/email (LIKE) y rango de fechas en created_at.
+    Filtro por nombre/email (índice de búsqueda) y rango de fechas en created_at.
     """
-    where = ["p.estado = 'CONFIRMADO'"]
-    params: list = []
+    qr = (
+        ConsultaReporte()
+        .join("LEFT JOIN cliente c ON c.id = p.cliente_id")
+        .join("LEFT JOIN usuario u ON u.id = c.usuario_id")
+        .pagos_por_pedido()
+        .where_pedido("p.estado = 'CONFIRMADO'")
+    )
 
     if q:
-        where.append(
-            "(u.email LIKE CONCAT('%%', %s, '%%') OR u.nombre LIKE CONCAT('%%', %s, '%%'))"
+        cond, ps = filtro_sql("cliente", "p.cliente_id", q)
+        qr.where(cond, *ps)
+
+    qr.where_rango("p.created_at", d1, d2)
+
+    return (
+        qr.select(
+            "p.id AS pedido_id",
+            "DATE_FORMAT(p.created_at, '%%Y-%%m-%%d %%H:%%i') AS creado",
+            "u.email AS cliente_email",
+            "COALESCE(NULLIF(TRIM(c.nombre), ''), NULLIF(TRIM(u.nombre), ''), u.email) AS cliente",
+            "p.total AS total",
+            "p.estado AS estado",
+            "COALESCE(pg.pagado, 0) AS pagado",
         )
-        params.extend([q, q])
-
-    if d1:
-        where.append("DATE(p.created_at) >= %s")
-        params.append(d1)
-    if d2:
-        where.append("DATE(p.created_at) <= %s")
-        params.append(d2)
-
-    where_sql = " AND ".join(where) if where else "1=1"
+        .order_by(order_sql)
+        .limit(limit)
+        .sql()
+    )
 
-    sql = f"""
-        SELECT
-            p.id AS pedido_id,
-            DATE_FORMAT(p.created_at, '%%Y-%%m-%%d %%H:%%i') AS creado,
-            u.email AS cliente_email,
-            COALESCE(NULLIF(TRIM(c.nombre), ''), NULLIF(TRIM(u.nombre), ''), u.email) AS cliente,
-            p.total AS total,
-            p.estado AS estado,
-            COALESCE(SUM(pg.monto), 0) AS pagado
-        FROM pedido p
-        LEFT JOIN cliente c ON c.id = p.cliente_id
-        LEFT JOIN usuario u ON u.id = c.usuario_id
-        LEFT JOIN pago pg   ON pg.pedido_id = p.id
-        WHERE {where_sql}
-        GROUP BY p.id, creado, cliente_email, cliente, total, estado
-        ORDER BY {order_sql}
-        LIMIT 500
-    """
 
-    with connection.cursor() as cur:
-        cur.execute(sql, params)
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, row)) for row in cur.fetchall()]
+def _fetch_historial(q: str | None, d1: str | None, d2: str | None, order_sql: str):
+    return _fetch_rows(*_sql_historial(q, d1, d2, order_sql))
 
 
 @login_required
@@ -149,14 +215,11 @@ def historial_clientes_csv(request):
     d2 = (request.GET.get("d2") or "").strip() or None
 
     order_sql = _build_order_mysql("creado", "desc")
-    rows = _fetch_historial(q, d1, d2, order_sql)
+    limit = None if _export_completo(request) else 500
+    rows = _iter_rows(*_sql_historial(q, d1, d2, order_sql, limit=limit))
 
-    resp = HttpResponse(content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = 'attachment; filename="historial_clientes.csv"'
-    w = csv.writer(resp)
-    w.writerow(["Pedido", "Creado", "Cliente", "Email", "Total (Bs.)", "Estado", "Pagado (Bs.)"])
-    for r in rows:
-        w.writerow([
+    filas = (
+        [
             r.get("pedido_id", ""),
             r.get("creado", ""),
             r.get("cliente", "") or "",
@@ -164,8 +227,14 @@ def historial_clientes_csv(request):
             f"{Decimal(r.get('total') or 0):.2f}",
             r.get("estado", "") or "",
             f"{Decimal(r.get('pagado') or 0):.2f}",
-        ])
-    return resp
+        ]
+        for r in rows
+    )
+    return _csv_streaming_response(
+        "historial_clientes.csv",
+        ["Pedido", "Creado", "Cliente", "Email", "Total (Bs.)", "Estado", "Pagado (Bs.)"],
+        filas,
+    )
 
 
 @login_required
@@ -301,38 +370,42 @@ def _build_order_mysql_ventas(sort: str, direction: str) -> str:
     return f"{col} DESC"
 
 
-def _fetch_ventas_diarias(d1: str | None, d2: str | None, order_sql: str):
+def _sql_resumen_ventas_diarias(
+    d1: str | None, d2: str | None, order_sql: str, limit: int | None,
+) -> tuple[str, list]:
+    """Lee CU23 desde resumen_venta_diaria (una fila por día, filtro por PK)."""
     params: list = []
-    where = ["p.estado IN ('CONFIRMADO','ENTREGADO')"]
-
+    where = ["1=1"]
     if d1:
-        where.append("DATE(p.created_at) >= %s")
+        where.append("fecha >= %s")
         params.append(d1)
     if d2:
-        where.append("DATE(p.created_at) <= %s")
+        where.append("fecha <= %s")
         params.append(d2)
 
-    where_sql = " AND ".join(where) if where else "1=1"
-
     sql = f"""
-        SELECT
-            DATE(p.created_at) AS fecha,
-            COUNT(DISTINCT p.id) AS pedidos,
-            COALESCE(SUM(p.total), 0) AS total,
-            COALESCE(SUM(pg.monto), 0) AS pagado,
-            COALESCE(SUM(p.total), 0) - COALESCE(SUM(pg.monto), 0) AS diferencia
-        FROM pedido p
-        LEFT JOIN pago pg ON pg.pedido_id = p.id
-        WHERE {where_sql}
-        GROUP BY DATE(p.created_at)
+        SELECT fecha, pedidos, total, pagado, total - pagado AS diferencia
+        FROM resumen_venta_diaria
+        WHERE {" AND ".join(where)}
         ORDER BY {order_sql}
-        LIMIT 1000
+        {_limit_sql(limit)}
     """
+    return sql, params
 
-    with connection.cursor() as cur:
-        cur.execute(sql, params)
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+def _sql_ventas_diarias(
+    d1: str | None, d2: str | None, order_sql: str, limit: int | None = 1000,
+) -> tuple[str, list]:
+    if resumen_habilitado():
+        return _sql_resumen_ventas_diarias(d1, d2, order_sql, limit)
+
+    qr = consulta_ventas_diarias()
+    qr.where_rango("p.created_at", d1, d2)
+    return qr.order_by(order_sql).limit(limit).sql()
+
+
+def _fetch_ventas_diarias(d1: str | None, d2: str | None, order_sql: str):
+    return _fetch_rows(*_sql_ventas_diarias(d1, d2, order_sql))
 
 
 @login_required
@@ -381,21 +454,24 @@ def ventas_diarias_csv(request):
         request.GET.get("sort", "fecha"),
         request.GET.get("dir", "desc"),
     )
-    rows = _fetch_ventas_diarias(d1, d2, order_sql)
+    limit = None if _export_completo(request) else 1000
+    rows = _iter_rows(*_sql_ventas_diarias(d1, d2, order_sql, limit=limit))
 
-    resp = HttpResponse(content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = 'attachment; filename="ventas_diarias.csv"'
-    w = csv.writer(resp)
-    w.writerow(["Fecha", "Pedidos", "Total (Bs.)", "Pagado (Bs.)", "Diferencia (Bs.)"])
-    for r in rows:
-        w.writerow([
+    filas = (
+        [
             str(r["fecha"] or ""),
             r["pedidos"] or 0,
             f"{Decimal(r['total'] or 0):.2f}",
             f"{Decimal(r['pagado'] or 0):.2f}",
             f"{Decimal(r['diferencia'] or 0):.2f}",
-        ])
-    return resp
+        ]
+        for r in rows
+    )
+    return _csv_streaming_response(
+        "ventas_diarias.csv",
+        ["Fecha", "Pedidos", "Total (Bs.)", "Pagado (Bs.)", "Diferencia (Bs.)"],
+        filas,
+    )
 
 
 @login_required
@@ -519,13 +595,14 @@ def _build_order_mysql_compras(sort: str, direction: str) -> str:
     return f"{col} DESC"
 
 
-def _fetch_historial_compras(
+def _sql_historial_compras(
     q: str | None,
     d1: str | None,
     d2: str | None,
     order_sql: str,
     proveedor_id: str | None = None,
-):
+    limit: int | None = 500,
+) -> tuple[str, list]:
     """
     Devuelve una fila por compra.
     """
@@ -537,19 +614,13 @@ def _fetch_historial_compras(
         params.append(proveedor_id)
 
     if q:
-        where.append("""(
-            pr.nombre    LIKE CONCAT('%%', %s, '%%')
-         OR pr.telefono  LIKE CONCAT('%%', %s, '%%')
-         OR pr.direccion LIKE CONCAT('%%', %s, '%%')
-        )""")
-        params.extend([q, q, q])
+        cond, ps = filtro_sql("proveedor", "c.proveedor_id", q)
+        where.append(cond)
+        params.extend(ps)
 
-    if d1:
-        where.append("DATE(c.fecha) >= %s")
-        params.append(d1)
-    if d2:
-        where.append("DATE(c.fecha) <= %s")
-        params.append(d2)
+    conds, ps = rango_fechas("c.fecha", d1, d2)
+    where.extend(conds)
+    params.extend(ps)
 
     where_sql = " AND ".join(where)
 
@@ -566,13 +637,19 @@ def _fetch_historial_compras(
         JOIN proveedor pr ON pr.id = c.proveedor_id
         WHERE {where_sql}
         ORDER BY {order_sql}
-        LIMIT 500
+        {_limit_sql(limit)}
     """
+    return sql, params
 
-    with connection.cursor() as cur:
-        cur.execute(sql, params)
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+def _fetch_historial_compras(
+    q: str | None,
+    d1: str | None,
+    d2: str | None,
+    order_sql: str,
+    proveedor_id: str | None = None,
+):
+    return _fetch_rows(*_sql_historial_compras(q, d1, d2, order_sql, proveedor_id=proveedor_id))
 
 
 @login_required
@@ -622,25 +699,28 @@ def historial_proveedores_csv(request):
     d2 = (request.GET.get("d2") or "").strip() or None
     proveedor_id = (request.GET.get("proveedor_id") or "").strip() or None
 
-    rows = _fetch_historial_compras(
+    limit = None if _export_completo(request) else 500
+    rows = _iter_rows(*_sql_historial_compras(
         q, d1, d2, _build_order_mysql_compras("fecha", "desc"),
-        proveedor_id=proveedor_id,
-    )
+        proveedor_id=proveedor_id, limit=limit,
+    ))
 
-    resp = HttpResponse(content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = 'attachment; filename="historial_compras_proveedores.csv"'
-    w = csv.writer(resp)
-    w.writerow(["Compra", "Fecha", "Proveedor", "Teléfono", "Dirección", "Total (Bs.)"])
-    for r in rows:
-        w.writerow([
+    filas = (
+        [
             r.get("compra_id", ""),
             r.get("fecha", ""),
             r.get("proveedor", "") or "",
             r.get("telefono", "") or "",
             r.get("direccion", "") or "",
             f"{Decimal(r.get('total') or 0):.2f}",
-        ])
-    return resp
+        ]
+        for r in rows
+    )
+    return _csv_streaming_response(
+        "historial_compras_proveedores.csv",
+        ["Compra", "Fecha", "Proveedor", "Teléfono", "Dirección", "Total (Bs.)"],
+        filas,
+    )
 
 
 @login_required
@@ -779,13 +859,14 @@ def _build_order_mysql_entregas(sort: str, direction: str) -> str:
     return f"{col} DESC"
 
 
-def _fetch_historial_entregas(
+def _sql_historial_entregas(
     q: str | None,
     estado: str | None,
     d1: str | None,
     d2: str | None,
     order_sql: str | None,
-):
+    limit: int | None = 1000,
+) -> tuple[str, list]:
     """
     Devuelve una fila por envío/entrega con joins a cliente.
     Nota: la BD no tiene e.comentarios, por eso devolvemos '' AS comentario.
@@ -810,12 +891,9 @@ def _fetch_historial_entregas(
         where_clauses.append("e.estado = %s")
         params.append(estado)
 
-    if d1:
-        where_clauses.append(f"DATE({fecha_expr}) >= %s")
-        params.append(d1)
-    if d2:
-        where_clauses.append(f"DATE({fecha_expr}) <= %s")
-        params.append(d2)
+    conds, ps = rango_fechas(fecha_expr, d1, d2)
+    where_clauses.extend(conds)
+    params.extend(ps)
 
     where_sql = " AND ".join(where_clauses)
     order_sql = order_sql or "DATE_FORMAT(p.created_at, '%%Y-%%m-%%d %%H:%%i') DESC"
@@ -838,14 +916,19 @@ def _fetch_historial_entregas(
         LEFT JOIN usuario u ON u.id = c.usuario_id
         WHERE {where_sql}
         ORDER BY {order_sql}
-        LIMIT 1000
+        {_limit_sql(limit)}
     """
+    return sql, params
 
-    from django.db import connection
-    with connection.cursor() as cur:
-        cur.execute(sql, params)
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+def _fetch_historial_entregas(
+    q: str | None,
+    estado: str | None,
+    d1: str | None,
+    d2: str | None,
+    order_sql: str | None,
+):
+    return _fetch_rows(*_sql_historial_entregas(q, estado, d1, d2, order_sql))
 
 
 @login_required
@@ -895,14 +978,13 @@ def historial_entregas_csv(request):
     d1 = (request.GET.get("d1") or "").strip() or None
     d2 = (request.GET.get("d2") or "").strip() or None
 
-    rows = _fetch_historial_entregas(q, st, d1, d2, _build_order_mysql_entregas("fecha", "desc"))
+    limit = None if _export_completo(request) else 1000
+    rows = _iter_rows(*_sql_historial_entregas(
+        q, st, d1, d2, _build_order_mysql_entregas("fecha", "desc"), limit=limit,
+    ))
 
-    resp = HttpResponse(content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = 'attachment; filename="historial_entregas.csv"'
-    w = csv.writer(resp)
-    w.writerow(["Envío", "Fecha", "Repartidor", "Cliente", "Pedido", "Estado", "Comentario"])
-    for r in rows:
-        w.writerow([
+    filas = (
+        [
             r.get("envio_id", ""),
             r.get("fecha", "") or "",
             r.get("repartidor", "") or "",
@@ -910,8 +992,14 @@ def historial_entregas_csv(request):
             r.get("pedido_id", "") or "",
             r.get("estado", "") or "",
             (r.get("comentario") or "").replace("\n", " ").strip()
-        ])
-    return resp
+        ]
+        for r in rows
+    )
+    return _csv_streaming_response(
+        "historial_entregas.csv",
+        ["Envío", "Fecha", "Repartidor", "Cliente", "Pedido", "Estado", "Comentario"],
+        filas,
+    )
 
 
 @login_required
@@ -1030,8 +1118,8 @@ def _ventas_build_where(q: str | None, d1: str | None, d2: str | None) -> tuple[
     where = ["1=1"]
     params: list = []
 
-    # usa fecha_emision de la factura; si no hubiera, cae a la del pedido
-    fecha_expr   = "COALESCE(f.fecha, p.created_at)"
+    # usa la fecha de la factura (columna directa para poder usar el índice)
+    fecha_expr   = "f.fecha"
     cliente_expr = "COALESCE(NULLIF(TRIM(c.nombre), ''), u.email)"
     sabor_expr   = "COALESCE(NULLIF(TRIM(s.nombre), ''), '—')"
 
@@ -1039,26 +1127,67 @@ def _ventas_build_where(q: str | None, d1: str | None, d2: str | None) -> tuple[
         where.append(f"({cliente_expr} LIKE CONCAT('%%', %s, '%%') OR {sabor_expr} LIKE CONCAT('%%', %s, '%%'))")
         params.extend([q, q])
 
+    conds, ps = rango_fechas(fecha_expr, d1, d2)
+    where.extend(conds)
+    params.extend(ps)
+
+    return " AND ".join(where), params
+
+
+def _sql_resumen_ventas_agregado(
+    group: str, d1: str | None, d2: str | None, limit: int | None,
+) -> tuple[str, list]:
+    """
+    Lee CU27 desde resumen_venta_dimension. Por cliente/producto/sabor agrupa
+    por id (no por nombre); en producto/sabor el total es el subtotal de sus líneas.
+    """
+    g = (group or "dia").lower()
+    if g not in ("cliente", "sabor", "producto"):
+        g = "dia"
+
+    where = ["dimension = %s"]
+    params: list = [g]
     if d1:
-        where.append(f"DATE({fecha_expr}) >= %s")
+        where.append("fecha >= %s")
         params.append(d1)
     if d2:
-        where.append(f"DATE({fecha_expr}) <= %s")
+        where.append("fecha <= %s")
         params.append(d2)
 
-    return " AND ".join(where), params
+    if g == "dia":
+        select = "etiqueta"
+        group_by = "etiqueta"
+        order_by = "etiqueta ASC"
+    else:
+        select = "MAX(etiqueta) AS etiqueta"
+        group_by = "clave"
+        order_by = "total DESC"
 
+    sql = f"""
+        SELECT {select}, SUM(ventas) AS ventas, SUM(total) AS total
+        FROM resumen_venta_dimension
+        WHERE {" AND ".join(where)}
+        GROUP BY {group_by}
+        ORDER BY {order_by}
+        {_limit_sql(limit)}
+    """
+    return sql, params
 
-from django.db import connection
 
-def _fetch_ventas_agregado(group: str, q: str | None, d1: str | None, d2: str | None):
+def _sql_ventas_agregado(
+    group: str, q: str | None, d1: str | None, d2: str | None, limit: int | None = 2000,
+) -> tuple[str, list]:
     """
     Agrupa ventas por día/cliente/sabor/producto usando tu esquema real:
       - fecha de la factura: factura.fecha
       - sabores vía detalle_pedido -> sabor
       - producto vía detalle_pedido -> producto
-    Retorna (data, total_general, ventas_total)
+    Retorna (sql, params); `_fetch_ventas_agregado` agrega los totales.
+    La búsqueda libre `q` cruza dimensiones, así que solo sin `q` se usa el resumen.
     """
+    if resumen_habilitado() and not q:
+        return _sql_resumen_ventas_agregado(group, d1, d2, limit)
+
     # ✨ Campos legibles
     fecha_factura   = "f.fecha"  # <- existe en tu tabla factura
     cliente_expr    = "COALESCE(NULLIF(TRIM(c.nombre), ''), u.email)"
@@ -1068,71 +1197,71 @@ def _fetch_ventas_agregado(group: str, q: str | None, d1: str | None, d2: str |
     # Normalizamos parámetro
     g = (group or "dia").lower()
 
-    if g == "cliente":
-        etiqueta = cliente_expr
-        order_by = "total DESC"
-    elif g == "sabor":
-        etiqueta = sabor_expr
-        order_by = "total DESC"
-    elif g == "producto":
-        etiqueta = producto_expr
-        order_by = "total DESC"
-    else:
-        # por día (desde fecha de la factura)
-        etiqueta = f"DATE_FORMAT({fecha_factura}, '%%Y-%%m-%%d')"
-        order_by = "etiqueta ASC"
+    # 🧩 Una fila por pedido facturado; las líneas llegan pre-agregadas
+    # (por producto o sabor) para no repetir p.total por cada línea.
+    qr = (
+        ConsultaReporte(joins_base="JOIN factura f ON f.pedido_id = p.id")
+        .join("LEFT JOIN cliente c ON c.id = p.cliente_id")
+        .join("LEFT JOIN usuario u ON u.id = c.usuario_id")
+    )
 
-    # 🔎 Filtros (ajusta si tu helper se llama distinto)
-    where_parts = ["1=1"]
-    params = []
+    if g in ("sabor", "producto"):
+        col, otra_col = ("sabor_id", "producto_id") if g == "sabor" else ("producto_id", "sabor_id")
+        qr.lineas_por_pedido(alias="dp", por=col, tipo_join="JOIN")
+        if g == "sabor":
+            qr.join("LEFT JOIN sabor s ON s.id = dp.sabor_id")
+            etiqueta, otra_tabla = sabor_expr, "producto"
+        else:
+            qr.join("LEFT JOIN producto pr ON pr.id = dp.producto_id")
+            etiqueta, otra_tabla = producto_expr, "sabor"
+        qr.select(
+            f"MAX({etiqueta}) AS etiqueta",
+            "COUNT(DISTINCT p.id) AS ventas",
+            "SUM(dp.subtotal) AS total",
+        ).group_by(f"dp.{col}").order_by("total DESC")
+    else:
+        if g == "cliente":
+            qr.select(f"MAX({cliente_expr}) AS etiqueta").group_by("p.cliente_id").order_by("total DESC")
+        else:
+            # por día (desde fecha de la factura)
+            qr.select(f"DATE_FORMAT({dia_local(fecha_factura)}, '%%Y-%%m-%%d') AS etiqueta")
+            qr.group_by("etiqueta").order_by("etiqueta ASC")
+        qr.select("COUNT(*) AS ventas", "SUM(p.total) AS total")
 
     # rango de fechas sobre la fecha de la factura
-    if d1:
-        where_parts.append(f"{fecha_factura} >= %s")
-        params.append(d1)
-    if d2:
-        where_parts.append(f"{fecha_factura} < DATE_ADD(%s, INTERVAL 1 DAY)")
-        params.append(d2)
+    qr.where_rango(fecha_factura, d1, d2)
 
-    # búsqueda libre (cliente/sabor/producto)
+    # 🔎 búsqueda libre (cliente/sabor/producto) sin multiplicar filas:
+    # las líneas se consultan con EXISTS en vez de JOIN.
     if q:
-        where_parts.append(f"""(
-            {cliente_expr} LIKE %s OR
-            {sabor_expr}   LIKE %s OR
-            {producto_expr} LIKE %s
-        )""")
         like = f"%{q}%"
-        params += [like, like, like]
+        if g in ("sabor", "producto"):
+            qr.where(f"""(
+                {cliente_expr} LIKE %s OR
+                {etiqueta} LIKE %s OR
+                EXISTS (
+                    SELECT 1 FROM detalle_pedido d2
+                    JOIN {otra_tabla} t2 ON t2.id = d2.{otra_col}
+                    WHERE d2.pedido_id = p.id AND d2.{col} = dp.{col} AND t2.nombre LIKE %s
+                )
+            )""", like, like, like)
+        else:
+            qr.where(f"""(
+                {cliente_expr} LIKE %s OR
+                EXISTS (
+                    SELECT 1 FROM detalle_pedido d2
+                    LEFT JOIN sabor    s2  ON s2.id = d2.sabor_id
+                    LEFT JOIN producto pr2 ON pr2.id = d2.producto_id
+                    WHERE d2.pedido_id = p.id AND (s2.nombre LIKE %s OR pr2.nombre LIKE %s)
+                )
+            )""", like, like, like)
+
+    return qr.limit(limit).sql()
 
-    where = " AND ".join(where_parts)
-
-    # 🧩 Joins usando tu modelo de datos
-    sql = f"""
-        SELECT
-            {etiqueta} AS etiqueta,
-            COUNT(DISTINCT p.id) AS ventas,
-            SUM(p.total) AS total
-        FROM factura f
-        JOIN pedido   p  ON p.id = f.pedido_id
-        LEFT JOIN cliente  c  ON c.id = p.cliente_id
-        LEFT JOIN usuario  u  ON u.id = c.usuario_id
-
-        -- Detalle para llegar a sabor y producto
-        LEFT JOIN detalle_pedido dp ON dp.pedido_id = p.id
-        LEFT JOIN sabor          s  ON s.id = dp.sabor_id
-        LEFT JOIN producto       pr ON pr.id = dp.producto_id
-
-        WHERE {where}
-        GROUP BY etiqueta
-        ORDER BY {order_by}
-        LIMIT 2000
-    """
-
-    with connection.cursor() as cur:
-        cur.execute(sql, params)
-        cols = [c[0] for c in cur.description]
-        data = [dict(zip(cols, row)) for row in cur.fetchall()]
 
+def _fetch_ventas_agregado(group: str, q: str | None, d1: str | None, d2: str | None):
+    """Retorna (data, total_general, ventas_total)."""
+    data = _fetch_rows(*_sql_ventas_agregado(group, q, d1, d2))
     total_general = sum((r["total"] or 0) for r in data)
     ventas_total  = sum((r["ventas"] or 0) for r in data)
     return data, total_general, ventas_total
@@ -1173,17 +1302,18 @@ def ventas_reportes_csv(request):
     d1    = request.GET.get("d1") or None
     d2    = request.GET.get("d2") or None
 
-    data, total_general, ventas_total = _fetch_ventas_agregado(group, q, d1, d2)
+    limit = None if _export_completo(request) else 2000
+    rows = _iter_rows(*_sql_ventas_agregado(group, q, d1, d2, limit=limit))
 
-    lines = ["etiqueta,ventas,total"]
-    for r in data:
-        etiqueta = (r["etiqueta"] or "").replace(",", " ")
-        lines.append(f"{etiqueta},{r['ventas']},{r['total'] or 0}")
-    lines.append(f"TOTAL,{ventas_total},{total_general}")
+    def _filas():
+        ventas_total, total_general = 0, 0
+        for r in rows:
+            ventas_total += r["ventas"] or 0
+            total_general += r["total"] or 0
+            yield [r["etiqueta"] or "", r["ventas"], r["total"] or 0]
+        yield ["TOTAL", ventas_total, total_general]
 
-    resp = HttpResponse("\n".join(lines), content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = 'attachment; filename=\"ventas_reportes.csv\"'
-    return resp
+    return _csv_streaming_response("ventas_reportes.csv", ["etiqueta", "ventas", "total"], _filas())
 
 
 def ventas_reportes_pdf(request):
@@ -1,9 +1,12 @@
 # core/middleware.py
+from django.utils.functional import SimpleLazyObject
+
 from accounts.utils import log_event  # usamos tu helper
 
 class AuditWriteMiddleware:
     """
     Registra en bitácora cualquier request de escritura (POST/PUT/PATCH/DELETE).
+    log_event solo encola; la escritura a BD ocurre fuera del request.
     No bloquea el flujo si algo falla.
     """
     def __init__(self, get_response):
@@ -20,3 +23,18 @@ class AuditWriteMiddleware:
             # Nunca botar el request por problemas de logging
             pass
         return response
+
+
+class ClienteActualMiddleware:
+    """
+    Agrega `request.cliente` (perezoso): se resuelve solo si la vista lo usa,
+    con los ids guardados en la sesión tras la primera vez (ver
+    accounts.views_auth.get_cliente_actual). Va después de AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from accounts.views_auth import get_cliente_actual
+        request.cliente = SimpleLazyObject(lambda: get_cliente_actual(request))
+        return self.get_response(request)
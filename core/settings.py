@@ -3,6 +3,7 @@ Django settings for core project.
 """
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ClienteActualMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "core.middleware.AuditWriteMiddleware",
@@ -110,6 +112,47 @@ LOGOUT_REDIRECT_URL = "/login/"
 # Custom user
 AUTH_USER_MODEL = "accounts.User"
 
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    # Catálogo público (services_catalogo): en disco para que todos los
+    # procesos del host vean la misma foto y la misma invalidación. Las
+    # señales solo invalidan en este host y no ven SQL directo: el TIMEOUT
+    # acota cuánto puede quedar vieja la foto en otro host.
+    "catalogo": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CATALOGO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dulce_catalogo")),
+        "TIMEOUT": int(os.getenv("CATALOGO_CACHE_TTL", "300")),
+    },
+}
+
+# Caché de permisos (segundos) para requiere_permiso
+PERMISOS_CACHE_TTL = int(os.getenv("PERMISOS_CACHE_TTL", "300"))
+# Huella de la última sincronización auth.User -> usuario al hacer login (segundos)
+USUARIO_SYNC_TTL = int(os.getenv("USUARIO_SYNC_TTL", "86400"))
+
+# Bitácora asíncrona (cola en memoria + escritura por lotes)
+AUDIT_ASYNC = os.getenv("AUDIT_ASYNC", "on").lower() in ("1", "true", "on", "yes")
+AUDIT_QUEUE_MAXSIZE = int(os.getenv("AUDIT_QUEUE_MAXSIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "500"))
+# Días que la bitácora queda en la tabla activa (ver `manage.py archivar_bitacora`)
+AUDIT_RETENCION_DIAS = int(os.getenv("AUDIT_RETENCION_DIAS", "90"))
+
+# Reportes CU23/CU27 desde tablas de resumen (las llena la migración 0015;
+# reconstruir con `manage.py resumen_ventas`)
+REPORTES_USAR_RESUMEN = os.getenv("REPORTES_USAR_RESUMEN", "on").lower() in ("1", "true", "on", "yes")
+
+# Método de costeo de insumos para recetas: ultimo | promedio | fifo
+COSTEO_METODO = os.getenv("COSTEO_METODO", "ultimo")
+
+# Valuación FIFO (`manage.py valuar_inventario`): segundos que espera un id de
+# kardex antes de valuarlo y cuántos ids hacia atrás revisa por rezagados
+VALUACION_MARGEN = int(os.getenv("VALUACION_MARGEN", "60"))
+VALUACION_VENTANA = int(os.getenv("VALUACION_VENTANA", "10000"))
+# Cortes de kardex (`manage.py cerrar_kardex`): segundos que espera el MAX(id)
+# observado antes de cerrar hasta él
+KARDEX_MARGEN = int(os.getenv("KARDEX_MARGEN", "60"))
+
 # Precio unitario de galleta (Bs)
 COOKIE_UNIT_PRICE_BS = float(os.getenv("COOKIE_UNIT_PRICE_BS", "10"))
 
@@ -117,6 +160,15 @@ COOKIE_UNIT_PRICE_BS = float(os.getenv("COOKIE_UNIT_PRICE_BS", "10"))
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY", "")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+# Cliente HTTP de Stripe (accounts.stripe_service): timeouts en segundos,
+# reintentos de errores transitorios (solo dentro del presupuesto por llamada)
+# y circuito (intentos fallidos seguidos / segundos abierto)
+STRIPE_TIMEOUT_CONEXION = float(os.getenv("STRIPE_TIMEOUT_CONEXION", "3"))
+STRIPE_TIMEOUT_LECTURA = float(os.getenv("STRIPE_TIMEOUT_LECTURA", "5"))
+STRIPE_REINTENTOS = int(os.getenv("STRIPE_REINTENTOS", "2"))
+STRIPE_PRESUPUESTO = float(os.getenv("STRIPE_PRESUPUESTO", "8"))
+STRIPE_CIRCUITO_FALLOS = int(os.getenv("STRIPE_CIRCUITO_FALLOS", "5"))
+STRIPE_CIRCUITO_ESPERA = float(os.getenv("STRIPE_CIRCUITO_ESPERA", "30"))
 
 # Moneda & dominio
 CURRENCY = os.getenv("CURRENCY", "BOB")
@@ -1,7 +1,7 @@
 # core/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from core.urls_debug import urls_debug_view
+from core.urls_debug import urls_debug_view, stats_debug_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,4 +11,5 @@ urlpatterns = [
 
     # 👉 Página de debug opcional (si existe)
     path("debug/urls/", urls_debug_view, name="urls_debug"),
+    path("debug/stats/", stats_debug_view, name="stats_debug"),
 ]
@@ -1,4 +1,5 @@
-from django.http import HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from django.urls import URLPattern, URLResolver, get_resolver
 
 def urls_debug_view(request):
@@ -19,3 +20,15 @@ def urls_debug_view(request):
     html += "".join(f"<li><code>{pat}</code> — <b>{name}</b></li>" for pat, name in rows)
     html += "</ul>"
     return HttpResponse(html)
+
+
+@staff_member_required
+def stats_debug_view(request):
+    """Contadores en memoria de este proceso (cachés, colas)."""
+    from accounts.permissions import permisos_cache_stats
+    from accounts.services_bitacora import cola_bitacora
+
+    return JsonResponse({
+        "permisos_cache": permisos_cache_stats(),
+        "bitacora_cola": cola_bitacora.stats(),
+    })